@@ -0,0 +1,108 @@
+"""
+Evaluates reduced-dimension embeddings against the 1536-d baseline.
+
+For every query (each symptom in the corpus plus every question text) the top-k
+documents are retrieved with brute-force cosine similarity, per document type,
+using the full 1536-d vectors and again using shortened vectors. recall@k is the
+fraction of the baseline top-k that the shortened vectors also return.
+
+text-embedding-3 models shorten embeddings by truncating and re-normalizing the
+full vector, which is what the `dimensions` parameter does server-side, so the
+corpus is embedded once at 1536-d and shortened locally.
+
+Usage (from the patient-api directory):
+    python scripts/eval_embedding_recall.py --dims 256 512 --k 5 10
+"""
+import os
+import json
+import argparse
+from typing import List, Dict, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+
+load_dotenv()
+
+EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+BASELINE_DIM = 1536
+
+
+def load_corpus(ctcae_path: str, questions_path: str) -> Dict[str, List[Tuple[str, str]]]:
+    """Returns {doc_type: [(symptom, text), ...]} built the same way as the ingest script."""
+    with open(ctcae_path, "r") as f:
+        ctcae = json.load(f)
+    with open(questions_path, "r") as f:
+        questions = json.load(f)
+
+    corpus = {"ctcae": [], "question": []}
+    for category, symptoms in ctcae.items():
+        for symptom_name, grades in symptoms.items():
+            for grade, description in grades.items():
+                if description:
+                    text = f"Symptom: {symptom_name}\nCategory: {category}\nGrade {grade}: {description}"
+                    corpus["ctcae"].append((symptom_name.lower(), text))
+    for item in questions:
+        corpus["question"].append((item.get("symptom", "general").lower(), item["text"]))
+    return corpus
+
+
+def embed_all(client: OpenAI, texts: List[str], batch_size: int = 100) -> np.ndarray:
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        r = client.embeddings.create(model=EMBED_MODEL, input=texts[i:i + batch_size])
+        vectors.extend(d.embedding for d in r.data)
+        print(f"[EVAL] Embedded {min(i + batch_size, len(texts))}/{len(texts)}")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def shorten(vectors: np.ndarray, dim: int) -> np.ndarray:
+    cut = vectors[:, :dim]
+    norms = np.linalg.norm(cut, axis=1, keepdims=True)
+    return cut / np.clip(norms, 1e-12, None)
+
+
+def top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ docs.T
+    k = min(k, docs.shape[0])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return part
+
+
+def recall_at_k(baseline: np.ndarray, candidate: np.ndarray) -> float:
+    hits = [len(set(b) & set(c)) / len(b) for b, c in zip(baseline, candidate)]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--ctcae", default=os.getenv("CTCAE_JSON", "model_inputs/CTCAE.json"))
+    parser.add_argument("--questions", default=os.getenv("QUESTIONS_JSON", "model_inputs/questions.json"))
+    args = parser.parse_args()
+
+    client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    corpus = load_corpus(args.ctcae, args.questions)
+
+    query_texts = sorted({sym for docs in corpus.values() for sym, _ in docs})
+    query_texts += [text for _, text in corpus["question"]]
+    print(f"[EVAL] Model={EMBED_MODEL} queries={len(query_texts)} " +
+          " ".join(f"{t}={len(d)}" for t, d in corpus.items()))
+
+    query_vecs = embed_all(client, query_texts)
+    doc_vecs = {t: embed_all(client, [text for _, text in docs]) for t, docs in corpus.items()}
+
+    print(f"\n{'type':<10}{'dim':>6}{'k':>5}{'recall@k':>10}{'bytes/vec':>11}")
+    for doc_type, docs in doc_vecs.items():
+        base_q = shorten(query_vecs, BASELINE_DIM)
+        base_d = shorten(docs, BASELINE_DIM)
+        for k in args.k:
+            baseline = top_k(base_q, base_d, k)
+            for dim in args.dims:
+                candidate = top_k(shorten(query_vecs, dim), shorten(docs, dim), k)
+                print(f"{doc_type:<10}{dim:>6}{k:>5}{recall_at_k(baseline, candidate):>10.3f}{dim * 4:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,247 @@
+"""
+Chunks, embeds and upserts the model inputs into Pinecone.
+
+Usage (from the patient-api directory):
+    python scripts/ingest_pinecone.py                 # real run against OpenAI + Pinecone
+    python scripts/ingest_pinecone.py --dry-run       # offline benchmark, no network or API keys
+
+Dry-run mode swaps in a deterministic hashing embedder and an in-memory index and
+prints chunk/token counts, batch sizes and per-stage throughput and latency, so
+chunking and batching changes can be benchmarked offline.
+"""
 import os
 import json
 import re
+import math
+import time
 import hashlib
-from typing import List
+import argparse
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Any, Optional
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from openai import OpenAI
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Check required environment variables
-required_vars = ["OPENAI_API_KEY", "PINECONE_API_KEY"]
-missing_vars = [var for var in required_vars if not os.getenv(var)]
-
-if missing_vars:
-    print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
-    print("Please create a .env file in the patient-api directory with:")
-    for var in missing_vars:
-        print(f"  {var}=your_value_here")
-    exit(1)
-
-OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
-PINECONE_API_KEY = os.environ["PINECONE_API_KEY"]
 INDEX_NAME = os.getenv("PINECONE_INDEX", "oncolife-rag")
 CLOUD = os.getenv("PINECONE_CLOUD", "aws")
 REGION = os.getenv("PINECONE_REGION", "us-west-2")  # Changed to us-west-2
 EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 EMBED_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
+# Store each document type (ctcae, question, alert, ...) in its own namespace
+USE_NAMESPACES = os.getenv("PINECONE_NAMESPACES", "false").lower() in ("1", "true", "yes", "on")
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
 
-print(f"🔧 Configuration:")
-print(f"  Index: {INDEX_NAME}")
-print(f"  Cloud: {CLOUD}")
-print(f"  Region: {REGION}")
-print(f"  Embedding Model: {EMBED_MODEL}")
-print(f"  Dimension: {EMBED_DIM}")
+# Set by connect() or use_dry_run()
+client = None
+index = None
+embedder = None
 
-client = OpenAI(api_key=OPENAI_API_KEY)
-pc = Pinecone(api_key=PINECONE_API_KEY)
 
-# Create index if needed
-if INDEX_NAME not in [i.name for i in pc.list_indexes()]:
-    print(f"[INGEST] Creating Pinecone index '{INDEX_NAME}' (dim={EMBED_DIM}) in {CLOUD}:{REGION}")
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=EMBED_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(cloud=CLOUD, region=REGION),
-    )
-index = pc.Index(INDEX_NAME)
+def connect():
+    """Connects to OpenAI and Pinecone, creating the index if needed."""
+    global client, index, embedder
+    from pinecone import Pinecone, ServerlessSpec
+    from openai import OpenAI
 
+    # Check required environment variables
+    required_vars = ["OPENAI_API_KEY", "PINECONE_API_KEY"]
+    missing_vars = [var for var in required_vars if not os.getenv(var)]
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    r = client.embeddings.create(model=EMBED_MODEL, input=texts)
+    if missing_vars:
+        print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
+        print("Please create a .env file in the patient-api directory with:")
+        for var in missing_vars:
+            print(f"  {var}=your_value_here")
+        exit(1)
+
+    client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
+
+    # Create index if needed
+    if INDEX_NAME not in [i.name for i in pc.list_indexes()]:
+        print(f"[INGEST] Creating Pinecone index '{INDEX_NAME}' (dim={EMBED_DIM}) in {CLOUD}:{REGION}")
+        pc.create_index(
+            name=INDEX_NAME,
+            dimension=EMBED_DIM,
+            metric="cosine",
+            spec=ServerlessSpec(cloud=CLOUD, region=REGION),
+        )
+    index = pc.Index(INDEX_NAME)
+    embedder = _openai_embed
+
+
+def use_dry_run(dim: int = EMBED_DIM):
+    """Swaps in the local stand-in embedder and in-memory index."""
+    global client, index, embedder
+    client = None
+    index = InMemoryIndex()
+    embedder = HashingEmbedder(dim)
+
+
+# ---- Local stand-ins for dry runs ----
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder. Not semantically meaningful, but it has
+    the same shape and per-call cost profile as a real embedder for benchmarking.
+    """
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        out = []
+        for text in texts:
+            vec = [0.0] * self.dim
+            for token in re.findall(r"\w+", text.lower()):
+                h = int(hashlib.md5(token.encode()).hexdigest(), 16)
+                vec[h % self.dim] += 1.0 if (h >> 64) & 1 else -1.0
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            out.append([v / norm for v in vec])
+        return out
+
+
+class _Match:
+    def __init__(self, id: str, score: float, metadata: Dict[str, Any]):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+
+class _QueryResult:
+    def __init__(self, matches: List[_Match]):
+        self.matches = matches
+
+
+class InMemoryIndex:
+    """Brute-force cosine index with the subset of the Pinecone Index API the app uses."""
+
+    def __init__(self):
+        self.namespaces: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = ""):
+        ns = self.namespaces.setdefault(namespace, {})
+        for v in vectors:
+            ns[v["id"]] = v
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = True,
+              namespace: str = "", filter: Optional[Dict[str, Any]] = None) -> _QueryResult:
+        scored = []
+        for v in self.namespaces.get(namespace, {}).values():
+            if filter and not _matches_filter(v.get("metadata", {}), filter):
+                continue
+            score = sum(a * b for a, b in zip(vector, v["values"]))
+            scored.append(_Match(v["id"], score, v.get("metadata", {}) if include_metadata else {}))
+        scored.sort(key=lambda m: m.score, reverse=True)
+        return _QueryResult(scored[:top_k])
+
+    def count(self) -> int:
+        return sum(len(ns) for ns in self.namespaces.values())
+
+
+def _matches_filter(metadata: Dict[str, Any], flt: Dict[str, Any]) -> bool:
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(_matches_filter(metadata, c) for c in cond):
+                return False
+            continue
+        value = metadata.get(key)
+        values = value if isinstance(value, list) else [value]
+        for op, operand in cond.items():
+            if op == "$eq" and operand not in values:
+                return False
+            if op == "$in" and not any(v in operand for v in values):
+                return False
+    return True
+
+
+# ---- Benchmark stats ----
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None  # tiktoken is optional; fall back to a chars/4 estimate
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+class IngestStats:
+    """Per-stage timings, item and token counts for one ingest run."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.chunks: Dict[str, int] = {}
+        self.tokens: Dict[str, int] = {}
+        self.batch_sizes: Dict[str, List[int]] = {}
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        """Times a stage; callers that only know the item count afterwards can set it on the yielded dict."""
+        counter = {"items": items}
+        start = time.perf_counter()
+        try:
+            yield counter
+        finally:
+            elapsed = time.perf_counter() - start
+            st = self.stages.setdefault(name, {"calls": 0, "items": 0, "seconds": 0.0, "latencies": []})
+            st["calls"] += 1
+            st["items"] += counter["items"]
+            st["seconds"] += elapsed
+            st["latencies"].append(elapsed)
+
+    def record_chunks(self, doc_type: str, texts: List[str]):
+        self.chunks[doc_type] = self.chunks.get(doc_type, 0) + len(texts)
+        self.tokens[doc_type] = self.tokens.get(doc_type, 0) + sum(count_tokens(t) for t in texts)
+
+    def record_batch(self, doc_type: str, size: int):
+        self.batch_sizes.setdefault(doc_type, []).append(size)
+
+    def report(self):
+        print("\n[INGEST][STATS] Chunks")
+        print(f"  {'type':<12}{'chunks':>8}{'tokens':>10}{'avg tok':>9}{'batches':>9}{'batch sizes':>16}")
+        for doc_type, n in self.chunks.items():
+            tokens = self.tokens.get(doc_type, 0)
+            sizes = self.batch_sizes.get(doc_type, [])
+            size_desc = f"{min(sizes)}-{max(sizes)}" if sizes else "-"
+            print(f"  {doc_type:<12}{n:>8}{tokens:>10}{tokens / max(n, 1):>9.1f}{len(sizes):>9}{size_desc:>16}")
+
+        print("\n[INGEST][STATS] Stages")
+        print(f"  {'stage':<22}{'calls':>7}{'items':>8}{'total ms':>11}{'mean ms':>10}{'p95 ms':>9}{'items/s':>10}")
+        for name, st in self.stages.items():
+            lat = sorted(st["latencies"])
+            p95 = lat[min(len(lat) - 1, int(math.ceil(0.95 * len(lat))) - 1)] if lat else 0.0
+            rate = st["items"] / st["seconds"] if st["seconds"] > 0 else 0.0
+            print(f"  {name:<22}{st['calls']:>7}{st['items']:>8}{st['seconds'] * 1000:>11.1f}"
+                  f"{st['seconds'] * 1000 / max(st['calls'], 1):>10.2f}{p95 * 1000:>9.2f}{rate:>10.1f}")
+
+
+stats = IngestStats()
+
+
+def _openai_embed(texts: List[str]) -> List[List[float]]:
+    kwargs = {}
+    # text-embedding-3 models can return shortened vectors natively
+    if EMBED_MODEL.startswith("text-embedding-3") and EMBED_DIM != 1536:
+        kwargs["dimensions"] = EMBED_DIM
+    r = client.embeddings.create(model=EMBED_MODEL, input=texts, **kwargs)
     return [d.embedding for d in r.data]
 
 
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    return embedder(texts)
+
+
+def upsert_vectors(vectors: List[Dict], doc_type: str):
+    if USE_NAMESPACES:
+        index.upsert(vectors=vectors, namespace=doc_type)
+    else:
+        index.upsert(vectors=vectors)
+
+
 def stable_id(prefix: str, payload: str) -> str:
     return hashlib.md5(f"{prefix}:{payload}".encode()).hexdigest()
 
@@ -104,91 +290,286 @@ def chunk_text(text: str, max_chunk_size: int = 1000) -> List[str]:
     return final_chunks
 
 
-# ---- Ingest CTCAE triage guidance ----
-def ingest_ctcae(path="model_inputs/CTCAE.json", version="CTCAE v5"):
-    with open(path, "r") as f:
-        data = json.load(f)
-    
-    # Create much smaller, focused chunks for each symptom-grade combination
-    items = []
-    for category, symptoms in data.items():
-        for symptom_name, grades in symptoms.items():
-            for grade, description in grades.items():
-                if description:  # Only add non-empty descriptions
-                    # Create a focused chunk for each grade
-                    text = f"Symptom: {symptom_name}\nCategory: {category}\nGrade {grade}: {description}"
-                    items.append(text)
-    
-    print(f"[INGEST] Created {len(items)} focused CTCAE chunks from {path}")
-    
-    # Process in smaller batches to avoid memory issues
-    batch_size = 100
+# ---- Symptom tagging for free-text documents ----
+# Canonical symptom keys match the `symptom` field in questions.json and the
+# alert configuration; keywords are matched case-insensitively in chunk text.
+SYMPTOM_KEYWORDS: Dict[str, List[str]] = {
+    "fever": ["fever", "temperature", "100.4", "chills"],
+    "nausea": ["nausea", "nauseated", "anti-nausea", "anti nausea"],
+    "vomiting": ["vomit", "emesis"],
+    "diarrhea": ["diarrhea", "diarrhoea", "loose stool"],
+    "constipation": ["constipation", "bowel movement"],
+    "bleeding": ["bleeding", "bruising", "blood in stool", "blood in urine"],
+    "fatigue": ["fatigue", "tired", "lethargy"],
+    "eye_complaints": ["eye", "vision", "tearing"],
+    "mouth_sores": ["mouth sore", "mouth pain", "mucositis", "stomatitis", "throat sore"],
+    "no_appetite": ["appetite", "weight loss", "anorexia"],
+    "urinary_problems": ["urinary", "urine", "urination"],
+    "skin_rash": ["rash", "skin", "infusion site"],
+    "pain": ["pain", "headache"],
+    "swelling": ["swelling", "oedema", "edema"],
+    "cough": ["cough"],
+    "neuropathy": ["neuropathy", "numbness", "tingling"],
+    "trouble_breathing": ["trouble breathing", "shortness of breath", "breathless", "dyspnoea", "dyspnea"],
+    "chest_pain": ["chest pain"],
+    "dehydration": ["dehydration", "dehydrated", "thirsty"],
+}
+
+# Section titles used in written_chatbot_docs.txt, mapped to canonical symptoms
+WRITTEN_DOC_SECTIONS: Dict[str, str] = {
+    "Fever": "fever",
+    "Nausea": "nausea",
+    "Vomiting": "vomiting",
+    "Diarrhea": "diarrhea",
+    "Bleeding/Bruising": "bleeding",
+    "Fatigue": "fatigue",
+    "Eye Complaints": "eye_complaints",
+    "Mouth Sores": "mouth_sores",
+    "No Appetite": "no_appetite",
+    "Constipation": "constipation",
+    "Urinary Problems": "urinary_problems",
+    "Skin Rash or Redness": "skin_rash",
+    "Pain": "pain",
+    "Swelling": "swelling",
+    "Cough": "cough",
+    "Neuropathy": "neuropathy",
+    "Patient Guidance and Care Team Communication": "general",
+}
+
+
+def detect_symptoms(text: str) -> List[str]:
+    """Returns the canonical symptoms mentioned in a chunk, or ["general"]."""
+    lowered = text.lower()
+    found = [sym for sym, words in SYMPTOM_KEYWORDS.items() if any(w in lowered for w in words)]
+    return found or ["general"]
+
+
+def embed_and_upsert(records: List[Dict[str, Any]], doc_type: str, batch_size: Optional[int] = None):
+    """
+    Embeds and upserts records of the form {"id", "text", "metadata"} in batches,
+    recording chunk/token counts and embed/upsert timings in `stats`.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    stats.record_chunks(doc_type, [r["text"] for r in records])
+    total_batches = (len(records) + batch_size - 1) // batch_size
     total_vectors = 0
-    
-    for i in range(0, len(items), batch_size):
-        batch = items[i:i + batch_size]
-        print(f"[INGEST] Processing batch {i//batch_size + 1}/{(len(items) + batch_size - 1)//batch_size} ({len(batch)} items)")
-        
-        # Create embeddings for this batch
-        embs = embed_texts(batch)
-        vectors = []
-        
-        for text, emb in zip(batch, embs):
-            # Extract symptom name for metadata
-            symptom_match = re.search(r"Symptom:\s*([^\n]+)", text)
-            symptom = symptom_match.group(1).strip().lower() if symptom_match else "general"
-            
-            vid = stable_id("ctcae", text[:200])
-            vectors.append({
-                "id": vid,
-                "values": emb,
-                "metadata": {
-                    "type": "ctcae",
-                    "symptoms": [symptom],
-                    "version": version,
-                    "source": "ctcae",
-                    "text": text,
-                }
-            })
-        
-        # Upsert this batch
-        index.upsert(vectors=vectors)
+    for i in range(0, len(records), batch_size):
+        batch = records[i:i + batch_size]
+        print(f"[INGEST] {doc_type}: batch {i//batch_size + 1}/{total_batches} ({len(batch)} items)")
+        stats.record_batch(doc_type, len(batch))
+
+        with stats.stage(f"embed:{doc_type}", items=len(batch)):
+            embs = embed_texts([r["text"] for r in batch])
+
+        vectors = [
+            {"id": r["id"], "values": emb, "metadata": {**r["metadata"], "text": r["text"]}}
+            for r, emb in zip(batch, embs)
+        ]
+        with stats.stage(f"upsert:{doc_type}", items=len(vectors)):
+            upsert_vectors(vectors, doc_type)
         total_vectors += len(vectors)
-        print(f"[INGEST] Upserted batch: {len(vectors)} vectors")
-    
-    print(f"[INGEST] Total CTCAE vectors ingested: {total_vectors}")
+    print(f"[INGEST] Total {doc_type} vectors ingested: {total_vectors}")
+
+
+def upsert_chunks(items: List[Tuple[str, List[str]]], doc_type: str, source: str):
+    """Embeds (text, symptoms) chunks and upserts them tagged with type/symptoms metadata."""
+    records = [
+        {
+            "id": stable_id(doc_type, text[:200]),
+            "text": text,
+            "metadata": {"type": doc_type, "symptoms": symptoms, "source": source},
+        }
+        for text, symptoms in items
+    ]
+    embed_and_upsert(records, doc_type)
+
+
+# ---- Ingest CTCAE triage guidance ----
+def ingest_ctcae(path="model_inputs/CTCAE.json", version="CTCAE v5"):
+    with stats.stage("chunk:ctcae") as stage:
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        # Create much smaller, focused chunks for each symptom-grade combination
+        records = []
+        for category, symptoms in data.items():
+            for symptom_name, grades in symptoms.items():
+                for grade, description in grades.items():
+                    if description:  # Only add non-empty descriptions
+                        # Create a focused chunk for each grade
+                        text = f"Symptom: {symptom_name}\nCategory: {category}\nGrade {grade}: {description}"
+                        records.append({
+                            "id": stable_id("ctcae", text[:200]),
+                            "text": text,
+                            "metadata": {
+                                "type": "ctcae",
+                                "symptoms": [symptom_name.strip().lower()],
+                                "version": version,
+                                "source": "ctcae",
+                            },
+                        })
+
+        stage["items"] = len(records)
+
+    print(f"[INGEST] Created {len(records)} focused CTCAE chunks from {path}")
+    embed_and_upsert(records, "ctcae")
 
 
 # ---- Ingest Question bank ----
 def ingest_questions(path="model_inputs/questions.json"):
-    with open(path, "r") as f:
-        q = json.load(f)  # list of {id, text, symptom, phase, ...}
-    texts = [item["text"] for item in q]
-    print(f"[INGEST] Embedding {len(texts)} questions from {path}")
-    embs = embed_texts(texts)
-    vectors = []
-    for item, emb in zip(q, embs):
-        vid = stable_id("question", str(item.get("id", "")))
-        vectors.append({
-            "id": vid,
-            "values": emb,
-            "metadata": {
-                "type": "question",
-                "symptoms": [item.get("symptom", "general").lower()],
-                "phase": item.get("phase", ""),
-                "qid": item.get("id", ""),
+    with stats.stage("chunk:question") as stage:
+        with open(path, "r") as f:
+            q = json.load(f)  # list of {id, text, symptom, phase, ...}
+        records = [
+            {
+                "id": stable_id("question", str(item.get("id", ""))),
                 "text": item["text"],
+                "metadata": {
+                    "type": "question",
+                    "symptoms": [item.get("symptom", "general").lower()],
+                    "phase": item.get("phase", ""),
+                    "qid": item.get("id", ""),
+                },
             }
-        })
-    index.upsert(vectors=vectors)
-    print(f"[INGEST] Ingested question chunks: {len(vectors)}")
+            for item in q
+        ]
+        stage["items"] = len(records)
+    print(f"[INGEST] Embedding {len(records)} questions from {path}")
+    embed_and_upsert(records, "question")
 
 
-if __name__ == "__main__":
+# ---- Ingest base documents (alerts, written docs, UKONS toolkit) ----
+def chunk_alerts(text: str) -> List[Tuple[str, List[str]]]:
+    """Splits the alert configuration into one chunk per rule, tagged by the rule's symptom."""
+    chunks = []
+    for block in re.split(r"\n(?=id:\s)", text):
+        block = block.strip()
+        if not block.startswith("id:"):
+            continue
+        symptom_match = re.search(r"^symptom:\s*(\S+)", block, re.MULTILINE)
+        symptoms = [symptom_match.group(1).strip().lower()] if symptom_match else detect_symptoms(block)
+        # Immediate (grade 4) red flags apply to every conversation
+        if re.search(r"^override_to_grade:\s*4", block, re.MULTILINE):
+            symptoms.append("general")
+        for piece in chunk_text(block):
+            chunks.append((piece, symptoms))
+    return chunks
+
+
+def chunk_written_docs(text: str) -> List[Tuple[str, List[str]]]:
+    """Splits the written chatbot docs on their symptom section titles."""
+    sections: List[Tuple[str, List[str]]] = []
+    current_title, current_lines = None, []
+    for line in text.split("\n"):
+        if line.strip() in WRITTEN_DOC_SECTIONS:
+            if current_lines:
+                sections.append((current_title, current_lines))
+            current_title, current_lines = line.strip(), [line]
+        else:
+            current_lines.append(line)
+    if current_lines:
+        sections.append((current_title, current_lines))
+
+    chunks = []
+    for title, lines in sections:
+        body = "\n".join(lines)
+        for piece in chunk_text(body):
+            if title:
+                symptoms = [WRITTEN_DOC_SECTIONS[title]]
+                if not piece.startswith(title):
+                    piece = f"{title}\n{piece}"
+            else:
+                # Overview and immediate-alert preamble applies to every conversation
+                symptoms = sorted(set(detect_symptoms(piece)) | {"general"})
+            chunks.append((piece, symptoms))
+    return chunks
+
+
+def chunk_pdf(path: str) -> List[Tuple[str, List[str]]]:
+    """Chunks a PDF page by page so chunks never straddle unrelated toolkit pages."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    chunks = []
+    for page_no, page in enumerate(reader.pages, start=1):
+        page_text = page.extract_text() or ""
+        for piece in chunk_text(page_text):
+            chunks.append((f"[page {page_no}]\n{piece}", detect_symptoms(piece)))
+    return chunks
+
+
+def ingest_base_documents(
+    alerts_path="model_inputs/oncolife_alerts_configuration.txt",
+    written_path="model_inputs/written_chatbot_docs.txt",
+    ukons_path="model_inputs/ukons_triage_toolkit_v3_final.pdf",
+):
+    with stats.stage("chunk:alert") as stage:
+        with open(alerts_path, "r") as f:
+            alert_chunks = chunk_alerts(f.read())
+        stage["items"] = len(alert_chunks)
+    print(f"[INGEST] Created {len(alert_chunks)} alert chunks from {alerts_path}")
+    upsert_chunks(alert_chunks, "alert", os.path.basename(alerts_path))
+
+    with stats.stage("chunk:written_doc") as stage:
+        with open(written_path, "r") as f:
+            written_chunks = chunk_written_docs(f.read())
+        stage["items"] = len(written_chunks)
+    print(f"[INGEST] Created {len(written_chunks)} written doc chunks from {written_path}")
+    upsert_chunks(written_chunks, "written_doc", os.path.basename(written_path))
+
+    with stats.stage("chunk:ukons") as stage:
+        ukons_chunks = chunk_pdf(ukons_path)
+        stage["items"] = len(ukons_chunks)
+    print(f"[INGEST] Created {len(ukons_chunks)} UKONS chunks from {ukons_path}")
+    upsert_chunks(ukons_chunks, "ukons", os.path.basename(ukons_path))
+
+
+def main(argv: Optional[List[str]] = None):
+    global BATCH_SIZE
+    parser = argparse.ArgumentParser(description="Ingest model inputs into Pinecone.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Use a local hashing embedder and in-memory index (no network, no API keys)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--only", nargs="+", choices=["ctcae", "questions", "base"],
+                        default=["ctcae", "questions", "base"])
+    args = parser.parse_args(argv)
+    BATCH_SIZE = args.batch_size
+
+    print(f"🔧 Configuration:")
+    print(f"  Mode: {'dry-run' if args.dry_run else 'live'}")
+    print(f"  Index: {INDEX_NAME}")
+    print(f"  Cloud: {CLOUD}")
+    print(f"  Region: {REGION}")
+    print(f"  Embedding Model: {EMBED_MODEL}")
+    print(f"  Dimension: {EMBED_DIM}")
+    print(f"  Namespaces per type: {USE_NAMESPACES}")
+    print(f"  Batch size: {BATCH_SIZE}")
+
+    if args.dry_run:
+        use_dry_run()
+    else:
+        connect()
+
     # Run from repo root or adjust path
     ctcae_path = os.getenv("CTCAE_JSON", "model_inputs/CTCAE.json")
     questions_path = os.getenv("QUESTIONS_JSON", "model_inputs/questions.json")
 
-    ingest_ctcae(ctcae_path, version="CTCAE v5")
-    ingest_questions(questions_path)
-    print("[INGEST] Done.") 
\ No newline at end of file
+    with stats.stage("total"):
+        if "ctcae" in args.only:
+            ingest_ctcae(ctcae_path, version="CTCAE v5")
+        if "questions" in args.only:
+            ingest_questions(questions_path)
+        if "base" in args.only:
+            ingest_base_documents(
+                os.getenv("ALERTS_TXT", "model_inputs/oncolife_alerts_configuration.txt"),
+                os.getenv("WRITTEN_DOCS_TXT", "model_inputs/written_chatbot_docs.txt"),
+                os.getenv("UKONS_PDF", "model_inputs/ukons_triage_toolkit_v3_final.pdf"),
+            )
+    stats.report()
+    if args.dry_run:
+        print(f"[INGEST] In-memory index holds {index.count()} vectors")
+    print("[INGEST] Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
-from typing import Generator
+from typing import Generator, Iterator
+from contextlib import contextmanager
 import logging
 import urllib.parse
 
@@ -31,9 +32,41 @@ DATABASE_CONFIG = {
     }
 }
 
+# --- Pool Sizes ---
+# Pool for the REST routes (and anything else using the session dependencies below)
+DB_POOL_SIZE = 5
+DB_MAX_OVERFLOW = 10
+# Separate pool for the chat WebSocket path, which takes a short-lived session per
+# DB operation (see chat_db_session), so open chats never hold REST connections
+CHAT_DB_POOL_SIZE = int(os.getenv("CHAT_DB_POOL_SIZE", "8"))
+CHAT_DB_MAX_OVERFLOW = int(os.getenv("CHAT_DB_MAX_OVERFLOW", "2"))
+# Seconds to wait for a chat pool connection before failing the operation
+CHAT_DB_POOL_TIMEOUT = float(os.getenv("CHAT_DB_POOL_TIMEOUT", "10"))
+
+
+def _create_engine(conn_url: str, application_name: str, **pool_options):
+    # Add SSL mode and connection pooling for AWS RDS
+    return create_engine(
+        conn_url,
+        pool_pre_ping=True,  # Test connections before use
+        pool_recycle=1800,   # Recycle connections every 30 minutes
+        connect_args={
+            "sslmode": "require",  # Force SSL for AWS RDS
+            "keepalives": 1,
+            "keepalives_idle": 30,
+            "keepalives_interval": 10,
+            "keepalives_count": 5,
+            "connect_timeout": 10,
+            "application_name": application_name
+        },
+        **pool_options
+    )
+
+
 # --- SQLAlchemy Engine Creation ---
 # Create a separate engine for each database found in the config.
 engines = {}
+chat_engine = None
 for db_name, config in DATABASE_CONFIG.items():
     if all(config.values()):  # Only create an engine if all details are provided
         # URL encode the password to handle special characters
@@ -45,27 +78,25 @@ for db_name, config in DATABASE_CONFIG.items():
         )
         logger.info(f"-----------------------------------Connecting to {db_name}: {config['user']}@{config['host']}:{config['port']}/{config['name']}")
         
-        # Add SSL mode and connection pooling for AWS RDS
-        engines[db_name] = create_engine(
-            conn_url,
-            pool_pre_ping=True,  # Test connections before use
-            pool_recycle=1800,   # Recycle connections every 30 minutes
-            pool_size=5,         # Limit pool size
-            max_overflow=10,     # Allow some overflow
-            connect_args={
-                "sslmode": "require",  # Force SSL for AWS RDS
-                "keepalives": 1,
-                "keepalives_idle": 30,
-                "keepalives_interval": 10,
-                "keepalives_count": 5,
-                "connect_timeout": 10,
-                "application_name": "oncolife-api"
-            }
+        engines[db_name] = _create_engine(
+            conn_url, "oncolife-api",
+            pool_size=DB_POOL_SIZE,        # Limit pool size
+            max_overflow=DB_MAX_OVERFLOW,  # Allow some overflow
         )
+        if db_name == "patient_db":
+            chat_engine = _create_engine(
+                conn_url, "oncolife-api-chat",
+                pool_size=CHAT_DB_POOL_SIZE,
+                max_overflow=CHAT_DB_MAX_OVERFLOW,
+                pool_timeout=CHAT_DB_POOL_TIMEOUT,
+            )
 
 # --- Session Factories ---
 # Create a session factory for each engine.
 SessionFactories = {name: sessionmaker(autocommit=False, autoflush=False, bind=engine) for name, engine in engines.items()}
+# Chat sessions keep attributes loaded after commit: the WebSocket path holds the chat
+# between operations, detached from any session
+ChatSessionFactory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=chat_engine) if chat_engine else None
 
 # --- Database Dependencies ---
 # These are the reusable dependencies that our API routes will use.
@@ -92,3 +123,15 @@ def get_doctor_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close() 
+
+@contextmanager
+def chat_db_session() -> Iterator[Session]:
+    """A short-lived Patient Database session from the chat pool, for one operation of the WebSocket path."""
+    if ChatSessionFactory is None:
+        raise RuntimeError("Patient database is not configured. Check your .env file.")
+
+    db = ChatSessionFactory()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -31,6 +31,16 @@ class Conversations(Base):
     medication_list = Column(JSONB, nullable=True)
     bulleted_summary = Column(Text, nullable=True)
     overall_feeling = Column(String, nullable=True)
+    # Running summary of turns older than the verbatim window (see routers/chat/history.py)
+    history_summary = Column(JSONB, nullable=True)
+    # Server-side conversation state for stateful providers (see routers/chat/llm/responses.py)
+    provider_response_id = Column(String, nullable=True)
+    provider_context = Column(JSONB, nullable=True)
+    # Structured answers by symptom ({symptom: {data_attribute: value}}) and alert rules they triggered
+    symptom_answers = Column(JSONB, nullable=True)
+    triggered_alerts = Column(JSONB, nullable=True)
+    # Short-phase question sequence ({"pending": question id, "done": [ids]}, see routers/chat/questions.py)
+    question_state = Column(JSONB, nullable=True)
 
     # Relationship to the Messages table
     messages = relationship(
@@ -40,6 +50,11 @@ class Conversations(Base):
         order_by="Messages.created_at"
     )
 
+    # updated_at is the row version: UPDATEs are conditional on the value this session
+    # loaded (StaleDataError on mismatch) and the new value comes back via RETURNING.
+    # WebSocket connections keep the chat in memory and rely on this to detect other writers.
+    __mapper_args__ = {"version_id_col": updated_at, "version_id_generator": False}
+
 class Messages(Base):
     __tablename__ = 'messages'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -53,6 +68,9 @@ class Messages(Base):
     
     conversation = relationship("Conversations", back_populates="messages")
 
+    # Fetch the server-generated id and created_at with INSERT ... RETURNING instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
 
 class PatientChemoDates(Base):
     __tablename__ = 'patient_chemo_dates'
@@ -4,7 +4,7 @@ import os
 # Load environment variables from .env file
 load_dotenv()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from routers.auth.auth_routes import router as auth_router
 from routers.patient.patient_routes import router as patient_router
@@ -13,6 +13,17 @@ from routers.diary.diary_routes import router as diary_router
 from routers.summaries.summaries_routes import router as summaries_router
 from routers.chemo.chemo_routes import router as chemo_router
 from routers.chat.chat_routes import router as chat_router
+from routers.auth.dependencies import get_current_user
+from routers.chat.llm.registry import provider_registry
+from routers.chat.llm.metrics import metrics
+from routers.chat.llm.cache import check_cache_config
+from routers.chat.services import LLM_PROVIDER, routing_policy
+from routers.chat.grading import get_ctcae_index
+from routers.chat.alerts import get_alert_rules
+from routers.chat.questions import get_short_questions
+from routers.chat.mentions import get_mention_detector
+from routers.chat.loop_monitor import loop_monitor
+from routers.chat.db_executor import shutdown_db_executor, instrument_db_pools
 
 app = FastAPI()
 
@@ -41,6 +52,42 @@ app.include_router(summaries_router)
 app.include_router(chemo_router)
 app.include_router(chat_router)
 
+@app.on_event("startup")
+async def warm_llm_providers():
+    active = [LLM_PROVIDER] + ([routing_policy.fast_provider] if routing_policy.enabled else [])
+    check_cache_config(active)
+    # Open pooled, keep-alive connections to the model providers before the first chat turn
+    await provider_registry.warm_up()
+
+@app.on_event("startup")
+async def load_clinical_rules():
+    # Parse CTCAE.json, the alert rules and questions.json once, before the first chat turn
+    get_ctcae_index()
+    get_alert_rules()
+    get_short_questions()
+    get_mention_detector()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    # Event-loop lag shows whether anything is blocking the chat sockets, and pool
+    # saturation whether open chats or REST requests are short of connections
+    loop_monitor.start()
+    instrument_db_pools()
+
+@app.on_event("shutdown")
+async def close_llm_providers():
+    await provider_registry.aclose()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await loop_monitor.stop()
+    shutdown_db_executor()
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+# Same authentication as the API routes; the metrics expose route and alert activity
+@app.get("/metrics/llm", dependencies=[Depends(get_current_user)])
+async def llm_metrics():
+    return metrics.snapshot()
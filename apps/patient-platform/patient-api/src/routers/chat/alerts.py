@@ -0,0 +1,441 @@
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm.metrics import metrics
+
+# Rules with this override grade (the "immediate red-flag overrides") end the chat as an emergency
+EMERGENCY_GRADE = 4
+
+# Answer scope holding attributes not tied to one symptom (e.g. extracted from free text)
+GLOBAL_SCOPE = "_"
+
+# Red flags any rule can read whatever symptom they were reported under: pulled from
+# free text into the global scope, and copied there when a question records them
+SHARED_ATTRIBUTES = frozenset({"temp_f", "fever_reported", "trouble_breathing", "chest_pain", "bleeding_significant"})
+# Rules for these run for every chat; the rest only for symptoms the patient has answers for,
+# so e.g. a fever does not raise ALERT_COUGH_FEVER_OR_SPO2 for a patient without a cough
+RED_FLAG_SYMPTOMS = frozenset({"trouble_breathing", "chest_pain", "significant_bleeding", "dehydration", "fever"})
+# Numeric attributes some questions ask as yes/no ("Do you have a fever over 100.4°F?"
+# records temp_f). A yes/no answer is recorded under its own attribute instead, which
+# the rules read alongside the number (`temp_f > 100.4 or fever_reported == true`)
+FLAG_ATTRIBUTES = {"temp_f": "fever_reported", "weight_loss_pct": "weight_loss_reported"}
+# Added to each symptom's answers before the rules run (see ConversationService._apply_alert_rules)
+COMPUTED_ATTRIBUTES = frozenset({"ctcae_grade"})
+# Rule variables that no question in questions.json asks for the rule's symptom. They
+# only reach the rules as structured answers (`structured_data.data_attribute`); listed
+# here so the load-time check (check_rule_sources) fails on anything else, e.g. a typo
+# or a renamed question attribute.
+UNASKED_ATTRIBUTES: Dict[str, frozenset] = {
+    "dehydration": frozenset({"heart_rate", "sbp"}),
+    "diarrhea": frozenset({"abdominal_pain_severity", "dehydration"}),
+    "eye_complaints": frozenset({"days_in_a_row"}),
+    "mouth_sores": frozenset({"days_in_a_row"}),
+    "no_appetite": frozenset({"difficulty_swallowing"}),
+    "skin_rash": frozenset({"rash_swelling", "blistering", "redness", "open_wound", "chills", "adl_interference"}),
+    "swelling": frozenset({"swelling_location", "swelling_redness", "swelling_pain_severity"}),
+    "cough": frozenset({"cough_prevents_adl", "spo2"}),
+    "neuropathy": frozenset({"neuropathy_severity", "interferes_with_adl", "days_in_a_row"}),
+}
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+class AlertRuleError(ValueError):
+    """Raised when an alert rule or its `when` expression cannot be parsed."""
+
+
+# ===============================================================================
+# `when` expression compiler
+# ===============================================================================
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op>==|!=|>=|<=|>|<)
+      | (?P<punct>[()\[\],])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise AlertRuleError(f"Unexpected input at {pos} in: {expression}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+def _normalize(value: Any) -> Any:
+    """Normalizes answer values: "yes"/"true" -> True, numeric strings -> float, strings lower-cased."""
+    if isinstance(value, (list, tuple)):
+        # Multi-select answers
+        return [_normalize(v) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    if text in ("true", "yes", "y"):
+        return True
+    if text in ("false", "no", "n"):
+        return False
+    try:
+        return float(text.rstrip("%°f ").strip())
+    except ValueError:
+        return text
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    # Unknown (unanswered) attributes never trigger a rule
+    if left is None:
+        return False
+    if isinstance(left, list):
+        # A multi-select answer matches if any selected value does
+        return any(_compare(op, item, right) for item in left)
+    if op == "==":
+        return left == right
+    if op == "!=":
+        return left != right
+    if op == "in":
+        return left in right
+    if not isinstance(left, float) or not isinstance(right, float):
+        return False
+    return {">": left > right, "<": left < right, ">=": left >= right, "<=": left <= right}[op]
+
+
+class _Parser:
+    """Recursive-descent compiler: or > and > comparison / parentheses."""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.variables: List[str] = []
+        # (attribute, literal) for every comparison, for checking literals against the question options
+        self.comparisons: List[Tuple[str, Any]] = []
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self, kind: Optional[str] = None, value: Optional[str] = None) -> str:
+        tok_kind, tok_value = self._peek()
+        if tok_kind is None or (kind and tok_kind != kind) or (value and tok_value != value):
+            raise AlertRuleError(f"Expected {value or kind} at token {self.pos} in: {self.expression}")
+        self.pos += 1
+        return tok_value
+
+    def compile(self) -> Predicate:
+        predicate = self._or()
+        if self.pos != len(self.tokens):
+            raise AlertRuleError(f"Unexpected trailing input in: {self.expression}")
+        return predicate
+
+    def _or(self) -> Predicate:
+        terms = [self._and()]
+        while self._peek() == ("name", "or"):
+            self._take()
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else (lambda a, t=tuple(terms): any(p(a) for p in t))
+
+    def _and(self) -> Predicate:
+        terms = [self._atom()]
+        while self._peek() == ("name", "and"):
+            self._take()
+            terms.append(self._atom())
+        return terms[0] if len(terms) == 1 else (lambda a, t=tuple(terms): all(p(a) for p in t))
+
+    def _atom(self) -> Predicate:
+        if self._peek() == ("punct", "("):
+            self._take()
+            inner = self._or()
+            self._take("punct", ")")
+            return inner
+        name = self._take("name")
+        self.variables.append(name)
+        kind, value = self._peek()
+        if kind == "name" and value == "in":
+            self._take()
+            options = frozenset(self._list())
+            self.comparisons.extend((name, o) for o in options)
+            return lambda a, n=name, o=options: _compare("in", _normalize(a.get(n)), o)
+        op = self._take("op")
+        literal = self._literal()
+        self.comparisons.append((name, literal))
+        return lambda a, n=name, o=op, r=literal: _compare(o, _normalize(a.get(n)), r)
+
+    def _list(self) -> List[Any]:
+        self._take("punct", "[")
+        values = []
+        while self._peek() != ("punct", "]"):
+            values.append(self._literal())
+            if self._peek() == ("punct", ","):
+                self._take()
+        self._take("punct", "]")
+        return values
+
+    def _literal(self) -> Any:
+        kind, value = self._peek()
+        self.pos += 1
+        if kind == "number":
+            return float(value)
+        if kind == "string":
+            return value[1:-1].strip().lower()
+        if kind == "name" and value in ("true", "false"):
+            return value == "true"
+        raise AlertRuleError(f"Expected a literal, got {value!r} in: {self.expression}")
+
+
+def compile_expression(expression: str) -> Tuple[Predicate, List[str], List[Tuple[str, Any]]]:
+    """
+    Compiles a `when:` expression into a predicate over an attribute dict, plus the
+    attributes it reads and the (attribute, literal) pairs it compares.
+    """
+    parser = _Parser(expression)
+    return parser.compile(), parser.variables, parser.comparisons
+
+
+# ===============================================================================
+# Rules
+# ===============================================================================
+
+class AlertRule:
+    def __init__(self, id: str, symptom: str, when: str, override_to_grade: int,
+                 long_q_ids: List[str], reason: str):
+        self.id = id
+        self.symptom = symptom
+        self.when = when
+        self.override_to_grade = override_to_grade
+        self.long_q_ids = long_q_ids
+        self.reason = reason
+        self.predicate, self.variables, self.comparisons = compile_expression(when)
+
+    @property
+    def is_emergency(self) -> bool:
+        return self.override_to_grade >= EMERGENCY_GRADE
+
+    def matches(self, attributes: Dict[str, Any]) -> bool:
+        return self.predicate(attributes)
+
+    def __repr__(self):
+        return f"AlertRule({self.id}: {self.when} -> grade {self.override_to_grade})"
+
+
+def parse_alert_rules(text: str) -> List[AlertRule]:
+    """
+    Parses oncolife_alerts_configuration.txt: blocks of `id:`, `symptom:`, `when:`,
+    `override_to_grade:`, `long_q_ids:` (inline list or quoted lines) and `reason:`.
+    Section headings and blank lines between blocks are ignored.
+    """
+    rules, current, in_questions = [], None, False
+
+    def _finish():
+        if current and current.get("when"):
+            rules.append(AlertRule(
+                id=current["id"],
+                symptom=current.get("symptom", ""),
+                when=current["when"],
+                override_to_grade=int(current.get("override_to_grade", 0)),
+                long_q_ids=current.get("long_q_ids", []),
+                reason=current.get("reason", ""),
+            ))
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        key, sep, value = line.partition(":")
+        key, value = key.strip(), value.strip()
+        if sep and key == "id":
+            _finish()
+            current, in_questions = {"id": value, "long_q_ids": []}, False
+        elif current is None:
+            continue
+        elif sep and key in ("symptom", "when", "override_to_grade"):
+            current[key], in_questions = value, False
+        elif sep and key == "reason":
+            current["reason"], in_questions = value.strip('"'), False
+        elif sep and key == "long_q_ids":
+            inline = value.split("#", 1)[0].strip()
+            in_questions = not inline
+        elif in_questions and line.startswith('"'):
+            current["long_q_ids"].append(line.strip('"'))
+    _finish()
+    return rules
+
+
+_rules: Optional[List[AlertRule]] = None
+_rules_lock = threading.Lock()
+
+
+def _alerts_path() -> str:
+    model_inputs_path = "/app/model_inputs"
+    if not os.path.exists(model_inputs_path):
+        model_inputs_path = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs'))
+    return os.path.join(model_inputs_path, "oncolife_alerts_configuration.txt")
+
+
+def check_rule_sources(rules: List[AlertRule], catalog: Dict[str, Dict[str, Optional[List[str]]]]):
+    """
+    Checks that every attribute a rule reads is recorded by some source: a question
+    for the rule's symptom, a shared red flag, a computed attribute or a declared
+    UNASKED_ATTRIBUTES entry. String literals compared with a select question's
+    attribute must be one of its option values.
+
+    Args:
+        catalog: {symptom: {data_attribute: option values or None}}, from questions.question_catalog().
+
+    Raises:
+        AlertRuleError: Listing every rule variable or literal nothing can produce.
+    """
+    shared = set(SHARED_ATTRIBUTES) | set(COMPUTED_ATTRIBUTES)
+    problems = []
+    for rule in rules:
+        asked = catalog.get(rule.symptom, {})
+        known = shared | set(asked) | set(UNASKED_ATTRIBUTES.get(rule.symptom, ()))
+        known |= {FLAG_ATTRIBUTES[a] for a in asked if a in FLAG_ATTRIBUTES}
+        for name in dict.fromkeys(rule.variables):
+            if name not in known:
+                problems.append(f"{rule.id}: `{name}` is not an attribute of any {rule.symptom} question")
+        for name, literal in rule.comparisons:
+            options = asked.get(name)
+            if options and isinstance(literal, str) and literal not in options:
+                problems.append(f"{rule.id}: {name} == {literal!r} is not one of the options {options}")
+    if problems:
+        raise AlertRuleError("Alert rules read attributes no question records:\n  " + "\n  ".join(problems))
+
+
+def get_alert_rules() -> List[AlertRule]:
+    """
+    Alert rules, parsed, compiled and checked against questions.json once per process.
+
+    Raises:
+        AlertRuleError: A rule cannot be parsed or reads an attribute nothing records.
+    """
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                from .questions import question_catalog
+                with open(_alerts_path(), "r") as f:
+                    rules = parse_alert_rules(f.read())
+                check_rule_sources(rules, question_catalog())
+                _rules = rules
+                unasked = sorted({f"{r.symptom}.{v}" for r in rules for v in r.variables
+                                  if v in UNASKED_ATTRIBUTES.get(r.symptom, ())})
+                print(f"[ALERTS] Compiled {len(_rules)} alert rules")
+                print(f"[ALERTS] Rule attributes only set by structured answers: {', '.join(unasked)}")
+    return _rules
+
+
+def evaluate_alerts(answers: Dict[str, Dict[str, Any]], rules: Optional[List[AlertRule]] = None) -> List[AlertRule]:
+    """
+    Returns the rules triggered by the answers. `answers` maps a symptom to its
+    `data_attribute` values; each rule sees the global scope overlaid with the
+    answers for its own symptom. Rules for a symptom without answers run only for
+    the RED_FLAG_SYMPTOMS.
+    """
+    global_answers = answers.get(GLOBAL_SCOPE, {})
+    triggered = []
+    for rule in rules if rules is not None else get_alert_rules():
+        if rule.symptom not in answers and rule.symptom not in RED_FLAG_SYMPTOMS:
+            continue
+        attributes = {**global_answers, **answers.get(rule.symptom, {})}
+        if rule.matches(attributes):
+            triggered.append(rule)
+    return triggered
+
+
+# ===============================================================================
+# Answer extraction
+# ===============================================================================
+
+_TEMP_RE = re.compile(r"\b(9[5-9]|10[0-7])(\.\d+)?\s*(?:°\s*f?|degrees|deg|f)\b|\btemp(?:erature)?\s*(?:is|of|was)?\s*(9[5-9]|10[0-7])(\.\d+)?", re.I)
+_FREE_TEXT_FLAGS = [
+    ("trouble_breathing", re.compile(r"\b(can'?t|cannot|trouble|hard to|difficulty|struggling to) breath", re.I)),
+    ("trouble_breathing", re.compile(r"\bshort(ness)? of breath\b", re.I)),
+    ("chest_pain", re.compile(r"\bchest (pain|hurts|pressure|tightness)\b", re.I)),
+    ("bleeding_significant", re.compile(r"\bbleeding (won'?t|will not|doesn'?t|does not) stop\b", re.I)),
+]
+
+
+# A negation earlier in the same clause; "but" starts a new clause ("no fever but my feet are numb")
+_NEGATION_RE = re.compile(r"\b(no|not|don'?t|doesn'?t|didn'?t|haven'?t|denies|without|never)\b(?:(?!\bbut\b)[^.,;!?])*$", re.I)
+
+
+def is_negated(text: str, start: int) -> bool:
+    """True if the phrase starting at `start` is negated earlier in the same clause ("no chest pain")."""
+    return bool(_NEGATION_RE.search(text[max(0, start - 40):start]))
+
+
+def extract_text_attributes(text: str) -> Dict[str, Any]:
+    """Pulls red-flag attributes (temperature, breathing, chest pain, bleeding) out of free text."""
+    attributes: Dict[str, Any] = {}
+    if not text:
+        return attributes
+    match = _TEMP_RE.search(text)
+    if match:
+        whole, frac = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        attributes["temp_f"] = float(whole + (frac or ""))
+    for attribute, pattern in _FREE_TEXT_FLAGS:
+        for flag in pattern.finditer(text):
+            if not is_negated(text, flag.start()):
+                attributes[attribute] = True
+                break
+    return attributes
+
+
+def merge_answers(answers: Dict[str, Dict[str, Any]], scope: str, attributes: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns a new answers dict with `attributes` recorded under `scope`. Shared red
+    flags (SHARED_ATTRIBUTES) are also recorded in the global scope, so e.g. the
+    fever questions' trouble_breathing answer reaches ALERT_TROUBLE_BREATHING. A
+    yes/no answer to a numeric attribute goes to its FLAG_ATTRIBUTES attribute.
+    """
+    attributes = {
+        FLAG_ATTRIBUTES[k] if k in FLAG_ATTRIBUTES and isinstance(_normalize(v), bool) else k: v
+        for k, v in attributes.items()
+    }
+    merged = {k: dict(v) for k, v in (answers or {}).items()}
+    merged.setdefault(scope or GLOBAL_SCOPE, {}).update(attributes)
+    shared = {k: v for k, v in attributes.items() if k in SHARED_ATTRIBUTES}
+    if shared:
+        merged.setdefault(GLOBAL_SCOPE, {}).update(shared)
+    return merged
+
+
+# ===============================================================================
+# Escalation
+# ===============================================================================
+
+# Called with (chat_uuid, triggered rules); register a notifier here to page the care team
+escalation_handlers: List[Callable[[Any, List[AlertRule]], None]] = []
+
+
+def alert_record(rule: AlertRule) -> Dict[str, Any]:
+    """JSON-serializable record of a triggered rule, as stored on the conversation."""
+    return {
+        "id": rule.id,
+        "symptom": rule.symptom,
+        "grade": rule.override_to_grade,
+        "reason": rule.reason,
+        "triggered_at": datetime.utcnow().isoformat(),
+    }
+
+
+def escalate_alerts(chat_uuid: Any, rules: List[AlertRule]):
+    """Logs, counts and hands newly triggered rules to the registered escalation handlers."""
+    for rule in rules:
+        print(f"[ALERTS][ESCALATE] chat={chat_uuid} rule={rule.id} symptom={rule.symptom} grade={rule.override_to_grade}")
+        metrics.incr("chat_alerts_triggered_total", rule=rule.id, grade=rule.override_to_grade)
+    for handler in escalation_handlers:
+        try:
+            handler(chat_uuid, rules)
+        except Exception as e:
+            print(f"[ALERTS][ESCALATE] handler failed: {e}")
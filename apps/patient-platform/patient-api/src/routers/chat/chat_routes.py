@@ -27,6 +27,9 @@ from .models import (
     Message  # Import the Message model for manual conversion
 )
 from .services import ConversationService
+from .speculation import speculative_followups
+from .db_executor import run_db
+from .connection_state import ChatConnectionState
 from db.patient_models import Conversations as ChatModel, Messages as MessageModel
 from utils.timezone_utils import utc_to_user_timezone
 
@@ -419,12 +422,13 @@ def update_overall_feeling(
 async def websocket_endpoint(
     websocket: WebSocket,
     chat_uuid: UUID,
-    token: str = Query(...),
-    db: Session = Depends(get_patient_db)
+    token: str = Query(...)
 ):
     """
     Handles real-time, bidirectional communication for a single chat session.
     The connection is authenticated and authorized using a JWT token from query params.
+    The socket holds no DB session: each DB operation takes a short-lived one from
+    the chat pool, so open chats do not use up connections the REST routes need.
     """
     # 1. Authenticate the user
     current_user = await get_user_from_token(token)
@@ -432,17 +436,15 @@ async def websocket_endpoint(
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token.")
         return
 
-    # 2. Authorize the user for the chat
-    chat = db.query(ChatModel).filter(
-        ChatModel.uuid == chat_uuid,
-        ChatModel.patient_uuid == UUID(current_user.sub)
-    ).first()
-    if not chat:
+    # 2. Authorize the user for the chat and load its conversation state once for the
+    #    connection. DB calls on this path run on the DB thread pool.
+    state = await run_db(ChatConnectionState.load, chat_uuid, UUID(current_user.sub))
+    if not state:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Chat not found or access denied.")
         return
 
     await websocket.accept()
-    service = ConversationService(db)
+    service = ConversationService()
     
     # Send connection acknowledgment
     ack_message = service.get_connection_ack(chat_uuid)
@@ -453,9 +455,14 @@ async def websocket_endpoint(
         while True:
             data = await websocket.receive_text()
             message_data = WebSocketMessageIn(**json.loads(data))
+
+            if message_data.type == "selection_update":
+                # Partial symptom selection: start on the first follow-up speculatively
+                await service.start_speculative_followup(chat_uuid, message_data.content, state)
+                continue
             
             # This now returns a generator, so we iterate over it without awaiting it first
-            response_generator = service.process_message_stream(chat_uuid, message_data)
+            response_generator = service.process_message_stream(chat_uuid, message_data, state)
             
             async for chunk in response_generator:
                 # Convert message before sending to frontend
@@ -470,4 +477,6 @@ async def websocket_endpoint(
         logger.error(f"[CHAT] An error occurred in chat {chat_uuid}: {e}")
         # Truncate the error reason to prevent WebSocket protocol errors
         reason = str(e)[:120] + "..." if len(str(e)) > 120 else str(e)
-        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason=reason) 
\ No newline at end of file
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason=reason)
+    finally:
+        speculative_followups.discard(chat_uuid) 
\ No newline at end of file
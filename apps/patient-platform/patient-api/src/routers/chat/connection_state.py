@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
+
+from .models import Message
+from .history import HistoryManager
+from .db_executor import chat_session
+from .llm.metrics import metrics
+from db.patient_models import Conversations as ChatModel, Messages as MessageModel
+
+# Rebuilt from the reloaded messages after a conflict rather than re-applied
+_RESYNC_DERIVED = {"history_summary"}
+
+
+class ChatConnectionState:
+    """
+    Conversation state for one WebSocket connection: the chat row and the window of
+    recent messages sent to the model. Loaded once on connect and updated in place as
+    the connection saves messages, so a turn reads neither the chat nor its history
+    from the database. The chat is held detached: each load and save takes a
+    short-lived session from the chat pool, so an open socket holds no connection
+    between operations.
+
+    Another writer (a second tab, a REST update) is detected on this connection's next
+    save: every save updates the chat row conditionally on `updated_at` (the mapper's
+    version column). On a conflict the state is re-synced from the database and the
+    turn's chat changes are re-applied on top.
+    """
+
+    def __init__(self, chat: ChatModel):
+        self.chat = chat
+        # Kept apart from the row: an expired chat that was deleted cannot be read
+        self.chat_uuid = chat.uuid
+        self.history_manager = HistoryManager()
+        self.messages: List[Message] = []
+        self._dumps: List[Dict[str, Any]] = []
+
+    @classmethod
+    def load(cls, chat_uuid: UUID, patient_uuid: Optional[UUID] = None) -> Optional["ChatConnectionState"]:
+        """Loads the chat (owned by `patient_uuid` when given) and its history window, or None."""
+        with chat_session() as db:
+            query = db.query(ChatModel).filter(ChatModel.uuid == chat_uuid)
+            if patient_uuid is not None:
+                query = query.filter(ChatModel.patient_uuid == patient_uuid)
+            chat = query.first()
+            if chat is None:
+                return None
+            state = cls(chat)
+            state._load_history(db)
+            return state
+
+    def _load_history(self, db: Session):
+        self.messages, _ = self.history_manager.window(self.chat, db)
+        self._dumps = [m.model_dump(mode='json') for m in self.messages]
+
+    def history(self) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """(recent messages as dicts, running summary or None), as HistoryManager.load returns them."""
+        return list(self._dumps), (self.chat.history_summary or None)
+
+    def append(self, *rows: MessageModel):
+        """Adds saved messages to the window, folding the oldest turns into the summary when it is full."""
+        for row in rows:
+            message = Message.from_orm(row)
+            self.messages.append(message)
+            self._dumps.append(message.model_dump(mode='json'))
+        kept, _ = self.history_manager.fold(self.chat, self.messages)
+        if len(kept) < len(self.messages):
+            self._dumps = self._dumps[len(self.messages) - len(kept):]
+            self.messages = kept
+
+    def _resync(self, db: Session) -> bool:
+        """Reloads the chat row and history window. False if the chat no longer exists."""
+        chat = db.query(ChatModel).populate_existing().filter(ChatModel.uuid == self.chat_uuid).first()
+        if chat is None:
+            return False
+        self.chat = chat
+        self._load_history(db)
+        return True
+
+    def save(self, *rows: MessageModel):
+        """
+        Inserts `rows` and commits them with the pending chat changes in one transaction,
+        then appends them to the window. Ids and timestamps come back from the INSERT ...
+        RETURNING (see Messages.__mapper_args__). On a version conflict, re-syncs,
+        re-applies this turn's chat changes and retries once.
+
+        Raises:
+            ValueError: The chat was deleted by another writer.
+        """
+        changes = {
+            attr.key: attr.value for attr in inspect(self.chat).attrs
+            if attr.key not in _RESYNC_DERIVED and attr.history.has_changes()
+        }
+        with chat_session() as db:
+            # Re-attach the detached chat with its pending changes. Every save updates the
+            # row, so each write is checked against (and bumps) the version this connection has seen
+            db.add(self.chat)
+            flag_modified(self.chat, "conversation_state")
+            db.add_all(rows)
+            try:
+                db.commit()
+            except StaleDataError:
+                db.rollback()
+                metrics.incr("chat_state_conflicts_total")
+                print(f"[CHAT] Chat {self.chat_uuid} was changed by another writer; re-syncing connection state")
+                if not self._resync(db):
+                    raise ValueError("Chat not found or access denied.")
+                for key, value in changes.items():
+                    setattr(self.chat, key, value)
+                flag_modified(self.chat, "conversation_state")
+                db.add_all(rows)
+                db.commit()
+        self.append(*rows)
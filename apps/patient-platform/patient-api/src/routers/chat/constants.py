@@ -8,4 +8,23 @@ class ConversationState(str, Enum):
     SYMPTOM_SELECTION_SENT = "symptom_selection_sent"
     FOLLOWUP_QUESTIONS = "followup_questions"
     COMPLETED = "COMPLETED"
-    EMERGENCY = "EMERGENCY" 
\ No newline at end of file
+    EMERGENCY = "EMERGENCY"
+
+# Options of the symptom selection question, in display order
+SYMPTOM_OPTIONS = [
+    "Fever",
+    "Diarrhea",
+    "Pain",
+    "Nausea",
+    "Vomiting",
+    "Cough",
+    "Fatigue",
+    "Swelling",
+    "Numbness or Tingling",
+    "Constipation",
+    "Mouth or Throat Sores",
+    "Rash",
+    "Urinary Issues",
+    "Other",
+    "None"
+]
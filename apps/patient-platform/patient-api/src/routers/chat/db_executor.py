@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from .llm.metrics import metrics
+from db.database import (
+    chat_db_session, chat_engine, engines,
+    CHAT_DB_POOL_SIZE, CHAT_DB_MAX_OVERFLOW, DB_POOL_SIZE, DB_MAX_OVERFLOW
+)
+
+T = TypeVar("T")
+
+# Threads running blocking SQLAlchemy work for the chat WebSocket path. Keep this at or
+# below CHAT_DB_POOL_SIZE + CHAT_DB_MAX_OVERFLOW so a worker never waits on a connection.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """The bounded DB thread pool, created on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="chat-db")
+                print(f"[DB] Started chat DB executor with {DB_EXECUTOR_WORKERS} workers")
+    return _executor
+
+
+async def run_db(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Runs a blocking DB call on the DB thread pool, so a slow Postgres round trip
+    stalls only the chat that issued it. Records the time spent queued for a
+    worker and in the call itself.
+
+    A cancelled caller still waits for its call to finish before the cancellation
+    propagates, so the state the call updates (e.g. the connection's chat) is never
+    left half-written while the caller moves on.
+    """
+    loop = asyncio.get_running_loop()
+    op = getattr(fn, "__name__", "call")
+    submitted = time.perf_counter()
+
+    def _call() -> T:
+        started = time.perf_counter()
+        metrics.observe("db_executor_wait_seconds", started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            metrics.observe("db_call_seconds", time.perf_counter() - started, op=op)
+            metrics.add_gauge("db_executor_pending", -1)
+
+    metrics.add_gauge("db_executor_pending", 1)
+    future = loop.run_in_executor(get_db_executor(), _call)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if not future.done():
+            await asyncio.wait([future])
+        raise
+
+
+def shutdown_db_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+@contextmanager
+def chat_session() -> Iterator[Session]:
+    """
+    A short-lived session from the chat pool for one DB operation of the WebSocket
+    path. The connection is checked out up front so the time spent waiting for the
+    pool is recorded separately from the queries.
+    """
+    with chat_db_session() as db:
+        started = time.perf_counter()
+        try:
+            db.connection()
+        except PoolTimeoutError:
+            metrics.incr("db_pool_timeouts_total", pool="chat")
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_wait_seconds", time.perf_counter() - started, pool="chat")
+        yield db
+
+
+class PoolMonitor:
+    """Tracks connections checked out of an engine's pool as `db_pool_checked_out` and `db_pool_saturation` (of pool_size + max_overflow)."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(capacity, 1)
+        self.checked_out = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        event.listen(engine, "checkout", lambda *args: self._update(1))
+        event.listen(engine, "checkin", lambda *args: self._update(-1))
+
+    def _update(self, delta: int):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out + delta)
+            checked_out = self.checked_out
+        metrics.set_gauge("db_pool_checked_out", checked_out, pool=self.name)
+        metrics.set_gauge("db_pool_saturation", checked_out / self.capacity, pool=self.name)
+
+
+_pool_monitors = {}
+
+
+def instrument_db_pools():
+    """Attaches pool monitors to the chat pool and the REST pool of the Patient Database (once)."""
+    pools = [("chat", chat_engine, CHAT_DB_POOL_SIZE + CHAT_DB_MAX_OVERFLOW),
+             ("patient", engines.get("patient_db"), DB_POOL_SIZE + DB_MAX_OVERFLOW)]
+    for name, engine, capacity in pools:
+        if engine is not None and name not in _pool_monitors:
+            _pool_monitors[name] = PoolMonitor(name, capacity)
+            _pool_monitors[name].attach(engine)
@@ -0,0 +1,258 @@
+import os
+import re
+import json
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .questions import symptom_key
+
+# Canonical symptom key (questions.json / alert rules) -> CTCAE term graded for it
+SYMPTOM_TERMS = {
+    "fever": "Fever",
+    "diarrhea": "Diarrhea",
+    "nausea": "Nausea",
+    "vomiting": "Vomiting",
+    "fatigue": "Fatigue",
+    "constipation": "Constipation",
+    "no_appetite": "Anorexia",
+    "mouth_sores": "Mucositis oral",
+    "skin_rash": "Rash maculo-papular",
+    "pain": "Pain",
+    "neuropathy": "Peripheral sensory neuropathy",
+    "cough": "Cough",
+    "swelling": "Edema limbs",
+    "urinary_problems": "Cystitis noninfective",
+    "eye_complaints": "Blurred vision",
+}
+
+# Numeric answers graded against the ranges in the term's grade text, located by the unit after the number
+NUMERIC_CRITERIA = {
+    "fever": [("temp_f", "Fever", r"degrees F")],
+    "diarrhea": [("loose_stools_per_day", "Diarrhea", r"stools")],
+    "vomiting": [("vomit_count_24h", "Vomiting", r"episodes"), ("episodes_per_24h", "Vomiting", r"episodes")],
+    "no_appetite": [("weight_loss_pct", "Weight loss", r"from baseline")],
+    "skin_rash": [("body_coverage_pct", "Rash maculo-papular", r"BSA")],
+}
+
+# Patient-rated severity (mild / moderate / severe) as CTCAE grade ("Mild pain", "Moderate pain", ...)
+SUBJECTIVE_GRADES = {"mild": 1, "moderate": 2, "severe": 3}
+
+# oral_intake_pct as grade for the intake-defined terms (Nausea, Anorexia): usual intake ->
+# appetite loss only (1), reduced intake (2), inadequate intake (3)
+INTAKE_TERMS = {"nausea", "no_appetite", "vomiting", "mouth_sores"}
+
+_BAND_RE = r"(?P<op>[<>]=?)?\s*(?P<lo>\d+(?:\.\d+)?)(?:\s*(?:-|to)\s*(?P<hiop><)?\s*(?P<hi>\d+(?:\.\d+)?))?\s*%?\s*"
+
+
+class Band(NamedTuple):
+    """A numeric range from a grade definition; None bounds are open."""
+    grade: int
+    low: Optional[float]
+    low_inclusive: bool
+    high: Optional[float]
+
+    def admits(self, value: float) -> bool:
+        if self.low is None:
+            return value > 0
+        return value >= self.low if self.low_inclusive else value > self.low
+
+
+class SymptomGrade(NamedTuple):
+    symptom: str
+    term: str
+    grade: int
+    definition: str
+    basis: List[str]
+
+
+class CTCAETerm:
+    """One CTCAE term with its grade definitions (empty definitions are dropped)."""
+
+    def __init__(self, category: str, name: str, grades: Dict[str, str]):
+        self.category = category
+        self.name = name
+        self.grades = {int(g): text for g, text in grades.items() if text and text.strip()}
+
+    def definition(self, grade: int) -> str:
+        return self.grades.get(grade, "")
+
+    def bands(self, unit_pattern: str) -> List[Band]:
+        """
+        Numeric ranges per grade, e.g. Diarrhea: "<4 stools" (1), "4 - 6 stools" (2),
+        ">=7 stools" (3). A grade whose range repeats the previous one (Fever grade 4
+        differs from 3 only in duration) is not a separate band.
+        """
+        pattern = re.compile(_BAND_RE + unit_pattern, re.I)
+        bands: List[Band] = []
+        for grade in sorted(self.grades):
+            match = pattern.search(self.grades[grade])
+            if not match:
+                continue
+            op, lo, hi = match.group("op"), float(match.group("lo")), match.group("hi")
+            if op == "<" or op == "<=":
+                band = Band(grade, None, False, lo)
+            elif op == ">":
+                band = Band(grade, lo, False, float(hi) if hi else None)
+            else:
+                band = Band(grade, lo, True, float(hi) if hi else None)
+            if bands and (bands[-1].low, bands[-1].low_inclusive) == (band.low, band.low_inclusive):
+                continue
+            bands.append(band)
+        return bands
+
+
+class CTCAEIndex:
+    """CTCAE.json indexed by lower-cased term name, with numeric bands parsed once per term and unit."""
+
+    def __init__(self, data: Dict[str, Dict[str, Dict[str, str]]]):
+        self.terms: Dict[str, CTCAETerm] = {}
+        for category, terms in data.items():
+            for name, grades in terms.items():
+                self.terms[name.lower()] = CTCAETerm(category, name, grades)
+        self._bands: Dict[Tuple[str, str], List[Band]] = {}
+
+    def term(self, name: str) -> Optional[CTCAETerm]:
+        return self.terms.get((name or "").lower())
+
+    def bands(self, term_name: str, unit_pattern: str) -> List[Band]:
+        key = (term_name.lower(), unit_pattern)
+        if key not in self._bands:
+            term = self.term(term_name)
+            self._bands[key] = term.bands(unit_pattern) if term else []
+        return self._bands[key]
+
+    def grade_value(self, term_name: str, unit_pattern: str, value: float) -> int:
+        """Highest grade whose range starts at or below `value` (0 when below grade 1)."""
+        grade = 0
+        for band in self.bands(term_name, unit_pattern):
+            if band.admits(value):
+                grade = band.grade
+        return grade
+
+
+_index: Optional[CTCAEIndex] = None
+_index_lock = threading.Lock()
+
+
+def _ctcae_path() -> str:
+    model_inputs_path = "/app/model_inputs"
+    if not os.path.exists(model_inputs_path):
+        model_inputs_path = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs'))
+    return os.path.join(model_inputs_path, "CTCAE.json")
+
+
+def get_ctcae_index() -> CTCAEIndex:
+    """The CTCAE index, loaded once per process."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                with open(_ctcae_path(), "r") as f:
+                    _index = CTCAEIndex(json.load(f))
+                print(f"[GRADING] Indexed {len(_index.terms)} CTCAE terms")
+    return _index
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _intake_grade(pct: Optional[float]) -> int:
+    if pct is None:
+        return 0
+    if pct <= 10:
+        return 3
+    if pct < 100:
+        return 2
+    return 1
+
+
+def grade_symptom(symptom: str, answers: Dict[str, Any], index: Optional[CTCAEIndex] = None) -> Optional[SymptomGrade]:
+    """
+    Grades one symptom from its structured answers: numeric answers against the
+    ranges in the CTCAE definitions, oral intake for intake-defined terms, ADL
+    interference, and the patient's own mild/moderate/severe rating. The highest
+    applicable grade wins.
+
+    Returns:
+        The grade, or None when the symptom has no CTCAE term or no gradable answer.
+    """
+    index = index or get_ctcae_index()
+    term_name = SYMPTOM_TERMS.get(symptom)
+    term = index.term(term_name) if term_name else None
+    if term is None:
+        return None
+
+    # (grade, basis, term whose criteria gave the grade)
+    candidates: List[Tuple[int, str, CTCAETerm]] = []
+    for attribute, criterion_term, unit in NUMERIC_CRITERIA.get(symptom, []):
+        value = _number(answers.get(attribute))
+        if value is not None:
+            candidates.append((index.grade_value(criterion_term, unit, value), f"{attribute}={value:g}",
+                               index.term(criterion_term) or term))
+    if symptom in INTAKE_TERMS and "oral_intake_pct" in answers:
+        pct = _number(answers.get("oral_intake_pct"))
+        candidates.append((_intake_grade(pct), f"oral_intake_pct={answers.get('oral_intake_pct')}", term))
+    for attribute, value in answers.items():
+        if attribute.endswith("interferes_with_adl") and value is True:
+            # "limiting instrumental ADL"
+            candidates.append((2, f"{attribute}=true", term))
+        elif attribute.endswith(("_rating", "_severity")) and str(value).lower() in SUBJECTIVE_GRADES:
+            candidates.append((SUBJECTIVE_GRADES[str(value).lower()], f"{attribute}={value}", term))
+
+    candidates = [c for c in candidates if c[0] > 0]
+    if not candidates:
+        return None
+    top = max(g for g, _, _ in candidates)
+    winners = [c for c in candidates if c[0] == top]
+    # Reported under the symptom's own term unless only another term's criteria reached the
+    # grade, e.g. weight_loss_pct for no_appetite is graded and defined by Weight loss, not Anorexia
+    graded_term = term if any(t is term for _, _, t in winners) else winners[0][2]
+    # Grades above the term's highest defined grade (e.g. grade 3 for Urinary frequency) are capped
+    grade = min(top, max(graded_term.grades, default=top))
+    basis = [b for _, b, t in winners if t is graded_term]
+    return SymptomGrade(symptom, graded_term.name, grade, graded_term.definition(grade), basis)
+
+
+def grade_answers(answers: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, SymptomGrade]:
+    """Grades every symptom in `answers` ({symptom: {data_attribute: value}}) that can be graded locally."""
+    grades = {}
+    for symptom, values in (answers or {}).items():
+        graded = grade_symptom(symptom, values or {})
+        if graded:
+            grades[symptom] = graded
+    return grades
+
+
+def _as_grade(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return SUBJECTIVE_GRADES.get(str(value).lower(), 0)
+
+
+def raise_grades(severity_list: Optional[Dict[str, Any]], grades: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a copy of `severity_list` with each symptom raised to at least its grade
+    in `grades`. Entries are matched by canonical key, so a model-written "Nausea"
+    and a local "nausea" are the same symptom.
+    """
+    severity = dict(severity_list or {})
+    keys = {symptom_key(label): label for label in severity}
+    for symptom, grade in grades.items():
+        label = keys.get(symptom_key(symptom), symptom)
+        severity[label] = max(_as_grade(severity.get(label)), _as_grade(grade))
+    return severity
+
+
+def render_grades(grades: Dict[str, SymptomGrade]) -> str:
+    """Prompt text of the local grades ("" when there are none)."""
+    return "\n".join(
+        f"- {g.symptom}: CTCAE {g.term} grade {g.grade} ({g.definition}; from {', '.join(g.basis)})"
+        for g in grades.values()
+    )
@@ -0,0 +1,194 @@
+import os
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import Message
+from .llm.metrics import metrics
+from db.patient_models import Conversations as ChatModel, Messages as MessageModel
+
+# Most recent user turns (with the assistant question before each) sent verbatim
+HISTORY_VERBATIM_TURNS = int(os.getenv("HISTORY_VERBATIM_TURNS", "6"))
+# Upper bound on facts kept in the running summary of older turns
+HISTORY_SUMMARY_MAX_FACTS = int(os.getenv("HISTORY_SUMMARY_MAX_FACTS", "40"))
+# "compact" (role-tagged lines) or "json"; per provider via HISTORY_ENCODING_<PROVIDER>
+HISTORY_ENCODING = os.getenv("HISTORY_ENCODING", "compact").lower()
+QUESTION_MAX_CHARS = 160
+ANSWER_MAX_CHARS = 200
+
+# Categories kept in preference to "other" when the summary is full
+_CATEGORY_PATTERNS = [
+    ("severity", re.compile(r"\b(rate|rating|scale|severity|severe|how bad|worst|grade|0 to 10|1 to 10)\b", re.I)),
+    ("medication", re.compile(r"\b(medication|medicine|meds|pill|dose|taking|took|prescri\w*|tylenol|ibuprofen|zofran|imodium)\b", re.I)),
+    ("temperature", re.compile(r"\b(temperature|fever|degrees|thermometer)\b", re.I)),
+    ("duration", re.compile(r"\b(how long|since when|how many days|start(ed)?|began)\b", re.I)),
+]
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _clean(text: str, limit: int) -> str:
+    text = " ".join(_TAG_RE.sub(" ", text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _category(question: str, answer: str) -> str:
+    for name, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(question) or pattern.search(answer):
+            return name
+    return "other"
+
+
+def fold_messages(summary: Dict[str, Any], messages: List[Message]) -> Dict[str, Any]:
+    """
+    Folds older messages into the running summary: each user answer becomes one
+    fact paired with the assistant question that preceded it. Rule-based, so it
+    costs no model call.
+
+    Returns:
+        A new summary dict (the input is not modified).
+    """
+    facts = list(summary.get("facts", []))
+    turns = summary.get("turns", 0)
+    question = ""
+    for m in messages:
+        if m.sender == "assistant":
+            question = m.content
+        elif m.sender == "user":
+            turns += 1
+            facts.append({
+                "category": _category(question, m.content),
+                "q": _clean(question, QUESTION_MAX_CHARS),
+                "a": _clean(m.content, ANSWER_MAX_CHARS),
+            })
+            question = ""
+
+    # Bound the summary: drop the oldest uncategorised facts first, then the oldest of any kind
+    while len(facts) > HISTORY_SUMMARY_MAX_FACTS:
+        drop = next((i for i, f in enumerate(facts) if f["category"] == "other"), 0)
+        facts.pop(drop)
+
+    return {
+        "folded_through_id": messages[-1].id if messages else summary.get("folded_through_id", 0),
+        "turns": turns,
+        "facts": facts,
+    }
+
+
+def render_summary(summary: Optional[Dict[str, Any]]) -> str:
+    """Renders the running summary as compact prompt text ("" when there is none)."""
+    if not summary or not summary.get("facts"):
+        return ""
+    lines = [f"({summary.get('turns', 0)} earlier answers, oldest first)"]
+    for fact in summary["facts"]:
+        prefix = f"[{fact['category']}] " if fact.get("category") != "other" else ""
+        lines.append(f"- {prefix}Q: {fact['q']} A: {fact['a']}" if fact.get("q") else f"- {prefix}A: {fact['a']}")
+    return "\n".join(lines)
+
+
+def _history_encoding(provider: Optional[str]) -> str:
+    if provider:
+        return os.getenv(f"HISTORY_ENCODING_{provider.upper()}", HISTORY_ENCODING).lower()
+    return HISTORY_ENCODING
+
+
+def encode_history_json(history: List[Dict[str, Any]]) -> str:
+    """The original encoding: pretty-printed Message dumps."""
+    return json.dumps(history, indent=2)
+
+
+def encode_history_compact(history: List[Dict[str, Any]]) -> str:
+    """
+    One role-tagged line per message, without ids, uuids or timestamps, e.g.
+    `A[single-select]: Do you have a fever? | Yes; No` and `U[button]: Yes`.
+    """
+    lines = []
+    for m in history:
+        role = {"user": "U", "assistant": "A"}.get(m.get("sender"), "S")
+        message_type = (m.get("message_type") or "text").replace("_", "-")
+        if role == "U":
+            # button-response -> button, multi-select-response -> multi-select
+            message_type = message_type.replace("-response", "")
+        tag = f"[{message_type}]" if message_type != "text" else ""
+        content = " / ".join(" ".join(_TAG_RE.sub(" ", line).split()) for line in (m.get("content") or "").splitlines() if line.strip())
+        options = ((m.get("structured_data") or {}).get("options") or []) if isinstance(m.get("structured_data"), dict) else []
+        line = f"{role}{tag}: {content}"
+        if options:
+            line += " | " + "; ".join(str(o) for o in options)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def encode_history(history: List[Dict[str, Any]], provider: Optional[str] = None) -> str:
+    """
+    Encodes history for the user prompt using the encoding selected for `provider`
+    and records the estimated tokens saved versus the JSON encoding (~4 chars/token).
+    """
+    if _history_encoding(provider) == "json":
+        return encode_history_json(history)
+    compact = encode_history_compact(history)
+    saved = max(0, len(encode_history_json(history)) - len(compact)) // 4
+    metrics.observe("llm_history_tokens_saved", saved, provider=provider or "-")
+    metrics.incr("llm_history_tokens_saved_total", saved, provider=provider or "-")
+    print(f"[HISTORY] compact encoding saved ~{saved} tokens ({len(history)} messages)")
+    return compact
+
+
+class HistoryManager:
+    """
+    Bounds the chat history sent to the model. The last `verbatim_turns` user turns
+    are kept as messages; anything older is folded into a running summary stored on
+    `Conversations.history_summary` and extended incrementally, so each turn only
+    loads messages newer than what was already folded.
+    """
+
+    def __init__(self, db: Optional[Session] = None, verbatim_turns: int = HISTORY_VERBATIM_TURNS):
+        self.db = db
+        self.verbatim_turns = verbatim_turns
+
+    def load(self, chat: ChatModel) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Returns (recent messages as dicts, running summary or None). Updates
+        `chat.history_summary` when more turns were folded; the caller commits.
+        """
+        messages, summary = self.window(chat)
+        return [m.model_dump(mode='json') for m in messages], summary
+
+    def window(self, chat: ChatModel, db: Optional[Session] = None) -> Tuple[List[Message], Optional[Dict[str, Any]]]:
+        """
+        Loads the messages not yet folded into the summary and bounds them (see `fold`).
+        `db` overrides the manager's session for this query.
+        """
+        summary = chat.history_summary or {}
+        folded_through = summary.get("folded_through_id", 0)
+        rows = (
+            (db or self.db).query(MessageModel)
+            .filter(MessageModel.chat_uuid == chat.uuid, MessageModel.id > folded_through)
+            .order_by(MessageModel.id.asc())
+            .all()
+        )
+        return self.fold(chat, [Message.from_orm(m) for m in rows])
+
+    def fold(self, chat: ChatModel, messages: List[Message]) -> Tuple[List[Message], Optional[Dict[str, Any]]]:
+        """
+        Keeps the last `verbatim_turns` user turns of `messages` and folds anything
+        older into `chat.history_summary`.
+
+        Returns:
+            (kept messages, running summary or None).
+        """
+        summary = chat.history_summary or {}
+        user_positions = [i for i, m in enumerate(messages) if m.sender == "user"]
+        if self.verbatim_turns > 0 and len(user_positions) > self.verbatim_turns:
+            cut = user_positions[-self.verbatim_turns]
+            # Keep the question that the first verbatim answer replies to
+            if cut > 0 and messages[cut - 1].sender == "assistant":
+                cut -= 1
+            to_fold, messages = messages[:cut], messages[cut:]
+            summary = fold_messages(summary, to_fold)
+            # Reassign (not mutate) so SQLAlchemy sees the JSONB change
+            chat.history_summary = summary
+            print(f"[HISTORY] Folded {len(to_fold)} messages into summary (turns={summary['turns']} facts={len(summary['facts'])})")
+
+        return messages, (summary or None)
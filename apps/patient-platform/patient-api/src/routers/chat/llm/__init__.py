@@ -1,4 +1,6 @@
-from .base import LLMProvider
-from .groq import GroqProvider
-from .cerebras import CerebrasProvider
-from .gpt import GPT4oProvider
+from .base import LLMProvider, AsyncLLMProvider, AsyncStatefulProvider, ProviderSession, SyncProviderAdapter
+from .groq import GroqProvider, AsyncGroqProvider
+from .cerebras import CerebrasProvider, AsyncCerebrasProvider
+from .gpt import GPT4oProvider, AsyncGPT4oProvider
+from .failover import HedgedProvider, CircuitBreaker
+from .responses import AsyncResponsesProvider, LocalStatefulProvider
@@ -1,5 +1,7 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from typing import Generator
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional
 
 class LLMProvider(ABC):
     """
@@ -19,4 +21,104 @@ class LLMProvider(ABC):
         Yields:
             Chunks of the text response as they are generated by the LLM.
         """
-        pass 
\ No newline at end of file
+        pass
+
+
+class AsyncLLMProvider(ABC):
+    """
+    Abstract base class for LLM providers that stream without blocking the event loop.
+    Many calls can be in flight on one worker while each waits on the provider.
+    """
+
+    @abstractmethod
+    def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """
+        Sends a streaming query to the LLM.
+
+        Args:
+            system_prompt: The instruction or context for the model's behavior.
+            user_prompt: The user's direct question or input.
+            response_format: Optional JSON mode / structured-output request; providers
+                that cannot honour it ignore it.
+
+        Yields:
+            Chunks of the text response as they are generated by the LLM.
+        """
+        pass
+
+
+class ProviderSession:
+    """
+    Server-side conversation state for one call: the response to continue from and,
+    once the call has streamed, the id of the new response.
+    """
+
+    def __init__(self, previous_response_id: Optional[str] = None):
+        self.previous_response_id = previous_response_id
+        self.response_id: Optional[str] = None
+
+
+class AsyncStatefulProvider(ABC):
+    """
+    Abstract base class for providers that keep the conversation on the server
+    (e.g. the OpenAI Responses API), so each turn only sends new input items.
+    """
+
+    name: str = ""
+    model: Optional[str] = None
+
+    @abstractmethod
+    def stream_turn(self, session: ProviderSession, input_items: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """
+        Sends only the new input items, continuing from `session.previous_response_id`.
+
+        Args:
+            session: Continuation state; `session.response_id` is set during the call.
+            input_items: New messages as {"role": "developer" | "user", "content": str}.
+            response_format: Optional JSON mode / structured-output request.
+
+        Yields:
+            Chunks of the text response as they are generated by the LLM.
+        """
+        pass
+
+
+class SyncProviderAdapter(AsyncLLMProvider):
+    """
+    Adapts a synchronous LLMProvider to the async contract by iterating its
+    generator on a worker thread and handing chunks back to the event loop.
+    """
+
+    _DONE = object()
+
+    def __init__(self, provider: LLMProvider):
+        self.provider = provider
+        self.model = getattr(provider, "model", None)
+
+    async def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def _worker():
+            try:
+                for chunk in self.provider.query(system_prompt, user_prompt):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, self._DONE)
+
+        threading.Thread(target=_worker, daemon=True).start()
+        try:
+            while True:
+                item = await queue.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, Iterable, Optional, Tuple
+
+from .base import AsyncLLMProvider
+from .metrics import metrics
+
+try:
+    from redis import Redis
+except Exception:
+    Redis = None  # Redis is optional
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL_S = int(os.getenv("LLM_CACHE_TTL_S", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", "65536"))
+# The cache is opt-in per provider and only sound for deterministic (temperature-0)
+# providers: groq and cerebras. The default gpt4o provider samples at the API's default
+# temperature, so a gpt4o turn is never stored or served from cache; deployments that
+# want caching route the cached turn kinds to a listed provider (LLM_PROVIDER or
+# MODEL_ROUTING_FAST_PROVIDER with MODEL_ROUTING_ENABLED=true).
+CACHE_PROVIDERS = [p.strip() for p in os.getenv("LLM_CACHE_PROVIDERS", "groq,cerebras").split(",") if p.strip()]
+# Kinds of turn that may be served from cache (see services.ConversationService)
+CACHE_TURNS = [t.strip() for t in os.getenv("LLM_CACHE_TURNS", "first_followup").split(",") if t.strip()]
+
+
+def response_cache_key(provider: str, model: Optional[str], system_prompt: str, user_prompt: str,
+                       response_format: Optional[Dict[str, Any]] = None) -> str:
+    digest = hashlib.sha256()
+    for part in (system_prompt, user_prompt, json.dumps(response_format, sort_keys=True) if response_format else ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return f"llm:resp:{provider}:{model or '-'}:{digest.hexdigest()}"
+
+
+def _is_complete_json(text: str) -> bool:
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return False
+    try:
+        json.loads(text[start:end + 1])
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+class ResponseCache:
+    """
+    Two-tier cache of complete model replies: an in-process LRU (bounded by entry
+    count, entries expire after `ttl`) in front of Redis (TTL) when REDIS_URL is set.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL_S,
+                 max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+    def _redis_client(self):
+        if self._redis is None and REDIS_URL and Redis is not None:
+            logger.info("[LLM][CACHE] Connecting Redis")
+            self._redis = Redis.from_url(REDIS_URL)
+        return self._redis
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if time.monotonic() >= expires_at:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return text
+
+    def _memory_set(self, key: str, text: str):
+        with self._lock:
+            self._memory[key] = (time.monotonic() + self.ttl, text)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (text, tier) where tier is "memory" or "redis", or (None, None) on a miss."""
+        text = self._memory_get(key)
+        if text is not None:
+            return text, "memory"
+        redis = self._redis_client()
+        if redis is None:
+            return None, None
+        try:
+            raw = await asyncio.to_thread(redis.get, key)
+        except Exception as e:
+            logger.error(f"[LLM][CACHE] Redis get failed: {e}")
+            return None, None
+        if raw is None:
+            return None, None
+        text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        self._memory_set(key, text)
+        return text, "redis"
+
+    async def set(self, key: str, text: str):
+        if len(text.encode("utf-8")) > self.max_entry_bytes:
+            return
+        self._memory_set(key, text)
+        redis = self._redis_client()
+        if redis is None:
+            return
+        try:
+            await asyncio.to_thread(redis.setex, key, self.ttl, text)
+        except Exception as e:
+            logger.error(f"[LLM][CACHE] Redis set failed: {e}")
+
+
+class CachedProvider(AsyncLLMProvider):
+    """
+    Serves a call from the response cache when the same provider, model and prompts
+    were seen before; otherwise streams from `inner` and stores the reply if it is
+    complete JSON. Only wrap providers that run at temperature 0.
+    """
+
+    def __init__(self, name: str, inner: AsyncLLMProvider, cache: ResponseCache):
+        self.name = name
+        self.inner = inner
+        self.cache = cache
+        self.model = getattr(inner, "model", None)
+
+    async def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        key = response_cache_key(self.name, self.model, system_prompt, user_prompt, response_format)
+        text, tier = await self.cache.get(key)
+        if text is not None:
+            print(f"[LLM][CACHE] HIT provider={self.name} tier={tier}")
+            metrics.incr("llm_cache_hits_total", provider=self.name, tier=tier)
+            yield text
+            return
+
+        metrics.incr("llm_cache_misses_total", provider=self.name)
+        parts = []
+        async for chunk in self.inner.stream(system_prompt, user_prompt, response_format):
+            parts.append(chunk)
+            yield chunk
+        reply = "".join(parts)
+        if _is_complete_json(reply):
+            await self.cache.set(key, reply)
+            metrics.incr("llm_cache_stores_total", provider=self.name)
+
+
+response_cache = ResponseCache()
+
+
+def cacheable(provider: str, turn_kind: Optional[str]) -> bool:
+    """True if a turn of `turn_kind` answered by `provider` may use the response cache."""
+    return bool(turn_kind) and turn_kind in CACHE_TURNS and provider in CACHE_PROVIDERS
+
+
+def check_cache_config(providers: Iterable[str]):
+    """
+    Reports at startup which of the active `providers` (the default and, with routing
+    enabled, the fast provider) the response cache covers, and on which tiers.
+    """
+    if REDIS_URL and Redis is None:
+        print("[LLM][CACHE] REDIS_URL is set but the redis package is missing; caching in memory only")
+    cached = sorted({p for p in providers if p in CACHE_PROVIDERS})
+    if cached and CACHE_TURNS:
+        backend = "memory+redis" if REDIS_URL and Redis is not None else "memory"
+        print(f"[LLM][CACHE] Caching {','.join(CACHE_TURNS)} turns for {','.join(cached)} ({backend})")
+    else:
+        print(f"[LLM][CACHE] Response cache inactive: no active provider in LLM_CACHE_PROVIDERS={','.join(CACHE_PROVIDERS)}")
@@ -1,7 +1,8 @@
-from .base import LLMProvider
+from .base import LLMProvider, AsyncLLMProvider
 import os
-from cerebras.cloud.sdk import Cerebras
-from typing import Generator
+import httpx
+from cerebras.cloud.sdk import Cerebras, AsyncCerebras
+from typing import Any, AsyncGenerator, Dict, Generator, Optional
 
 class CerebrasProvider(LLMProvider):
     """
@@ -35,4 +36,45 @@ class CerebrasProvider(LLMProvider):
         for chunk in stream:
             content = chunk.choices[0].delta.content
             if content:
-                yield content 
\ No newline at end of file
+                yield content
+
+
+class AsyncCerebrasProvider(AsyncLLMProvider):
+    """
+    Cerebras Cloud models on the async Cerebras client.
+
+    Pass a shared `http_client` (see registry.ProviderRegistry) to reuse a pooled connection.
+    """
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.client = AsyncCerebras(api_key=os.environ.get("CEREBRAS_API_KEY"), http_client=http_client)
+        self.model = "qwen-3-32b"
+
+    async def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """
+        Sends a streaming query via the async Cerebras API.
+
+        Args:
+            system_prompt: The instruction or context for the model's behavior.
+            user_prompt: The user's direct question or input.
+            response_format: Optional OpenAI-style response format, e.g. {"type": "json_object"}
+                or a {"type": "json_schema", ...} structured-output schema.
+
+        Yields:
+            Chunks of the text response as they are generated by the LLM.
+        """
+        extra = {"response_format": response_format} if response_format else {}
+        stream = await self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0,
+            model=self.model,
+            stream=True,
+            **extra,
+        )
+
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
@@ -1,9 +1,15 @@
 import os
 import json
+import time
+import hashlib
+import threading
 import docx
 import numpy as np
+from collections import OrderedDict
 from pypdf import PdfReader
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+from .metrics import metrics
 
 # Force CPU-only inference by default (Fly machines are CPU by default)
 os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
@@ -17,6 +23,75 @@ def _vector_store_enabled() -> bool:
     return os.getenv("VECTOR_RAG_ENABLED", "false").lower() in ("1", "true", "yes", "on")
 
 
+def _base_docs_mode() -> str:
+    """
+    "full" pastes every base document into the system prompt.
+    "retrieval" keeps only the bot instructions as a static core and pulls the
+    top matching base-document chunks for the active symptoms from Pinecone.
+    """
+    return os.getenv("BASE_DOCS_MODE", "full").strip().lower()
+
+
+def _ctcae_tables_mode() -> str:
+    """
+    "all" retrieves CTCAE criteria for every symptom. "ungraded" leaves out the
+    criteria for symptoms that already have a local grade from the patient's answers
+    (see routers/chat/grading.py), which changes the prompt as answers come in.
+    """
+    return os.getenv("CTCAE_PROMPT_TABLES", "all").strip().lower()
+
+
+def _omitted_tables(symptoms: Optional[List[str]], graded: Optional[List[str]]) -> List[str]:
+    """The symptoms whose CTCAE criteria are left out of the prompt: those locally graded, in "ungraded" mode."""
+    if _ctcae_tables_mode() != "ungraded" or not graded:
+        return []
+    from ..questions import symptom_key
+
+    graded_keys = {symptom_key(g) for g in graded}
+    return [s for s in symptoms or [] if symptom_key(s) in graded_keys]
+
+
+# Bounded LRU of assembled system prompts, one entry per conversation
+CONTEXT_CACHE_MAX_CONVERSATIONS = int(os.getenv("CONTEXT_CACHE_MAX_CONVERSATIONS", "512"))
+# Bounded LRU of prompt sections (base documents / RAG results) shared across conversations
+CONTEXT_CACHE_MAX_SECTIONS = int(os.getenv("CONTEXT_CACHE_MAX_SECTIONS", "256"))
+# Memoized sections and prompts expire with the retrieval cache they are built from
+CONTEXT_CACHE_TTL_S = int(os.getenv("CONTEXT_CACHE_TTL_S", "1800"))
+
+
+def symptom_set_hash(symptoms: Optional[List[str]]) -> str:
+    """Order- and case-insensitive hash of a symptom list."""
+    normalized = sorted({(s or "").strip().lower() for s in (symptoms or []) if (s or "").strip()})
+    return hashlib.sha256("\x1f".join(normalized).encode("utf-8")).hexdigest()[:16]
+
+
+class _LRU:
+    def __init__(self, max_entries: int, ttl: float = CONTEXT_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
 def _import_embedding_libraries():
     global sentence_transformers, faiss
     if sentence_transformers is None:
@@ -40,6 +115,10 @@ class ContextLoader:
         self.model = None
         self.index = None
         self.documents = []
+        # conversation id -> (symptom set hash, prompt)
+        self._prompts = _LRU(CONTEXT_CACHE_MAX_CONVERSATIONS)
+        # (section kind, key) -> section text
+        self._sections = _LRU(CONTEXT_CACHE_MAX_SECTIONS)
         print(f"[CTX] Initializing ContextLoader with directory: {self.directory}")
         print(f"[CTX] Expecting vector store at: {self.vector_store_path}")
         print(f"[CTX] Expecting documents at: {self.documents_path}")
@@ -117,49 +196,211 @@ class ContextLoader:
         print(f"[CTX] Total base documents length: {len(combined)}")
         return combined
 
-    def _append_rag_results(self, base_prompt: str, symptoms: List[str]) -> str:
-        """Appends RAG results to the base prompt using Redis caching."""
+    def _load_core_documents(self) -> str:
+        """Loads only the static core of the system prompt (the bot instructions)."""
+        file_path = os.path.join(self.directory, "oncolifebot_instructions.txt")
+        content = self._load_txt(file_path)
+        print(f"[CTX] Loaded core instructions (chars={len(content)})")
+        return f"=== oncolifebot_instructions.txt ===\n{content}"
+
+    def _retrieve_base_document_chunks(self, core_prompt: str, symptoms: List[str]) -> Optional[str]:
+        """
+        The core prompt with the base-document chunks (alerts, written docs, UKONS)
+        retrieved for the symptoms, or None when retrieval found none.
+
+        Raises:
+            Exception: Retrieval failed.
+        """
+        from .retrieval import cached_retrieve_base_documents
+
+        top_k = int(os.getenv("BASE_DOCS_TOP_K", "8"))
+        hits = cached_retrieve_base_documents(symptoms or [], ttl=1800, k=top_k)
+        chunks = [f"[{h.get('source', h.get('type', ''))}]\n{h['text']}" for h in hits if h.get("text")]
+        if not chunks:
+            print("[CTX] No base document chunks found")
+            return None
+        print(f"[CTX] Appended {len(chunks)} base document chunks")
+        return f"{core_prompt}\n\n=== Relevant Guidance ===\n" + "\n---\n".join(chunks)
+
+    def _append_base_document_chunks(self, core_prompt: str, symptoms: List[str]) -> str:
+        """Appends the base-document chunks retrieved for the symptoms, falling back to the full base documents."""
+        try:
+            prompt = self._retrieve_base_document_chunks(core_prompt, symptoms)
+        except Exception as e:
+            print(f"[CTX] Error retrieving base documents: {e}")
+            prompt = None
+        if prompt is None:
+            print("[CTX] Falling back to full base documents")
+            return self._load_base_documents()
+        return prompt
+
+    def _retrieve_rag_section(self, symptoms: List[str], graded: Optional[List[str]] = None) -> str:
+        """
+        Builds the RAG results section for the symptoms ("" when there is nothing to add).
+        `graded` are the symptoms with a local CTCAE grade this turn.
+
+        Raises:
+            Exception: Retrieval failed.
+        """
         if not symptoms:
             print("[CTX] No symptoms provided, skipping RAG")
-            return base_prompt
-        
+            return ""
+
+        # Import here to avoid circular imports
+        from .retrieval import cached_retrieve
+
+        print(f"[CTX] Performing RAG for symptoms: {symptoms}")
+
+        # Get CTCAE results (cached); symptoms graded locally this turn may skip the grade tables
+        omitted = _omitted_tables(symptoms, graded)
+        ctcae_symptoms = [s for s in symptoms if s not in omitted]
+        ctcae_results = cached_retrieve(ctcae_symptoms, ttl=1800, k_ctcae=10, k_questions=0) if ctcae_symptoms else {}
+        ctcae_chunks = [h.get("text", "") for h in ctcae_results.get("ctcae", []) if h.get("text")]
+
+        # Get questions results (cached)
+        questions_results = cached_retrieve(symptoms, ttl=1800, k_ctcae=0, k_questions=12)
+        questions_chunks = [h.get("text", "") for h in questions_results.get("questions", []) if h.get("text")]
+
+        # Build RAG section
+        rag_sections = []
+
+        if ctcae_chunks:
+            ctcae_text = "\n---\n".join(ctcae_chunks[:6])
+            rag_sections.append(f"=== Relevant CTCAE Criteria for {', '.join(ctcae_symptoms)} ===\n{ctcae_text}")
+
+        if questions_chunks:
+            questions_text = "\n---\n".join(questions_chunks[:8])
+            rag_sections.append(f"=== Assessment Questions for {', '.join(symptoms)} ===\n{questions_text}")
+
+        if rag_sections:
+            return "=== RAG Results ===\n" + "\n\n".join(rag_sections)
+        print("[CTX] No RAG results found")
+        return ""
+
+    def _build_rag_section(self, symptoms: List[str], graded: Optional[List[str]] = None) -> str:
+        """The RAG results section for the symptoms, or "" when there is nothing to add or retrieval failed."""
         try:
-            # Import here to avoid circular imports
-            from .retrieval import cached_retrieve
-            
-            print(f"[CTX] Performing RAG for symptoms: {symptoms}")
-            
-            # Get CTCAE results (cached)
-            ctcae_results = cached_retrieve(symptoms, ttl=1800, k_ctcae=10, k_questions=0)
-            ctcae_chunks = [h.get("text", "") for h in ctcae_results.get("ctcae", []) if h.get("text")]
-            
-            # Get questions results (cached)
-            questions_results = cached_retrieve(symptoms, ttl=1800, k_ctcae=0, k_questions=12)
-            questions_chunks = [h.get("text", "") for h in questions_results.get("questions", []) if h.get("text")]
-            
-            # Build RAG section
-            rag_sections = []
-            
-            if ctcae_chunks:
-                ctcae_text = "\n---\n".join(ctcae_chunks[:6])
-                rag_sections.append(f"=== Relevant CTCAE Criteria for {', '.join(symptoms)} ===\n{ctcae_text}")
-            
-            if questions_chunks:
-                questions_text = "\n---\n".join(questions_chunks[:8])
-                rag_sections.append(f"=== Assessment Questions for {', '.join(symptoms)} ===\n{questions_text}")
-            
-            if rag_sections:
-                rag_content = "\n\n".join(rag_sections)
-                full_prompt = f"{base_prompt}\n\n=== RAG Results ===\n{rag_content}"
-                print(f"[CTX] RAG results appended, total length: {len(full_prompt)}")
-                return full_prompt
-            else:
-                print("[CTX] No RAG results found")
-                return base_prompt
-                
+            return self._retrieve_rag_section(symptoms, graded)
         except Exception as e:
             print(f"[CTX] Error during RAG: {e}")
+            return ""
+
+    def _append_rag_results(self, base_prompt: str, symptoms: List[str]) -> str:
+        """Appends RAG results to the base prompt using Redis caching."""
+        rag_section = self._build_rag_section(symptoms)
+        if not rag_section:
             return base_prompt
+        full_prompt = f"{base_prompt}\n\n{rag_section}"
+        print(f"[CTX] RAG results appended, total length: {len(full_prompt)}")
+        return full_prompt
+
+    def _full_base_section(self) -> str:
+        key = ("base", "full", "")
+        section = self._sections.get(key)
+        if section is None:
+            section = self._load_base_documents()
+            if section:
+                self._sections.put(key, section)
+        return section
+
+    def _base_section(self, symptoms: List[str]) -> Tuple[str, bool]:
+        """
+        Base documents section, memoized (per symptom set in retrieval mode, once in full mode).
+
+        Returns:
+            (section, complete). Not complete when retrieval failed or found nothing and
+            the full base documents stand in; that fallback is not memoized for the symptom set.
+        """
+        if _base_docs_mode() != "retrieval":
+            return self._full_base_section(), True
+        key = ("base", "retrieval", symptom_set_hash(symptoms))
+        section = self._sections.get(key)
+        if section is not None:
+            return section, True
+        try:
+            section = self._retrieve_base_document_chunks(self._load_core_documents(), symptoms)
+        except Exception as e:
+            print(f"[CTX] Error retrieving base documents: {e}")
+            section = None
+        if section is None:
+            print("[CTX] Falling back to full base documents")
+            return self._full_base_section(), False
+        self._sections.put(key, section)
+        return section, True
+
+    def _rag_section(self, symptoms: List[str], graded: Optional[List[str]] = None) -> Tuple[str, bool]:
+        """
+        RAG results section, memoized per symptom set and set of omitted CTCAE tables.
+
+        Returns:
+            (section, complete). Only non-empty sections are memoized; not complete when
+            retrieval failed or found nothing for a non-empty symptom set.
+        """
+        key = ("rag", symptom_set_hash(symptoms), symptom_set_hash(_omitted_tables(symptoms, graded)))
+        section = self._sections.get(key)
+        if section is not None:
+            return section, True
+        try:
+            section = self._retrieve_rag_section(symptoms, graded)
+        except Exception as e:
+            print(f"[CTX] Error during RAG: {e}")
+            return "", False
+        if section:
+            self._sections.put(key, section)
+        return section, bool(section) or not symptoms
+
+    def prefetch_sections(self, symptoms: List[str]):
+        """
+        Builds the sections for a symptom set in the background (e.g. one including a
+        symptom the patient just mentioned), so loading that set later only assembles.
+        """
+        def _task():
+            try:
+                self._base_section(symptoms)
+                self._rag_section(symptoms)
+            except Exception as e:
+                print(f"[CTX] Section prefetch failed for {symptoms}: {e}")
+        threading.Thread(target=_task, daemon=True).start()
+
+    @staticmethod
+    def _prompt_digest(symptoms: Optional[List[str]], graded: Optional[List[str]]) -> str:
+        omitted = _omitted_tables(symptoms, graded)
+        return symptom_set_hash(symptoms) + (f":{symptom_set_hash(omitted)}" if omitted else "")
+
+    def peek_context(self, conversation_id: Any, symptoms: List[str] = None, graded: List[str] = None) -> Optional[str]:
+        """Returns the memoized prompt for this conversation, symptom set and graded symptoms, or None (never builds)."""
+        cached = self._prompts.get(str(conversation_id))
+        if cached and cached[0] == self._prompt_digest(symptoms, graded):
+            metrics.incr("context_prompt_cache_total", outcome="hit")
+            return cached[1]
+        return None
+
+    def load_context_for_conversation(self, conversation_id: Any, symptoms: List[str] = None,
+                                      graded: List[str] = None) -> str:
+        """
+        Memoized `load_context`: returns the prompt already assembled for this
+        conversation when its symptom set is unchanged (no assembly at all). When the
+        symptom set changes, the memoized base section is reused and only sections
+        that depend on the new set are built. `graded` are the symptoms with a local
+        CTCAE grade this turn (only used in CTCAE_PROMPT_TABLES="ungraded" mode).
+        """
+        digest = self._prompt_digest(symptoms, graded)
+        cached: Optional[Tuple[str, str]] = self._prompts.get(str(conversation_id))
+        if cached and cached[0] == digest:
+            metrics.incr("context_prompt_cache_total", outcome="hit")
+            return cached[1]
+
+        metrics.incr("context_prompt_cache_total", outcome="changed" if cached else "miss")
+        print(f"[CTX] Assembling system prompt for conversation={conversation_id} symptoms={symptoms}")
+        base_prompt, base_complete = self._base_section(symptoms)
+        rag_section, rag_complete = self._rag_section(symptoms, graded)
+        prompt = f"{base_prompt}\n\n{rag_section}" if rag_section else base_prompt
+        if base_complete and rag_complete:
+            self._prompts.put(str(conversation_id), (digest, prompt))
+        else:
+            # Built around a failed or empty retrieval: retry on the next turn
+            metrics.incr("context_prompt_degraded_total")
+        return prompt
 
     def load_context(self, symptoms: List[str] = None) -> str:
         """
@@ -168,8 +409,11 @@ class ContextLoader:
         """
         print(f"[CTX] Building complete system prompt for symptoms: {symptoms}")
         
-        # Step 1: Load base documents
-        base_prompt = self._load_base_documents()
+        # Step 1: Load base documents (in full, or a small core plus retrieved chunks)
+        if _base_docs_mode() == "retrieval":
+            base_prompt = self._append_base_document_chunks(self._load_core_documents(), symptoms)
+        else:
+            base_prompt = self._load_base_documents()
         
         # Step 2: Append RAG results (with Redis caching)
         complete_prompt = self._append_rag_results(base_prompt, symptoms)
@@ -199,4 +443,18 @@ class ContextLoader:
     def _load_json(self, file_path: str) -> Dict[str, Any]:
         """Loads data from a .json file."""
         with open(file_path, 'r') as f:
-            return json.load(f)
\ No newline at end of file
+            return json.load(f)
+
+
+_loaders: Dict[str, ContextLoader] = {}
+_loaders_lock = threading.Lock()
+
+
+def get_context_loader(directory: str) -> ContextLoader:
+    """Process-wide ContextLoader per model-inputs directory, so its memoized prompts survive across turns."""
+    directory = os.path.normpath(directory)
+    with _loaders_lock:
+        loader = _loaders.get(directory)
+        if loader is None:
+            loader = _loaders[directory] = ContextLoader(directory)
+        return loader
@@ -0,0 +1,252 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from .base import AsyncLLMProvider
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Hedge deadline = p95 first-token latency of the provider being waited on, clamped
+HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "0.5"))
+HEDGE_MAX_DELAY_S = float(os.getenv("LLM_HEDGE_MAX_DELAY_S", "10"))
+HEDGE_DEFAULT_DELAY_S = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_S", "3"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# A provider that has produced nothing after this long counts as timed out
+FIRST_TOKEN_TIMEOUT_S = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT_S", "30"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+
+
+class CircuitBreaker:
+    """
+    Per-provider breaker. Opens after `failure_threshold` consecutive errors or
+    timeouts; after `reset_timeout` one trial call is let through (half-open) and
+    its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_S):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def available(self) -> bool:
+        """Whether `allow()` would let a call through, without taking the half-open trial."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at >= self.reset_timeout
+        return not self._trial_in_flight
+
+    def allow(self) -> bool:
+        """Lets a call through, taking the half-open trial; call only when the call is started."""
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def release(self):
+        """A call ended with no verdict on the provider (e.g. a cancelled hedge); frees the half-open trial."""
+        self._trial_in_flight = False
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            print(f"[LLM][BREAKER] provider={self.name} {self.state} -> {state}")
+        self.state = state
+        metrics.set_gauge("llm_breaker_open", 1 if state == self.OPEN else 0, provider=self.name)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def hedge_delay(name: str) -> float:
+    count, p95 = metrics.summary("llm_first_token_seconds", provider=name)
+    if count < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY_S
+    return min(HEDGE_MAX_DELAY_S, max(HEDGE_MIN_DELAY_S, p95))
+
+
+class HedgedProvider(AsyncLLMProvider):
+    """
+    Routes one call across an ordered list of providers.
+
+    The first provider whose breaker allows it is called. With hedging enabled, if
+    it has not produced a first token by its p95 first-token deadline, the next
+    provider is started as well and whichever produces a first token first wins;
+    the loser is cancelled. Errors before the first token fail over to the next
+    provider immediately. Once a winner is streaming, the reply is not switched.
+
+    A provider's breaker is asked (`allow()`) only when the provider is started, and
+    every started provider reports back: failure on an error or timeout, success
+    once it streams (including when the consumer stops reading early), and no
+    verdict (`release()`) when it is cancelled as a hedge loser.
+    """
+
+    def __init__(self, providers: List[Tuple[str, AsyncLLMProvider]], hedge: bool = True):
+        self.providers = providers
+        self.hedge = hedge
+        self.model = getattr(providers[0][1], "model", None) if providers else None
+
+    def _candidates(self) -> Tuple[List[Tuple[str, AsyncLLMProvider]], bool]:
+        """(providers whose breaker would allow a call, forced). Forced when every breaker is open."""
+        available = [(n, p) for n, p in self.providers if breaker_for(n).available()]
+        # Every breaker open: try them all rather than fail outright
+        return (available, False) if available else (list(self.providers), True)
+
+    async def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        candidates, forced = self._candidates()
+        primary = candidates[0][0]
+        pending: Dict[asyncio.Task, Tuple[str, AsyncGenerator[str, None], float]] = {}
+        launched: List[str] = []
+        cursor = 0
+        last_error: Optional[BaseException] = None
+        winner = None
+        hedged = False
+
+        def launch() -> bool:
+            nonlocal cursor
+            while cursor < len(candidates):
+                name, provider = candidates[cursor]
+                cursor += 1
+                if not forced and not breaker_for(name).allow():
+                    # Another call took the half-open trial since the candidates were picked
+                    continue
+                agen = provider.stream(system_prompt, user_prompt, response_format)
+                task = asyncio.ensure_future(agen.__anext__())
+                pending[task] = (name, agen, time.perf_counter())
+                launched.append(name)
+                metrics.incr("llm_route_calls_total", provider=name)
+                return True
+            return False
+
+        if not launch():
+            raise RuntimeError("No LLM provider available")
+        start = time.perf_counter()
+        try:
+            while winner is None:
+                can_launch = cursor < len(candidates)
+                if can_launch and self.hedge:
+                    last_start = max(t0 for _, _, t0 in pending.values()) if pending else time.perf_counter()
+                    timeout = max(0.0, last_start + hedge_delay(launched[-1]) - time.perf_counter())
+                else:
+                    timeout = max(0.0, start + FIRST_TOKEN_TIMEOUT_S - time.perf_counter())
+
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if can_launch and self.hedge and time.perf_counter() - start < FIRST_TOKEN_TIMEOUT_S:
+                        print(f"[LLM][ROUTE] No first token from {launched[-1]} by deadline → hedging to {candidates[cursor][0]}")
+                        metrics.incr("llm_hedges_total", provider=launched[-1])
+                        if launch():
+                            hedged = True
+                        continue
+                    for task, (name, _, _) in pending.items():
+                        breaker_for(name).record_failure()
+                        metrics.incr("llm_route_timeouts_total", provider=name)
+                    if can_launch:
+                        await _cancel_all(pending)
+                        if launch():
+                            start = time.perf_counter()
+                            continue
+                    raise asyncio.TimeoutError(f"No first token within {FIRST_TOKEN_TIMEOUT_S:.0f}s from {launched}")
+
+                for task in done:
+                    name, agen, t0 = pending.pop(task)
+                    try:
+                        first = task.result()
+                    except Exception as e:
+                        # A stream that ends before its first token (an empty 200) is a failed call too
+                        if isinstance(e, StopAsyncIteration):
+                            e = RuntimeError(f"{name} returned an empty response")
+                        last_error = e
+                        breaker_for(name).record_failure()
+                        metrics.incr("llm_route_errors_total", provider=name)
+                        print(f"[LLM][ROUTE] provider={name} failed before first token: {e}")
+                        continue
+                    winner = (name, agen, t0, first)
+                    break
+
+                if winner is None and not pending:
+                    if cursor < len(candidates):
+                        print(f"[LLM][ROUTE] Failing over to {candidates[cursor][0]}")
+                        metrics.incr("llm_failovers_total", provider=launched[-1])
+                        if launch():
+                            start = time.perf_counter()
+                            continue
+                    raise last_error or RuntimeError("All LLM providers failed")
+        finally:
+            # Hedge losers (and everything still waiting when the call is abandoned) are
+            # cancelled: being slower than the winner says nothing about their health
+            for task, (name, _, _) in pending.items():
+                breaker_for(name).release()
+                if winner is not None:
+                    metrics.incr("llm_hedge_cancelled_total", provider=name)
+            await _cancel_all(pending)
+
+        name, agen, t0, first = winner
+        breaker = breaker_for(name)
+        metrics.observe("llm_first_token_seconds", time.perf_counter() - t0, provider=name)
+        if hedged:
+            metrics.incr("llm_hedge_wins_total" if name != primary else "llm_hedge_losses_total", provider=name)
+        try:
+            yield first
+            async for chunk in agen:
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            # The consumer stopped reading (e.g. the socket closed) while the provider was streaming
+            breaker.record_success()
+            raise
+        except Exception:
+            breaker.record_failure()
+            metrics.incr("llm_route_errors_total", provider=name)
+            raise
+        else:
+            breaker.record_success()
+            metrics.observe("llm_total_seconds", time.perf_counter() - t0, provider=name)
+        finally:
+            await agen.aclose()
+
+
+async def _cancel_all(pending: Dict[asyncio.Task, Tuple[str, AsyncGenerator[str, None], float]]):
+    for task, (name, agen, _) in list(pending.items()):
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+        try:
+            await agen.aclose()
+        except BaseException as e:
+            logger.debug(f"[LLM][ROUTE] close failed provider={name} error={e}")
+    pending.clear()
@@ -0,0 +1,266 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+from .base import AsyncLLMProvider, AsyncStatefulProvider, ProviderSession
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+QUEUE_MAX_WAIT_S = float(os.getenv("LLM_QUEUE_MAX_WAIT_S", "20"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.5"))
+RETRY_CAP_S = float(os.getenv("LLM_RETRY_CAP_S", "8"))
+# Throttle when fewer than this fraction of the provider's request budget remains
+RATE_LIMIT_LOW_WATERMARK = float(os.getenv("LLM_RATE_LIMIT_LOW_WATERMARK", "0.05"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class GatewayQueueTimeout(Exception):
+    """Raised when a call waited longer than the maximum queue time for a slot."""
+
+
+def _max_concurrency(provider: str) -> int:
+    return int(os.getenv(f"LLM_MAX_CONCURRENCY_{provider.upper()}", str(DEFAULT_MAX_CONCURRENCY)))
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses rate-limit reset values such as "1s", "6m0s", "20ms" or "2.5"."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        amount = float(amount)
+        total += {"ms": amount / 1000, "s": amount, "m": amount * 60, "h": amount * 3600}[unit]
+    return total if matched else None
+
+
+def _header_int(response: httpx.Response, name: str) -> Optional[int]:
+    try:
+        raw = response.headers.get(name)
+        return int(float(raw)) if raw is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    FIFO (fair) concurrency limiter for one provider. Callers queue in arrival order
+    and give up after `max_wait`. The limit shrinks when the provider reports a nearly
+    exhausted rate-limit budget or returns 429, and grows back one slot per
+    successful response once the reset window has passed.
+    """
+
+    def __init__(self, provider: str, max_limit: int, max_wait: float = QUEUE_MAX_WAIT_S):
+        self.provider = provider
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.max_wait = max_wait
+        self.in_use = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._cooldown_until = 0.0
+        self._publish()
+
+    async def acquire(self):
+        start = time.perf_counter()
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            self._record_wait(start)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we timed out; hand it back
+                self.release()
+            else:
+                future.cancel()
+            metrics.incr("llm_gateway_rejected_total", provider=self.provider)
+            raise GatewayQueueTimeout(f"{self.provider}: no slot within {self.max_wait:.0f}s")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            self._publish()
+        self._record_wait(start)
+
+    def release(self):
+        self.in_use = max(0, self.in_use - 1)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_use < self.limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_use += 1
+            future.set_result(None)
+        self._publish()
+
+    def throttle(self, new_limit: int, cooldown_s: float):
+        new_limit = max(1, min(self.limit, new_limit))
+        if new_limit < self.limit:
+            logger.info(f"[LLM][GATEWAY] provider={self.provider} limit {self.limit} -> {new_limit} for {cooldown_s:.1f}s")
+        self.limit = new_limit
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + cooldown_s)
+        self._publish()
+
+    def recover(self):
+        if self.limit < self.max_limit and time.monotonic() >= self._cooldown_until:
+            self.limit += 1
+            self._wake()
+
+    def _record_wait(self, start: float):
+        metrics.observe("llm_gateway_wait_seconds", time.perf_counter() - start, provider=self.provider)
+
+    def _publish(self):
+        metrics.set_gauge("llm_gateway_queue_depth", len(self._waiters), provider=self.provider)
+        metrics.set_gauge("llm_gateway_in_use", self.in_use, provider=self.provider)
+        metrics.set_gauge("llm_gateway_limit", self.limit, provider=self.provider)
+
+
+class GatewayProvider(AsyncLLMProvider):
+    """
+    Wraps a provider with the gateway: a fair per-provider concurrency limit, limits
+    adapted from `x-ratelimit-*` response headers, and jittered-backoff retries for
+    429/5xx and connection errors that happen before the first token is streamed.
+    """
+
+    def __init__(self, name: str, inner: AsyncLLMProvider, max_concurrency: Optional[int] = None):
+        self.name = name
+        self.inner = inner
+        self.model = getattr(inner, "model", None)
+        self.limiter = AdaptiveLimiter(name, max_concurrency or _max_concurrency(name))
+
+    @property
+    def client(self):
+        return getattr(self.inner, "client", None)
+
+    def on_response(self, provider: str, response: httpx.Response):
+        """Transport response hook: adapts the limit to the provider's reported budget."""
+        if response.status_code == 429:
+            retry_after = _parse_duration(response.headers.get("retry-after")) or 1.0
+            self.limiter.throttle(self.limiter.limit // 2, retry_after)
+            metrics.incr("llm_gateway_429_total", provider=self.name)
+            return
+
+        limit = _header_int(response, "x-ratelimit-limit-requests")
+        remaining = _header_int(response, "x-ratelimit-remaining-requests")
+        if remaining is None:
+            if response.status_code < 400:
+                self.limiter.recover()
+            return
+        metrics.set_gauge("llm_ratelimit_remaining_requests", remaining, provider=self.name)
+        reset_s = _parse_duration(response.headers.get("x-ratelimit-reset-requests")) or 1.0
+        low = max(1, int((limit or 0) * RATE_LIMIT_LOW_WATERMARK))
+        if remaining <= low:
+            self.limiter.throttle(max(1, remaining), reset_s)
+        elif response.status_code < 400:
+            self.limiter.recover()
+
+    async def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        async for chunk in _gated_stream(self.name, self.limiter,
+                                         lambda: self.inner.stream(system_prompt, user_prompt, response_format)):
+            yield chunk
+
+
+class GatewayStatefulProvider(AsyncStatefulProvider):
+    """
+    Puts a stateful provider (the Responses API) behind the gateway: the same fair
+    concurrency limit, rate-limit adaptation and pre-first-token retries as
+    GatewayProvider. Pass the limiter of the stateless gateway that draws on the
+    same provider budget so both modes share one limit.
+    """
+
+    def __init__(self, name: str, inner: AsyncStatefulProvider, limiter: AdaptiveLimiter):
+        self.name = name
+        self.inner = inner
+        self.model = getattr(inner, "model", None)
+        self.limiter = limiter
+
+    @property
+    def client(self):
+        return getattr(self.inner, "client", None)
+
+    async def stream_turn(self, session: ProviderSession, input_items: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        async for chunk in _gated_stream(self.name, self.limiter,
+                                         lambda: self.inner.stream_turn(session, input_items, response_format)):
+            yield chunk
+
+
+async def _gated_stream(name: str, limiter: AdaptiveLimiter,
+                        open_stream: Callable[[], AsyncGenerator[str, None]]) -> AsyncGenerator[str, None]:
+    """Streams `open_stream()` holding a slot of `limiter`, retrying retryable errors raised before the first chunk."""
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        started = False
+        try:
+            async for chunk in open_stream():
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            if started or attempt >= MAX_RETRIES or not _is_retryable(e):
+                metrics.incr("llm_gateway_failures_total", provider=name)
+                raise
+            delay = _backoff_delay(attempt, e)
+            attempt += 1
+            metrics.incr("llm_gateway_retries_total", provider=name)
+            print(f"[LLM][GATEWAY] provider={name} retry {attempt}/{MAX_RETRIES} in {delay:.2f}s after: {e}")
+        finally:
+            limiter.release()
+        await asyncio.sleep(delay)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Connection resets and timeouts from the SDKs / httpx carry no status code
+    name = type(error).__name__
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError)) or "Connection" in name or "Timeout" in name
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = _parse_duration(headers.get("retry-after")) if headers else None
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    delay = random.uniform(0, min(RETRY_CAP_S, RETRY_BASE_S * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_CAP_S))
+    return delay
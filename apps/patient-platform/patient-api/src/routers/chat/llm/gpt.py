@@ -1,7 +1,8 @@
-from .base import LLMProvider
+from .base import LLMProvider, AsyncLLMProvider
 import os
-from openai import OpenAI
-from typing import Generator, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from typing import Any, AsyncGenerator, Dict, Generator, Optional, Tuple
 
 class GPT4oProvider(LLMProvider):
     """
@@ -18,6 +19,7 @@ class GPT4oProvider(LLMProvider):
     def query(self, system_prompt: str, user_prompt: str) -> Generator[str, None, None]:
         """
         Sends a streaming query to the GPT-4o model via the OpenAI API.
+        Tokens are yielded as they arrive; usage is logged from the final chunk.
 
         Args:
             system_prompt: The instruction or context for the model's behavior.
@@ -30,8 +32,7 @@ class GPT4oProvider(LLMProvider):
         print(f"GPT-4o query called with user prompt: {user_prompt[:100]}...")
         
         try:
-            # First, make a non-streaming call to get token usage information
-            completion = self.client.chat.completions.create(
+            stream = self.client.chat.completions.create(
                 messages=[
                     {
                         "role": "system",
@@ -43,21 +44,76 @@ class GPT4oProvider(LLMProvider):
                     }
                 ],
                 model=self.model,
-                stream=False,
+                stream=True,
+                # The final chunk carries token usage (and no choices)
+                stream_options={"include_usage": True},
             )
 
-            # Extract and log token usage
-            if completion.usage:
-                input_tokens = completion.usage.prompt_tokens
-                output_tokens = completion.usage.completion_tokens
-                total_tokens = completion.usage.total_tokens
-                print(f"🔢 GPT-4o Token Usage - Input: {input_tokens}, Output: {output_tokens}, Total: {total_tokens}")
-            
-            # Return the response content as a generator (simulating streaming)
-            response_content = completion.choices[0].message.content
-            print(f"✅ GPT-4o response: {response_content[:200]}...")
-            if response_content:
-                yield response_content
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    input_tokens = usage.prompt_tokens
+                    output_tokens = usage.completion_tokens
+                    total_tokens = usage.total_tokens
+                    print(f"🔢 GPT-4o Token Usage - Input: {input_tokens}, Output: {output_tokens}, Total: {total_tokens}")
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
         except Exception as e:
             print(f"❌ GPT-4o error: {e}")
-            yield "I'm sorry, I encountered an error. Please try again." 
\ No newline at end of file
+            yield "I'm sorry, I encountered an error. Please try again."
+
+
+class AsyncGPT4oProvider(AsyncLLMProvider):
+    """
+    GPT-4o on the async OpenAI client; streams without blocking the event loop.
+
+    Pass a shared `http_client` (see registry.ProviderRegistry) to reuse a pooled connection.
+    """
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            print("OPENAI_API_KEY environment variable is not set!")
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+        self.model = "gpt-4o"
+
+    async def stream(self, system_prompt: str, user_prompt: str, response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """
+        Sends a streaming query to the GPT-4o model via the async OpenAI API.
+
+        Args:
+            system_prompt: The instruction or context for the model's behavior.
+            user_prompt: The user's direct question or input.
+            response_format: Optional OpenAI-style response format, e.g. {"type": "json_object"}
+                or a {"type": "json_schema", ...} structured-output schema.
+
+        Yields:
+            Chunks of the text response as they are generated by the LLM.
+
+        Errors are raised (not turned into a reply) so the gateway can retry them.
+        """
+        print(f"GPT-4o stream called with system prompt length: {len(system_prompt)}")
+        extra = {"response_format": response_format} if response_format else {}
+        stream = await self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            model=self.model,
+            stream=True,
+            stream_options={"include_usage": True},
+            **extra,
+        )
+
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                print(f"🔢 GPT-4o Token Usage - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
@@ -0,0 +1,114 @@
+import re
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import metrics
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+# Outcomes recorded under llm_json_parse_total{outcome=...}
+PARSED = "parsed"
+REPAIRED = "repaired"
+FAILED = "failed"
+
+
+def _strip_to_object(text: str) -> str:
+    text = _FENCE_RE.sub("", text.strip())
+    start = text.find("{")
+    return text[start:] if start != -1 else ""
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Closes an object cut off mid-stream: terminates an open string, drops a dangling
+    key or trailing comma, and appends the missing closing brackets.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        if escaped:
+            text = text[:-1]
+        text += '"'
+    text = text.rstrip()
+    # `"key"` or `"key":` with no value, or a trailing comma, cannot be completed
+    text = re.sub(r',?\s*"[^"]*"\s*:\s*$', "", text)
+    if stack and stack[-1] == "}":
+        text = re.sub(r',\s*"[^"]*"$', "", text)
+    text = text.rstrip().rstrip(",")
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Best-effort local repair of lightly malformed or truncated model JSON, so a bad
+    reply does not cost another model round trip. Handles code fences, prose around
+    the object, trailing commas and objects cut off mid-stream.
+
+    Returns:
+        The parsed object, or None if it could not be repaired.
+    """
+    candidate = _strip_to_object(text)
+    if not candidate:
+        return None
+    end = candidate.rfind("}")
+    attempts = []
+    if end != -1:
+        attempts.append(candidate[:end + 1])
+    attempts.append(candidate)
+    for attempt in attempts:
+        for fixed in (attempt, _TRAILING_COMMA_RE.sub(r"\1", attempt)):
+            for closed in (fixed, _close_truncated(fixed)):
+                try:
+                    value = json.loads(closed)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(value, dict):
+                    return value
+    return None
+
+
+def parse_model_json(text: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Parses a model reply that should be a single JSON object, repairing it locally
+    when needed, and records the outcome.
+
+    Returns:
+        (object, outcome) where outcome is PARSED, REPAIRED or FAILED ({} on failure).
+    """
+    candidate = _strip_to_object(text)
+    end = candidate.rfind("}")
+    if end != -1:
+        try:
+            value = json.loads(candidate[:end + 1])
+            if isinstance(value, dict):
+                metrics.incr("llm_json_parse_total", outcome=PARSED)
+                return value, PARSED
+        except json.JSONDecodeError:
+            pass
+
+    value = repair_json(text)
+    if value is not None:
+        print(f"[JSON] Repaired malformed model JSON locally ({len(text)} chars)")
+        metrics.incr("llm_json_parse_total", outcome=REPAIRED)
+        return value, REPAIRED
+
+    metrics.incr("llm_json_parse_total", outcome=FAILED)
+    return {}, FAILED
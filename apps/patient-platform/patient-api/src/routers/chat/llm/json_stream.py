@@ -0,0 +1,223 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Top-level field whose string value is streamed as deltas
+STREAMED_FIELD = "content"
+
+# Parser states
+_BEFORE_OBJECT = "before_object"
+_EXPECT_KEY = "expect_key"
+_IN_KEY = "in_key"
+_EXPECT_COLON = "expect_colon"
+_EXPECT_VALUE = "expect_value"
+_IN_STRING = "in_string"
+_IN_CONTAINER = "in_container"
+_IN_PRIMITIVE = "in_primitive"
+_AFTER_VALUE = "after_value"
+_DONE = "done"
+
+# Events emitted by StreamingJSONParser.feed()
+CONTENT_DELTA = "content_delta"  # (CONTENT_DELTA, "<decoded text>")
+FIELD = "field"                  # (FIELD, (name, value)) once a top-level value is complete
+COMPLETE = "complete"            # (COMPLETE, {...}) once the top-level object closes
+
+Event = Tuple[str, Any]
+
+
+class StreamingJSONParser:
+    """
+    Incremental, push-style parser for the single JSON object the model returns
+    (content, response_type, options, new_symptoms, summary_data).
+
+    Feed raw model chunks with `feed()`; each call returns the events that became
+    available: `content` string deltas while the string is still being written, and
+    one FIELD event per top-level key as soon as its value is complete. Text before
+    the opening brace (e.g. a code fence) and after the closing brace is ignored.
+    """
+
+    def __init__(self):
+        self.state = _BEFORE_OBJECT
+        self.result: Dict[str, Any] = {}
+        self._key_raw: List[str] = []
+        self._key: Optional[str] = None
+        self._value_raw: List[str] = []
+        self._escape = False
+        self._unicode_pending: List[str] = []  # collects "\uXXXX" while streaming content
+        self._high_surrogate = ""  # a "\uD83D" escape waiting for the low half of its pair
+        self._depth = 0
+        self._container_in_string = False
+        self._container_escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self.state == _DONE
+
+    def feed(self, chunk: str) -> List[Event]:
+        events: List[Event] = []
+        delta: List[str] = []
+        for ch in chunk:
+            if self.state == _DONE:
+                break
+            self._step(ch, events, delta)
+        if delta:
+            events.insert(0, (CONTENT_DELTA, "".join(delta)))
+        return events
+
+    # ----- state machine -----
+
+    def _step(self, ch: str, events: List[Event], delta: List[str]):
+        state = self.state
+        if state == _BEFORE_OBJECT:
+            if ch == "{":
+                self.state = _EXPECT_KEY
+        elif state == _EXPECT_KEY:
+            if ch == '"':
+                self._key_raw = []
+                self._escape = False
+                self.state = _IN_KEY
+            elif ch == "}":
+                self._finish(events)
+        elif state == _IN_KEY:
+            if self._escape:
+                self._key_raw.append(ch)
+                self._escape = False
+            elif ch == "\\":
+                self._key_raw.append(ch)
+                self._escape = True
+            elif ch == '"':
+                self._key = _loads_or('"' + "".join(self._key_raw) + '"', "".join(self._key_raw))
+                self.state = _EXPECT_COLON
+            else:
+                self._key_raw.append(ch)
+        elif state == _EXPECT_COLON:
+            if ch == ":":
+                self.state = _EXPECT_VALUE
+        elif state == _EXPECT_VALUE:
+            if ch in " \t\r\n":
+                return
+            self._value_raw = [ch]
+            if ch == '"':
+                self._escape = False
+                self._unicode_pending = []
+                self._high_surrogate = ""
+                self.state = _IN_STRING
+            elif ch in "{[":
+                self._depth = 1
+                self._container_in_string = False
+                self._container_escape = False
+                self.state = _IN_CONTAINER
+            else:
+                self.state = _IN_PRIMITIVE
+        elif state == _IN_STRING:
+            self._step_string(ch, events, delta)
+        elif state == _IN_CONTAINER:
+            self._step_container(ch, events)
+        elif state == _IN_PRIMITIVE:
+            if ch in ",}" or ch in " \t\r\n":
+                self._complete_value(events)
+                self.state = _AFTER_VALUE
+                self._step(ch, events, delta)
+            else:
+                self._value_raw.append(ch)
+        elif state == _AFTER_VALUE:
+            if ch == ",":
+                self.state = _EXPECT_KEY
+            elif ch == "}":
+                self._finish(events)
+
+    def _step_string(self, ch: str, events: List[Event], delta: List[str]):
+        self._value_raw.append(ch)
+        streaming = self._key == STREAMED_FIELD
+        if self._unicode_pending:
+            self._unicode_pending.append(ch)
+            if len(self._unicode_pending) == 6:
+                self._decode_unicode("".join(self._unicode_pending), delta)
+                self._unicode_pending = []
+            return
+        if self._escape:
+            self._escape = False
+            if streaming:
+                if ch == "u":
+                    self._unicode_pending = ["\\", "u"]
+                else:
+                    self._flush_surrogate(delta)
+                    delta.append(_loads_or('"\\' + ch + '"', ch))
+            return
+        if ch == "\\":
+            self._escape = True
+            return
+        if streaming:
+            self._flush_surrogate(delta)
+        if ch == '"':
+            self._complete_value(events)
+            self.state = _AFTER_VALUE
+        elif streaming:
+            delta.append(ch)
+
+    def _decode_unicode(self, escape: str, delta: List[str]):
+        """
+        Decodes one "\\uXXXX" escape of the streamed string. Characters outside the BMP
+        arrive as a surrogate pair of escapes (possibly split across chunks): the high
+        half is held until the low half arrives, since a lone surrogate cannot be
+        encoded when the delta is sent.
+        """
+        try:
+            code = int(escape[2:], 16)
+        except ValueError:
+            return
+        if 0xD800 <= code <= 0xDBFF:
+            self._flush_surrogate(delta)
+            self._high_surrogate = escape
+        elif 0xDC00 <= code <= 0xDFFF:
+            pair, self._high_surrogate = self._high_surrogate, ""
+            delta.append(_loads_or('"' + pair + escape + '"', "\ufffd") if pair else "\ufffd")
+        else:
+            self._flush_surrogate(delta)
+            delta.append(chr(code))
+
+    def _flush_surrogate(self, delta: List[str]):
+        """A high surrogate not followed by its low half is sent as U+FFFD."""
+        if self._high_surrogate:
+            self._high_surrogate = ""
+            delta.append("\ufffd")
+
+    def _step_container(self, ch: str, events: List[Event]):
+        self._value_raw.append(ch)
+        if self._container_in_string:
+            if self._container_escape:
+                self._container_escape = False
+            elif ch == "\\":
+                self._container_escape = True
+            elif ch == '"':
+                self._container_in_string = False
+            return
+        if ch == '"':
+            self._container_in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._complete_value(events)
+                self.state = _AFTER_VALUE
+
+    def _complete_value(self, events: List[Event]):
+        raw = "".join(self._value_raw)
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        self.result[self._key] = value
+        events.append((FIELD, (self._key, value)))
+        self._value_raw = []
+
+    def _finish(self, events: List[Event]):
+        self.state = _DONE
+        events.append((COMPLETE, self.result))
+
+
+def _loads_or(raw: str, default: str) -> str:
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return default
@@ -0,0 +1,256 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .base import AsyncLLMProvider, AsyncStatefulProvider
+from .gateway import GatewayProvider, GatewayStatefulProvider
+from .failover import HedgedProvider
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive pool shared by all model calls to one provider
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY_S", "120"))
+CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+READ_TIMEOUT_S = float(os.getenv("LLM_READ_TIMEOUT_S", "60"))
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except Exception:
+    HTTP2_AVAILABLE = False
+
+ResponseHook = Callable[[str, httpx.Response], None]
+
+
+class _InstrumentedStream(httpx.AsyncByteStream):
+    """Wraps a response body so the connection counts as in use until the stream is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for part in self._stream:
+            yield part
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport with a tuned keep-alive pool (HTTP/2 where available) that
+    records in-flight requests, time to response headers and pool size per provider.
+    Response hooks see every response (used by the gateway to read rate-limit headers).
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.response_hooks: List[ResponseHook] = []
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY_S,
+            ),
+        )
+
+    def _pool_connections(self) -> int:
+        pool = getattr(self._transport, "_pool", None)
+        return len(getattr(pool, "connections", []) or [])
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        metrics.add_gauge("llm_http_in_flight", 1, provider=self.provider)
+        metrics.incr("llm_http_requests_total", provider=self.provider)
+        start = time.perf_counter()
+        released = False
+
+        def _release():
+            nonlocal released
+            if not released:
+                released = True
+                metrics.add_gauge("llm_http_in_flight", -1, provider=self.provider)
+                metrics.set_gauge("llm_http_pool_connections", self._pool_connections(), provider=self.provider)
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            metrics.incr("llm_http_errors_total", provider=self.provider)
+            _release()
+            raise
+
+        metrics.observe("llm_http_headers_seconds", time.perf_counter() - start, provider=self.provider)
+        metrics.set_gauge("llm_http_pool_connections", self._pool_connections(), provider=self.provider)
+        for hook in self.response_hooks:
+            try:
+                hook(self.provider, response)
+            except Exception as e:
+                logger.error(f"[LLM][POOL] response hook failed provider={self.provider} error={e}")
+        response.stream = _InstrumentedStream(response.stream, _release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _build_http_client(provider: str) -> Tuple[httpx.AsyncClient, InstrumentedTransport]:
+    transport = InstrumentedTransport(provider)
+    http_client = httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(READ_TIMEOUT_S, connect=CONNECT_TIMEOUT_S),
+    )
+    return http_client, transport
+
+
+def _provider_factories() -> Dict[str, Callable[[httpx.AsyncClient], AsyncLLMProvider]]:
+    # Imported lazily so a missing optional SDK only affects its own provider
+    def gpt4o(http_client):
+        from .gpt import AsyncGPT4oProvider
+        return AsyncGPT4oProvider(http_client=http_client)
+
+    def groq(http_client):
+        from .groq import AsyncGroqProvider
+        return AsyncGroqProvider(http_client=http_client)
+
+    def cerebras(http_client):
+        from .cerebras import AsyncCerebrasProvider
+        return AsyncCerebrasProvider(http_client=http_client)
+
+    return {"gpt4o": gpt4o, "groq": groq, "cerebras": cerebras}
+
+
+# API key each provider needs; providers without a key are not warmed at startup
+PROVIDER_API_KEYS = {
+    "gpt4o": "OPENAI_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "cerebras": "CEREBRAS_API_KEY",
+}
+
+
+class ProviderRegistry:
+    """
+    Process-wide registry holding one long-lived async provider (and one pooled
+    HTTP client) per provider name, so chat turns reuse warm connections. Each
+    provider, stateful ones included, is wrapped in the gateway (concurrency limits,
+    queueing, retries).
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, AsyncLLMProvider] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, InstrumentedTransport] = {}
+        self._routes: Dict[Tuple[Tuple[str, ...], bool], HedgedProvider] = {}
+        self._stateful: Dict[str, AsyncStatefulProvider] = {}
+        self._factories = _provider_factories()
+
+    def names(self) -> List[str]:
+        return list(self._factories)
+
+    def get(self, name: str) -> AsyncLLMProvider:
+        provider = self._providers.get(name)
+        if provider is None:
+            factory = self._factories.get(name)
+            if factory is None:
+                raise ValueError(f"Unknown LLM provider: {name}")
+            http_client, transport = _build_http_client(name)
+            inner = factory(http_client)
+            # The gateway owns retries; disable the SDK's own so attempts are not multiplied
+            if hasattr(inner.client, "with_options"):
+                inner.client = inner.client.with_options(max_retries=0)
+            provider = GatewayProvider(name, inner)
+            transport.response_hooks.append(provider.on_response)
+            self._http_clients[name] = http_client
+            self._transports[name] = transport
+            self._providers[name] = provider
+            print(f"[LLM][POOL] Created provider={name} model={getattr(provider, 'model', '?')} http2={HTTP2_AVAILABLE}")
+        return provider
+
+    def routed(self, names: List[str], hedge: bool = True) -> AsyncLLMProvider:
+        """
+        Returns a provider that routes across `names` in order (primary first) with
+        per-provider circuit breakers and, if `hedge` is set, hedged requests.
+        A single name returns that provider directly.
+        """
+        if len(names) == 1:
+            return self.get(names[0])
+        key = (tuple(names), hedge)
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = HedgedProvider([(n, self.get(n)) for n in names], hedge=hedge)
+        return route
+
+    def stateful(self, mode: str, inner_name: str = "gpt4o") -> AsyncStatefulProvider:
+        """
+        Returns the stateful provider for `mode`: "responses" (OpenAI Responses API)
+        or "local" (in-process stand-in replaying turns through provider `inner_name`).
+        """
+        key = f"local:{inner_name}" if mode == "local" else mode
+        provider = self._stateful.get(key)
+        if provider is None:
+            if mode == "responses":
+                from .responses import AsyncResponsesProvider
+                http_client, transport = _build_http_client(mode)
+                inner = AsyncResponsesProvider(http_client=http_client)
+                inner.client = inner.client.with_options(max_retries=0)
+                # Same OpenAI key and model as gpt4o, so the same request budget: share its limiter
+                gateway = self.get("gpt4o")
+                provider = GatewayStatefulProvider(mode, inner, gateway.limiter)
+                transport.response_hooks.append(gateway.on_response)
+                self._http_clients[mode] = http_client
+                self._transports[mode] = transport
+            elif mode == "local":
+                from .responses import LocalStatefulProvider
+                provider = LocalStatefulProvider(self.get(inner_name))
+            else:
+                raise ValueError(f"Unknown stateful provider mode: {mode}")
+            self._stateful[key] = provider
+            print(f"[LLM][POOL] Created stateful provider={key} model={getattr(provider, 'model', '?')}")
+        return provider
+
+    def transport(self, name: str) -> InstrumentedTransport:
+        self.get(name)
+        return self._transports[name]
+
+    async def warm_up(self, names: Optional[List[str]] = None):
+        """Opens (and TLS-handshakes) a pooled connection to each configured provider."""
+        names = names or [n for n, key in PROVIDER_API_KEYS.items() if os.getenv(key)]
+
+        async def _warm(name: str):
+            start = time.perf_counter()
+            try:
+                provider = self.get(name)
+                await provider.client.models.list()
+                print(f"[LLM][POOL] Warmed provider={name} in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"[LLM][POOL] Warm-up failed provider={name}: {e}")
+
+        await asyncio.gather(*[_warm(n) for n in names])
+
+    async def aclose(self):
+        for name, http_client in self._http_clients.items():
+            try:
+                await http_client.aclose()
+            except Exception as e:
+                logger.error(f"[LLM][POOL] close failed provider={name} error={e}")
+        self._http_clients.clear()
+        self._transports.clear()
+        self._routes.clear()
+        self._stateful.clear()
+        self._providers.clear()
+
+
+provider_registry = ProviderRegistry()
@@ -0,0 +1,110 @@
+import os
+import uuid
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from .base import AsyncLLMProvider, AsyncStatefulProvider, ProviderSession
+
+
+def _responses_text_format(response_format: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Converts a Chat Completions response_format to the Responses API `text.format`."""
+    if not response_format:
+        return None
+    if response_format.get("type") == "json_schema":
+        schema = response_format.get("json_schema", {})
+        return {"type": "json_schema", "name": schema.get("name", "response"), "schema": schema.get("schema", {})}
+    return {"type": response_format.get("type", "text")}
+
+
+class AsyncResponsesProvider(AsyncStatefulProvider):
+    """
+    GPT-4o on the OpenAI Responses API with stored responses: each turn continues
+    from the previous response id instead of re-sending the system prompt and history.
+
+    Pass a shared `http_client` (see registry.ProviderRegistry) to reuse a pooled connection.
+    """
+    name = "responses"
+
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            print("OPENAI_API_KEY environment variable is not set!")
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+        self.model = "gpt-4o"
+
+    async def stream_turn(self, session: ProviderSession, input_items: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """
+        Streams one turn via the Responses API.
+
+        Args:
+            session: Continuation state; `session.response_id` is set from the stream.
+            input_items: New messages for this turn only.
+            response_format: Optional Chat Completions-style response format.
+
+        Yields:
+            Chunks of the text response as they are generated by the LLM.
+        """
+        extra = {}
+        if session.previous_response_id:
+            extra["previous_response_id"] = session.previous_response_id
+        text_format = _responses_text_format(response_format)
+        if text_format:
+            extra["text"] = {"format": text_format}
+        print(f"GPT-4o responses turn: items={len(input_items)} chars={sum(len(i['content']) for i in input_items)} "
+              f"continuing={bool(session.previous_response_id)}")
+        stream = await self.client.responses.create(
+            model=self.model,
+            input=input_items,
+            store=True,
+            stream=True,
+            **extra,
+        )
+
+        async for event in stream:
+            event_type = getattr(event, "type", "")
+            if event_type == "response.output_text.delta":
+                if event.delta:
+                    yield event.delta
+            elif event_type in ("response.created", "response.completed"):
+                session.response_id = event.response.id
+                usage = getattr(event.response, "usage", None)
+                if usage:
+                    print(f"🔢 GPT-4o Token Usage - Input: {usage.input_tokens}, Output: {usage.output_tokens}, Total: {usage.total_tokens}")
+            elif event_type in ("response.failed", "error"):
+                raise RuntimeError(f"Responses API error: {getattr(event, 'message', None) or event_type}")
+
+
+class LocalStatefulProvider(AsyncStatefulProvider):
+    """
+    In-process stand-in for a stateful provider. Keeps each conversation's items in
+    memory under generated response ids and replays them through a stateless
+    provider, so the stateful turn flow can be exercised without the Responses API.
+    """
+    name = "local"
+
+    def __init__(self, inner: AsyncLLMProvider, max_sessions: int = 1000):
+        self.inner = inner
+        self.model = getattr(inner, "model", None)
+        self.max_sessions = max_sessions
+        self._transcripts: Dict[str, List[Dict[str, str]]] = {}
+
+    async def stream_turn(self, session: ProviderSession, input_items: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        if session.previous_response_id and session.previous_response_id not in self._transcripts:
+            raise KeyError(f"Unknown previous response id: {session.previous_response_id}")
+        transcript = list(self._transcripts.get(session.previous_response_id, [])) + list(input_items)
+
+        system_prompt = "\n\n".join(i["content"] for i in transcript if i["role"] == "developer")
+        user_prompt = "\n\n".join(f"[{i['role']}]\n{i['content']}" for i in transcript if i["role"] != "developer")
+
+        parts = []
+        async for chunk in self.inner.stream(system_prompt, user_prompt, response_format):
+            parts.append(chunk)
+            yield chunk
+
+        session.response_id = f"local_{uuid.uuid4().hex}"
+        self._transcripts[session.response_id] = transcript + [{"role": "assistant", "content": "".join(parts)}]
+        while len(self._transcripts) > self.max_sessions:
+            self._transcripts.pop(next(iter(self._transcripts)))
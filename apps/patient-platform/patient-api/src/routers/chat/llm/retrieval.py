@@ -15,9 +15,28 @@ except Exception:
 logger = logging.getLogger(__name__)
 
 EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# Must match the dimension the index was built with (see scripts/ingest_pinecone.py)
+EMBED_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
+# Each document type lives in its own namespace instead of sharing one behind a `type` filter
+USE_NAMESPACES = os.getenv("PINECONE_NAMESPACES", "false").lower() in ("1", "true", "yes", "on")
 INDEX_NAME = os.getenv("PINECONE_INDEX", "oncolife-rag")
 REDIS_URL = os.getenv("REDIS_URL")
 
+# Document types ingested from the base documents (alerts, written docs, UKONS toolkit)
+BASE_DOC_TYPES = ["alert", "written_doc", "ukons"]
+
+# Maps the symptom labels used in the UI to the canonical keys used in document metadata
+SYMPTOM_ALIASES = {
+    "numbness or tingling": "neuropathy",
+    "mouth or throat sores": "mouth_sores",
+    "rash": "skin_rash",
+    "urinary issues": "urinary_problems",
+    "eye complaints": "eye_complaints",
+    "no appetite": "no_appetite",
+    "trouble breathing": "trouble_breathing",
+    "chest pain": "chest_pain",
+}
+
 _pc = None
 _oa = None
 _idx = None
@@ -55,11 +74,38 @@ def _cache_client():
 
 
 def _embed(text: str) -> List[float]:
-    logger.debug(f"[RAG] Embedding query (len={len(text)}) model={EMBED_MODEL}")
-    r = _oa_client().embeddings.create(model=EMBED_MODEL, input=text)
+    logger.debug(f"[RAG] Embedding query (len={len(text)}) model={EMBED_MODEL} dim={EMBED_DIM}")
+    kwargs = {}
+    if EMBED_MODEL.startswith("text-embedding-3") and EMBED_DIM != 1536:
+        kwargs["dimensions"] = EMBED_DIM
+    r = _oa_client().embeddings.create(model=EMBED_MODEL, input=text, **kwargs)
     return r.data[0].embedding
 
 
+def _query_types(vec: List[float], doc_types: List[str], symptoms: List[str], *, top_k: int) -> List[Any]:
+    """
+    Queries the index for the given document types restricted to the given symptoms.
+    With namespaces enabled each type is searched in its own (smaller) namespace and
+    the matches are merged by score; otherwise a `type` metadata filter is used.
+    """
+    idx = _index()
+    sym_filter = {"symptoms": {"$in": symptoms}}
+    if not USE_NAMESPACES:
+        type_filter = {"type": {"$eq": doc_types[0]}} if len(doc_types) == 1 else {"type": {"$in": doc_types}}
+        res = idx.query(
+            vector=vec, top_k=top_k, include_metadata=True,
+            filter={"$and": [type_filter, sym_filter]}
+        )
+        return res.matches or []
+
+    matches = []
+    for doc_type in doc_types:
+        res = idx.query(vector=vec, top_k=top_k, include_metadata=True, namespace=doc_type, filter=sym_filter)
+        matches.extend(res.matches or [])
+    matches.sort(key=lambda m: getattr(m, "score", None) or 0.0, reverse=True)
+    return matches[:top_k]
+
+
 def _normalize_symptoms(symptoms: List[str]) -> List[str]:
     norm = {s.strip().lower() for s in (symptoms or []) if s and s.strip()}
     out = sorted(norm)
@@ -92,17 +138,12 @@ def retrieve_for_single_symptom(symptom: str, *, k_ctcae=8, k_questions=8) -> Di
         return {"ctcae": [], "questions": []}
 
     vec = _embed(sym)
-    idx = _index()
 
     results = {"ctcae": [], "questions": []}
 
     if k_ctcae > 0:
         logger.debug(f"[RAG][PER][CTCAE] symptom='{sym}' top_k={k_ctcae}")
-        ctcae_res = idx.query(
-            vector=vec, top_k=k_ctcae, include_metadata=True,
-            filter={"$and": [{"type": {"$eq": "ctcae"}}, {"symptoms": {"$in": [sym]}}]}
-        )
-        matches = ctcae_res.matches or []
+        matches = _query_types(vec, ["ctcae"], [sym], top_k=k_ctcae)
         logger.debug(f"[RAG][PER][CTCAE] symptom='{sym}' matches={len(matches)}")
         results["ctcae"] = [
             {
@@ -116,11 +157,7 @@ def retrieve_for_single_symptom(symptom: str, *, k_ctcae=8, k_questions=8) -> Di
 
     if k_questions > 0:
         logger.debug(f"[RAG][PER][QUESTIONS] symptom='{sym}' top_k={k_questions}")
-        q_res = idx.query(
-            vector=vec, top_k=k_questions, include_metadata=True,
-            filter={"$and": [{"type": {"$eq": "question"}}, {"symptoms": {"$in": [sym]}}]}
-        )
-        matches = q_res.matches or []
+        matches = _query_types(vec, ["question"], [sym], top_k=k_questions)
         logger.debug(f"[RAG][PER][QUESTIONS] symptom='{sym}' matches={len(matches)}")
         results["questions"] = [
             {
@@ -234,6 +271,25 @@ def _spawn_background_full_refresh(symptoms: List[str], *, combined_key: str, tt
     Thread(target=_task, daemon=True).start()
 
 
+def prefetch_symptoms(symptoms: List[str], *, ttl: int = 3600, k_ctcae=8, k_questions=8):
+    """
+    Warms the per-symptom cache in the background so that the next turn's retrieval
+    for newly reported symptoms is a cache hit.
+    """
+    q_syms = _normalize_symptoms(symptoms)
+    if not q_syms or not _cache_client():
+        return
+
+    def _task():
+        for sym in q_syms:
+            try:
+                cached_retrieve_single_symptom(sym, ttl=ttl, k_ctcae=k_ctcae, k_questions=k_questions)
+            except Exception as e:
+                logger.error(f"[RAG][PREFETCH] failed symptom='{sym}' error={e}")
+    logger.debug(f"[RAG][PREFETCH] Start symptoms={q_syms}")
+    Thread(target=_task, daemon=True).start()
+
+
 # ----- Original full-set retrieval -----
 
 def retrieve_for_symptoms(symptoms: List[str], *, k_ctcae=8, k_questions=8) -> Dict[str, List[Dict[str, Any]]]:
@@ -244,17 +300,11 @@ def retrieve_for_symptoms(symptoms: List[str], *, k_ctcae=8, k_questions=8) -> D
     query = ", ".join(q_syms)
     vec = _embed(query)
 
-    idx = _index()
-
     results = {"ctcae": [], "questions": []}
 
     if k_ctcae > 0:
         logger.debug(f"[RAG][CTCAE] Query top_k={k_ctcae} filter_syms={q_syms}")
-        ctcae_res = idx.query(
-            vector=vec, top_k=k_ctcae, include_metadata=True,
-            filter={"$and": [{"type": {"$eq": "ctcae"}}, {"symptoms": {"$in": q_syms}}]}
-        )
-        matches = ctcae_res.matches or []
+        matches = _query_types(vec, ["ctcae"], q_syms, top_k=k_ctcae)
         logger.debug(f"[RAG][CTCAE] matches={len(matches)}")
         results["ctcae"] = [
             {
@@ -268,11 +318,7 @@ def retrieve_for_symptoms(symptoms: List[str], *, k_ctcae=8, k_questions=8) -> D
 
     if k_questions > 0:
         logger.debug(f"[RAG][QUESTIONS] Query top_k={k_questions} filter_syms={q_syms}")
-        q_res = idx.query(
-            vector=vec, top_k=k_questions, include_metadata=True,
-            filter={"$and": [{"type": {"$eq": "question"}}, {"symptoms": {"$in": q_syms}}]}
-        )
-        matches = q_res.matches or []
+        matches = _query_types(vec, ["question"], q_syms, top_k=k_questions)
         logger.debug(f"[RAG][QUESTIONS] matches={len(matches)}")
         results["questions"] = [
             {
@@ -338,4 +384,66 @@ def cached_retrieve(symptoms: List[str], *, ttl: int = 3600, k_ctcae=8, k_questi
         logger.debug(f"[RAG][CACHE] SET ttl={ttl}s size={len(json.dumps(res))} bytes")
     except Exception as e:
         logger.error(f"[RAG][CACHE] set failed error={e}")
-    return res 
\ No newline at end of file
+    return res 
+
+
+# ----- Base document retrieval (alerts, written docs, UKONS toolkit) -----
+
+def _expand_symptom_aliases(symptoms: List[str]) -> List[str]:
+    expanded = set()
+    for sym in _normalize_symptoms(symptoms):
+        expanded.add(sym)
+        expanded.add(SYMPTOM_ALIASES.get(sym, sym.replace(" ", "_")))
+    return sorted(expanded)
+
+
+def retrieve_base_documents(symptoms: List[str], *, k=8) -> List[Dict[str, Any]]:
+    """
+    Retrieves the base-document chunks most relevant to the active symptoms.
+    Chunks tagged "general" (immediate red flags, care team guidance) are always eligible.
+    """
+    q_syms = _expand_symptom_aliases(symptoms)
+    query = ", ".join(q_syms) if q_syms else "immediate red flag alerts"
+    vec = _embed(query)
+
+    logger.debug(f"[RAG][BASE] Query top_k={k} filter_syms={q_syms}")
+    matches = _query_types(vec, BASE_DOC_TYPES, q_syms + ["general"], top_k=k)
+    logger.debug(f"[RAG][BASE] matches={len(matches)}")
+    return [
+        {
+            "text": m.metadata.get("text", ""),
+            "type": m.metadata.get("type", ""),
+            "symptoms": m.metadata.get("symptoms", []),
+            "source": m.metadata.get("source", ""),
+            "score": getattr(m, "score", None),
+        }
+        for m in matches
+    ]
+
+
+def cached_retrieve_base_documents(symptoms: List[str], *, ttl: int = 3600, k=8) -> List[Dict[str, Any]]:
+    cache = _cache_client()
+    if not cache:
+        return retrieve_base_documents(symptoms, k=k)
+
+    key = _key(f"base:{k}", symptoms)
+    try:
+        raw = cache.get(key)
+    except Exception as e:
+        logger.error(f"[RAG][CACHE][BASE] get failed key={key} error={e}")
+        raw = None
+
+    if raw:
+        logger.debug(f"[RAG][CACHE][BASE] HIT key={key}")
+        try:
+            return json.loads(raw)
+        except Exception as e:
+            logger.error(f"[RAG][CACHE][BASE] decode failed key={key} error={e}")
+
+    res = retrieve_base_documents(symptoms, k=k)
+    try:
+        cache.setex(key, ttl, json.dumps(res))
+        logger.debug(f"[RAG][CACHE][BASE] SET key={key} ttl={ttl}s")
+    except Exception as e:
+        logger.error(f"[RAG][CACHE][BASE] set failed key={key} error={e}")
+    return res
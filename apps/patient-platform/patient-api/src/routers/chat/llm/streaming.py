@@ -0,0 +1,46 @@
+import time
+from typing import List, Optional
+
+# Target interval between WebSocket frames while streaming model output
+STREAM_FRAME_INTERVAL_S = 0.03
+
+
+class FrameCoalescer:
+    """
+    Coalesces small text deltas into frames of roughly `interval` seconds so the client
+    is not flooded with one WebSocket frame per token.
+    """
+
+    def __init__(self, interval: float = STREAM_FRAME_INTERVAL_S, hold_prefixes: Optional[List[str]] = None):
+        self.interval = interval
+        # Text that is still a prefix of one of these (e.g. the summary sentinel "DONE") is held back
+        self.hold_prefixes = hold_prefixes or []
+        self._pending = ""
+        self._emitted = ""
+        self._last_flush = time.monotonic()
+
+    def push(self, delta: str) -> Optional[str]:
+        """Adds a delta; returns a frame when one is due."""
+        if delta:
+            self._pending += delta
+        if not self._pending or self._held():
+            return None
+        if time.monotonic() - self._last_flush < self.interval:
+            return None
+        return self._take()
+
+    def flush(self) -> Optional[str]:
+        """Returns whatever is left, unless it is still being held back."""
+        if not self._pending or self._held():
+            return None
+        return self._take()
+
+    def _held(self) -> bool:
+        text = (self._emitted + self._pending).strip()
+        return any(p.startswith(text) for p in self.hold_prefixes)
+
+    def _take(self) -> str:
+        frame, self._pending = self._pending, ""
+        self._emitted += frame
+        self._last_flush = time.monotonic()
+        return frame
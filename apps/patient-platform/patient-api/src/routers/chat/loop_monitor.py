@@ -0,0 +1,53 @@
+import os
+import asyncio
+from typing import Optional
+
+from .llm.metrics import metrics
+
+# How often the monitor wakes up; its lateness is the event-loop lag
+LOOP_LAG_INTERVAL_S = float(os.getenv("LOOP_LAG_INTERVAL_S", "0.5"))
+# Lag at or above this is logged and counted as a stall
+LOOP_LAG_WARN_S = float(os.getenv("LOOP_LAG_WARN_S", "0.1"))
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop runs a timer. Any blocking call on the loop
+    (a synchronous DB query, file read or CPU-heavy step) delays every live chat
+    on the worker by the same amount, and shows up here.
+    Exposed at /metrics/llm as `event_loop_lag_seconds` (gauge and summary) and
+    `event_loop_stalls_total`.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_S, warn_after: float = LOOP_LAG_WARN_S):
+        self.interval = interval
+        self.warn_after = warn_after
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            metrics.set_gauge("event_loop_lag_seconds", lag)
+            metrics.observe("event_loop_lag_seconds", lag)
+            if lag >= self.warn_after:
+                metrics.incr("event_loop_stalls_total")
+                print(f"[LOOP] Event loop blocked for {lag * 1000:.0f} ms")
+
+
+loop_monitor = EventLoopLagMonitor()
@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .alerts import is_negated
+from .constants import SYMPTOM_OPTIONS
+from .grading import SYMPTOM_TERMS, get_ctcae_index
+from .questions import symptom_key
+from .llm.metrics import metrics
+
+# Prefetch retrieval for symptoms mentioned in the patient's message before the model confirms them
+MENTION_PREFETCH_ENABLED = os.getenv("MENTION_PREFETCH_ENABLED", "true").lower() == "true"
+
+# Patient wording for the symptom selection options
+SYMPTOM_SYNONYMS = {
+    "Fever": ["fever", "feverish", "febrile", "temperature", "chills"],
+    "Diarrhea": ["diarrhea", "diarrhoea", "loose stool", "loose stools", "watery stool", "watery stools"],
+    "Pain": ["pain", "painful", "hurts", "hurting", "ache", "aching", "aches"],
+    "Nausea": ["nausea", "nauseous", "nauseated", "queasy", "sick to my stomach"],
+    "Vomiting": ["vomit", "vomiting", "vomited", "throwing up", "threw up", "puking", "puked"],
+    "Cough": ["cough", "coughing"],
+    "Fatigue": ["fatigue", "fatigued", "tired", "exhausted", "no energy", "worn out"],
+    "Swelling": ["swelling", "swollen", "puffy"],
+    "Numbness or Tingling": ["numb", "numbness", "tingling", "tingly", "pins and needles", "neuropathy"],
+    "Constipation": ["constipation", "constipated", "can't poop", "no bowel movement"],
+    "Mouth or Throat Sores": ["mouth sores", "mouth sore", "sore throat", "mouth ulcers", "canker sores", "sores in my mouth"],
+    "Rash": ["rash", "itchy skin", "hives"],
+    "Urinary Issues": ["burning when i pee", "painful urination", "peeing a lot", "urinary", "blood in my urine"],
+}
+
+# CTCAE categories that are lab values or procedures rather than something a patient reports
+_EXCLUDED_CATEGORIES = {"Investigations", "Surgical and medical procedures", "Social circumstances"}
+_EXCLUDED_TERMS = {"fall", "death"}
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every occurrence of every pattern."""
+
+    def __init__(self, patterns: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (pattern length, value) of every pattern ending there
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        for pattern, value in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(pattern), value))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yields (start, end, value) for every match."""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, value in self._out[state]:
+                yield i - length + 1, i + 1, value
+
+
+def build_vocabulary() -> Dict[str, str]:
+    """
+    Phrase -> symptom name: the selection options and their patient wording, plus
+    the patient-reportable CTCAE terms. CTCAE terms graded under a selection option
+    (e.g. "Mucositis oral") report that option's name.
+    """
+    options = [o for o in SYMPTOM_OPTIONS if o not in ("Other", "None")]
+    term_labels = {SYMPTOM_TERMS[symptom_key(o)].lower(): o for o in options if symptom_key(o) in SYMPTOM_TERMS}
+    vocabulary: Dict[str, str] = {}
+    for term in get_ctcae_index().terms.values():
+        name = term.name.lower()
+        if term.category in _EXCLUDED_CATEGORIES or name in _EXCLUDED_TERMS or "specify" in name or len(name) < 4:
+            continue
+        vocabulary[name] = term_labels.get(name, term.name)
+    for option in options:
+        vocabulary[option.lower()] = option
+        for phrase in SYMPTOM_SYNONYMS.get(option, []):
+            vocabulary[phrase] = option
+    return vocabulary
+
+
+class SymptomMentionDetector:
+    """Finds symptoms mentioned in free text: whole-word, case-insensitive, skipping negated mentions."""
+
+    def __init__(self, vocabulary: Dict[str, str]):
+        self._matcher = AhoCorasick(vocabulary)
+
+    def detect(self, text: str) -> List[str]:
+        text = (text or "").lower().replace("’", "'")
+        found: List[str] = []
+        for start, end, symptom in self._matcher.find(text):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            if symptom not in found and not is_negated(text, start):
+                found.append(symptom)
+        return found
+
+    def new_mentions(self, text: str, known: Optional[List[str]]) -> List[str]:
+        """Mentioned symptoms that are not already in `known` (compared by canonical key)."""
+        known_keys = {symptom_key(k) for k in (known or [])}
+        return [s for s in self.detect(text) if symptom_key(s) not in known_keys]
+
+
+_detector: Optional[SymptomMentionDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_mention_detector() -> SymptomMentionDetector:
+    """The detector, with its automaton built once per process."""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                vocabulary = build_vocabulary()
+                _detector = SymptomMentionDetector(vocabulary)
+                print(f"[MENTIONS] Built symptom matcher over {len(vocabulary)} phrases")
+    return _detector
+
+
+def record_mentions(mentioned: List[str], confirmed: Optional[List[str]]):
+    """Counts prefetched mentions the model did and did not confirm as new symptoms."""
+    confirmed_keys = {symptom_key(s) for s in (confirmed or [])}
+    for symptom in mentioned:
+        metrics.incr("chat_symptom_mentions_total", confirmed=symptom_key(symptom) in confirmed_keys)
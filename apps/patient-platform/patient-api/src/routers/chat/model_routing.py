@@ -0,0 +1,132 @@
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .constants import ConversationState
+from .llm.metrics import metrics
+
+# Route names
+FAST = "fast"
+STRONG = "strong"
+
+# Phrases in the patient's message that always get the strong model
+RED_FLAG_PATTERNS = [
+    r"chest pain", r"can'?t breathe", r"cannot breathe", r"short(ness)? of breath", r"trouble breathing",
+    r"faint(ed|ing)?", r"pass(ed)? out", r"unconscious", r"seiz(ure|ing)", r"confus(ed|ion)",
+    r"bleeding", r"bloody", r"blood in", r"(cough|vomit|throw)(ing|ed)? up blood", r"black stool",
+    r"fever", r"chills", r"10[0-4](\.\d)?\s*(°|degrees|f\b)",
+    r"suicid", r"kill myself", r"severe", r"unbearable", r"worst",
+]
+_RED_FLAG_RE = re.compile("|".join(RED_FLAG_PATTERNS), re.IGNORECASE)
+
+# Free-text answers that hedge or contradict themselves are treated as ambiguous
+UNCERTAINTY_PATTERNS = [r"not sure", r"don'?t know", r"maybe", r"kind of", r"sort of", r"i guess", r"hard to say", r"\bbut\b"]
+_UNCERTAIN_RE = re.compile("|".join(UNCERTAINTY_PATTERNS), re.IGNORECASE)
+
+# USD per 1M tokens (input, output); override with MODEL_PRICE_<PROVIDER>="in,out"
+DEFAULT_PRICES = {
+    "gpt4o": (2.50, 10.00),
+    "groq": (0.15, 0.75),
+    "cerebras": (0.40, 0.80),
+}
+
+
+class RouteDecision(NamedTuple):
+    route: str
+    provider: str
+    reason: str
+
+
+def _price(provider: str):
+    raw = os.getenv(f"MODEL_PRICE_{provider.upper()}")
+    if raw:
+        try:
+            prompt_price, completion_price = (float(p) for p in raw.split(","))
+            return prompt_price, completion_price
+        except ValueError:
+            pass
+    return DEFAULT_PRICES.get(provider, (0.0, 0.0))
+
+
+def estimate_cost(provider: str, prompt_chars: int, completion_chars: int) -> float:
+    """Approximate USD cost of one call (~4 characters per token)."""
+    prompt_price, completion_price = _price(provider)
+    return (prompt_chars / 4 * prompt_price + completion_chars / 4 * completion_price) / 1_000_000
+
+
+class ModelRoutingPolicy:
+    """
+    Chooses a model per FOLLOWUP_QUESTIONS turn.
+
+    Routine turns (button answers, short clear replies) go to the fast provider.
+    The strong provider gets: the summary turn (the patient has just picked their
+    overall feeling), red-flag messages, conversations with a reported grade >= 3
+    symptom, ambiguous free text, and conversations past `max_fast_turns`.
+    """
+
+    def __init__(self, enabled: bool, fast_provider: str, strong_provider: str,
+                 max_fast_turns: int = 12, ambiguous_words: int = 25, severe_grade: int = 3):
+        self.enabled = enabled
+        self.fast_provider = fast_provider
+        self.strong_provider = strong_provider
+        self.max_fast_turns = max_fast_turns
+        self.ambiguous_words = ambiguous_words
+        self.severe_grade = severe_grade
+
+    @classmethod
+    def from_env(cls, default_provider: str) -> "ModelRoutingPolicy":
+        return cls(
+            enabled=os.getenv("MODEL_ROUTING_ENABLED", "false").lower() == "true",
+            fast_provider=os.getenv("MODEL_ROUTING_FAST_PROVIDER", "groq"),
+            strong_provider=os.getenv("MODEL_ROUTING_STRONG_PROVIDER", default_provider),
+            max_fast_turns=int(os.getenv("MODEL_ROUTING_MAX_FAST_TURNS", "12")),
+            ambiguous_words=int(os.getenv("MODEL_ROUTING_AMBIGUOUS_WORDS", "25")),
+            severe_grade=int(os.getenv("MODEL_ROUTING_SEVERE_GRADE", "3")),
+        )
+
+    def decide(self, state: str, message_type: str, latest_input: str,
+               history: List[Dict[str, Any]], severity_list: Optional[Dict[str, Any]] = None,
+               prior_user_turns: int = 0) -> RouteDecision:
+        if not self.enabled:
+            return RouteDecision(STRONG, self.strong_provider, "routing_disabled")
+
+        text = latest_input or ""
+        if state != ConversationState.FOLLOWUP_QUESTIONS and state != ConversationState.SYMPTOM_SELECTION_SENT:
+            return RouteDecision(STRONG, self.strong_provider, "state")
+        if message_type == "feeling_response":
+            return RouteDecision(STRONG, self.strong_provider, "summary")
+        if _RED_FLAG_RE.search(text):
+            return RouteDecision(STRONG, self.strong_provider, "red_flag")
+        if self._max_grade(severity_list) >= self.severe_grade:
+            return RouteDecision(STRONG, self.strong_provider, "severity")
+        if message_type == "text" and (len(text.split()) > self.ambiguous_words or _UNCERTAIN_RE.search(text)):
+            return RouteDecision(STRONG, self.strong_provider, "ambiguous")
+        # `history` may be only the recent window; `prior_user_turns` counts the summarized ones
+        user_turns = prior_user_turns + sum(1 for m in history if m.get("sender") == "user")
+        if user_turns > self.max_fast_turns:
+            return RouteDecision(STRONG, self.strong_provider, "long_conversation")
+        return RouteDecision(FAST, self.fast_provider, "routine")
+
+    @staticmethod
+    def _max_grade(severity_list: Optional[Dict[str, Any]]) -> int:
+        grades = []
+        for value in (severity_list or {}).values():
+            try:
+                grades.append(int(value))
+            except (TypeError, ValueError):
+                continue
+        return max(grades, default=0)
+
+
+def record_route(decision: RouteDecision, latency_s: float, first_token_s: Optional[float],
+                 prompt_chars: int, completion_chars: int):
+    """Records per-route turn count, latency and estimated cost."""
+    labels = {"route": decision.route, "provider": decision.provider}
+    metrics.incr("chat_route_turns_total", reason=decision.reason, **labels)
+    metrics.observe("chat_route_latency_seconds", latency_s, **labels)
+    if first_token_s is not None:
+        metrics.observe("chat_route_first_token_seconds", first_token_s, **labels)
+    cost = estimate_cost(decision.provider, prompt_chars, completion_chars)
+    metrics.incr("chat_route_cost_usd_total", cost, **labels)
+    print(f"[ROUTING] route={decision.route} provider={decision.provider} reason={decision.reason} "
+          f"latency={latency_s * 1000:.0f}ms cost≈${cost:.5f}")
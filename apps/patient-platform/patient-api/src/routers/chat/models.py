@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional, Dict, Any, Literal
 from uuid import UUID, uuid4
 from datetime import datetime
@@ -109,8 +109,11 @@ class UpdateStateRequest(BaseModel):
 # ===============================================================================
 
 class WebSocketMessageIn(BaseModel):
-    """A message received from the client over WebSocket."""
-    type: Literal["user_message"]
+    """
+    A message received from the client over WebSocket. `selection_update` carries the
+    symptom selection while the patient is still choosing (not saved, no reply).
+    """
+    type: Literal["user_message", "selection_update"]
     message_type: Literal["text", "button_response", "multi_select_response", "feeling_response"]
     content: str
     structured_data: Optional[Dict[str, Any]] = None
@@ -165,5 +168,48 @@ class ProcessResponse(BaseModel):
         from_attributes = True 
         json_encoders = {
             UUID: str
-        } 
+        }
+
+# ===============================================================================
+# LLM Response Models (the JSON format defined in oncolifebot_instructions.txt)
+# ===============================================================================
 
+# summary_data fields a "summary" or "end" turn must include (overall_feeling is set by the app)
+REQUIRED_SUMMARY_FIELDS = ("symptom_list", "severity_list", "longer_summary", "bulleted_summary")
+
+
+class LLMSummaryData(BaseModel):
+    symptom_list: List[str] = []
+    severity_list: Dict[str, Any] = {}
+    longer_summary: str = ""
+    medication_list: List[Any] = []
+    bulleted_summary: Any = ""
+    overall_feeling: Optional[str] = None
+
+class LLMTurnResponse(BaseModel):
+    """One model turn: the single JSON object the bot instructions require."""
+    content: str = ""
+    response_type: Literal["text", "single-select", "multi-select", "feeling-select", "summary", "end"] = "text"
+    options: Optional[List[str]] = None
+    new_symptoms: Optional[List[str]] = None
+    summary_data: Optional[LLMSummaryData] = None
+
+    @field_validator("response_type", mode="before")
+    @classmethod
+    def _normalize_response_type(cls, value):
+        # Models sometimes answer with the database spelling (single_select)
+        return value.strip().lower().replace("_", "-") if isinstance(value, str) else value
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.response_type in ("summary", "end")
+
+    @model_validator(mode="after")
+    def _require_summary_data(self):
+        # A terminal turn's summary_data is written to the chat as its final record
+        if self.is_terminal:
+            present = self.summary_data.model_fields_set if self.summary_data else set()
+            missing = [f for f in REQUIRED_SUMMARY_FIELDS if f not in present]
+            if missing:
+                raise ValueError(f"{self.response_type} turn is missing summary_data fields: {missing}")
+        return self
@@ -0,0 +1,303 @@
+import os
+import re
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm.metrics import metrics
+from .llm.retrieval import SYMPTOM_ALIASES
+from .alerts import FLAG_ATTRIBUTES
+
+# Serve the short-phase questions from questions.json without a model call
+QUESTION_SEQUENCER_ENABLED = os.getenv("QUESTION_SEQUENCER_ENABLED", "true").lower() == "true"
+
+YES_NO_OPTIONS = ["Yes", "No"]
+SEVERITY_OPTIONS = ["Mild", "Moderate", "Severe"]
+TREND_OPTIONS = ["Getting worse", "Staying the same", "Improving"]
+
+# "Select: a; b; c." / "Select all that apply: a, b, c"
+_SELECT_RE = re.compile(r"^(?P<prompt>.*?)\s*Select(?P<all> all that apply)?:\s*(?P<options>.+?)\.?\s*$", re.I | re.S)
+# "Is your stool: Black, Bloody, Other (select all that apply)?"
+_INLINE_SELECT_RE = re.compile(r"^(?P<prompt>[^:]+):\s*(?P<options>.+?)\s*\(select all that apply\)\?\s*$", re.I)
+_SEVERITY_RE = re.compile(r"\bmild, moderate,? or severe\b", re.I)
+_TREND_RE = re.compile(r"\bgetting worse, staying the same,? or improving\b", re.I)
+_YES_NO_RE = re.compile(r"^(are|is|do|does|did|have|has|any)\b", re.I)
+_RATING_ATTR_RE = re.compile(r"(_rating|_severity)$")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+# Attributes whose answer is a number ("3 days", "about 101.2")
+_NUMERIC_ATTR_RE = re.compile(r"^(temp_f|days_.*|.*_days|.*_count.*|.*_per_day|.*_per_24h|.*_pct)$")
+
+# Conditions a short question may carry, evaluated against the symptom's answers
+_IF_YES_RE = re.compile(r"^if (yes|so),?\s*", re.I)
+_IF_OTHER_RE = re.compile(r"^if other( location)?,?\s*", re.I)
+_IF_MODERATE_RE = re.compile(r"^if moderate over (\d+) days:\s*", re.I)
+
+# "How much have you been able to eat or drink" choices, as oral_intake_pct
+_INTAKE_PCT = [("about the same", 100), ("less than half", 50), ("almost nothing", 10), ("haven't eaten", 0), ("havent eaten", 0)]
+
+
+def _capitalize(text: str) -> str:
+    return text[:1].upper() + text[1:] if text else text
+
+
+def _value_key(text: str) -> str:
+    """"Infusion site" -> "infusion_site", matching the values used in the alert rules."""
+    return re.sub(r"\W+", "_", text.strip().lower()).strip("_")
+
+
+def symptom_key(label: str) -> str:
+    """Maps a UI symptom label ("Mouth or Throat Sores") to its questions.json key ("mouth_sores")."""
+    label = (label or "").strip().lower()
+    return SYMPTOM_ALIASES.get(label, label.replace(" ", "_"))
+
+
+class Question:
+    """
+    A short-phase question from questions.json, with the response type and options
+    derived from its text, and the condition (if any) under which it is asked.
+    """
+
+    def __init__(self, id: str, symptom: str, text: str, data_attribute: str, phase: str):
+        self.id = id
+        self.symptom = symptom
+        self.text = text
+        self.data_attribute = data_attribute
+        self.phase = phase
+        self.condition: Optional[Tuple[str, Any]] = None
+        self.content, self.response_type, self.options = self._parse(text)
+
+    def _parse(self, text: str) -> Tuple[str, str, List[str]]:
+        content = text.strip()
+        match = _IF_YES_RE.match(content)
+        if match:
+            self.condition, content = ("previous_yes", None), _capitalize(content[match.end():])
+        elif self.data_attribute.endswith("med_details"):
+            # "What medication did you take?" always follows "Have you taken ... medications?"
+            self.condition = ("previous_yes", None)
+        match = _IF_OTHER_RE.match(content)
+        if match:
+            self.condition, content = ("previous_other", None), _capitalize(content[match.end():])
+        match = _IF_MODERATE_RE.match(content)
+        if match:
+            self.condition, content = ("moderate_for_days", int(match.group(1))), _capitalize(content[match.end():])
+        if content.lower().startswith("if ") and self.condition is None:
+            # Any other condition needs interpretation; left to the model
+            self.condition = ("model", None)
+
+        match = _INLINE_SELECT_RE.match(content)
+        if match:
+            options = [_capitalize(o.strip()) for o in match.group("options").split(",") if o.strip()]
+            return match.group("prompt").strip() + " (select all that apply)?", "multi-select", options
+        match = _SELECT_RE.match(content)
+        if match:
+            raw = match.group("options")
+            options = [_capitalize(o.strip().rstrip(".")) for o in raw.split(";" if ";" in raw else ",") if o.strip()]
+            prompt = match.group("prompt").strip() or "Select all that apply."
+            return prompt, "multi-select" if match.group("all") else "single-select", options
+        if _SEVERITY_RE.search(content):
+            return content, "single-select", list(SEVERITY_OPTIONS)
+        if _TREND_RE.search(content):
+            return content, "single-select", list(TREND_OPTIONS)
+        if _YES_NO_RE.match(content) and " or " not in content:
+            return content, "single-select", list(YES_NO_OPTIONS)
+        return content, "text", []
+
+    @property
+    def is_rating(self) -> bool:
+        return bool(_RATING_ATTR_RE.search(self.data_attribute)) and self.options == SEVERITY_OPTIONS
+
+    def _option_value(self, option: str) -> Any:
+        if self.options == YES_NO_OPTIONS:
+            return option == "Yes"
+        if self.data_attribute == "oral_intake_pct":
+            lowered = option.lower()
+            for phrase, pct in _INTAKE_PCT:
+                if phrase in lowered:
+                    return pct
+        return _value_key(option)
+
+    def interpret(self, answer: str) -> Tuple[bool, Any]:
+        """
+        Maps the patient's answer to a `data_attribute` value.
+
+        Returns:
+            (understood, value). Not understood means the answer needs the model,
+            e.g. free text for a select question or no number for a numeric one.
+        """
+        answer = (answer or "").strip()
+        if not answer:
+            return False, None
+        by_text = {o.lower(): o for o in self.options}
+        if self.response_type == "single-select":
+            option = by_text.get(answer.lower())
+            return (True, self._option_value(option)) if option else (False, None)
+        if self.response_type == "multi-select":
+            picked = [by_text.get(p.strip().lower()) for p in answer.split(",") if p.strip()]
+            if not picked or None in picked:
+                return False, None
+            return True, [self._option_value(o) for o in picked]
+        if _NUMERIC_ATTR_RE.match(self.data_attribute):
+            number = _NUMBER_RE.search(answer)
+            return (True, float(number.group())) if number else (False, None)
+        return True, answer
+
+    def __repr__(self):
+        return f"Question({self.id}: {self.response_type} {self.options})"
+
+
+def _load_questions(path: str) -> Dict[str, List[Question]]:
+    """Short-phase questions by symptom, with the symptom's rating question moved first."""
+    with open(path, "r") as f:
+        raw = json.load(f)
+    by_symptom: Dict[str, List[Question]] = {}
+    for q in raw:
+        if q.get("phase") != "short":
+            continue
+        by_symptom.setdefault(q["symptom"], []).append(
+            Question(q["id"], q["symptom"], q["text"], q["data_attribute"], q["phase"])
+        )
+    for symptom, questions in by_symptom.items():
+        # The bot instructions ask the severity rating first; questions.json keeps it
+        # as one of the short questions (e.g. nausea_short_rating)
+        rating = next((q for q in questions if q.is_rating and q.condition is None), None)
+        if rating:
+            questions.remove(rating)
+            questions.insert(0, rating)
+    return by_symptom
+
+
+_questions: Optional[Dict[str, List[Question]]] = None
+_questions_lock = threading.Lock()
+
+
+def _questions_path() -> str:
+    model_inputs_path = "/app/model_inputs"
+    if not os.path.exists(model_inputs_path):
+        model_inputs_path = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs'))
+    return os.path.join(model_inputs_path, "questions.json")
+
+
+def get_short_questions() -> Dict[str, List[Question]]:
+    """Short-phase questions by symptom key, parsed once per process."""
+    global _questions
+    if _questions is None:
+        with _questions_lock:
+            if _questions is None:
+                _questions = _load_questions(_questions_path())
+                print(f"[QUESTIONS] Loaded short-phase questions for {len(_questions)} symptoms")
+    return _questions
+
+
+def question_catalog() -> Dict[str, Dict[str, Optional[List[str]]]]:
+    """
+    The attributes each symptom's questions (short and long phase) can record, by
+    symptom: {data_attribute: the option values a select answer can take, or None
+    when the answer is free-form, a number or yes/no}. Read fresh; used at startup.
+    """
+    with open(_questions_path(), "r") as f:
+        raw = json.load(f)
+    catalog: Dict[str, Dict[str, Optional[List[str]]]] = {}
+    for q in raw:
+        question = Question(q["id"], q["symptom"], q["text"], q["data_attribute"], q["phase"])
+        values = [v for v in (question._option_value(o) for o in question.options) if isinstance(v, str)]
+        attributes = catalog.setdefault(q["symptom"], {})
+        if q["data_attribute"] in attributes and (attributes[q["data_attribute"]] is None or not values):
+            attributes[q["data_attribute"]] = None
+        else:
+            attributes[q["data_attribute"]] = sorted(set(values) | set(attributes.get(q["data_attribute"]) or [])) or None
+    return catalog
+
+
+class QuestionSequencer:
+    """
+    Walks the short-phase questions for each of the chat's symptoms in order. State
+    lives on the conversation (`question_state`: the pending question id and the ids
+    already asked or skipped) and answers go to `symptom_answers` by symptom, so the
+    sequence survives reconnects. Questions whose condition needs interpretation are
+    skipped and left to the model, which also handles the long phase and the summary.
+    """
+
+    def __init__(self, questions: Optional[Dict[str, List[Question]]] = None):
+        self._questions = questions
+        self._by_id: Optional[Dict[str, Question]] = None
+
+    @property
+    def questions(self) -> Dict[str, List[Question]]:
+        if self._questions is None:
+            self._questions = get_short_questions()
+        return self._questions
+
+    @property
+    def by_id(self) -> Dict[str, Question]:
+        if self._by_id is None:
+            self._by_id = {q.id: q for qs in self.questions.values() for q in qs}
+        return self._by_id
+
+    def pending(self, state: Optional[Dict[str, Any]]) -> Optional[Question]:
+        return self.by_id.get((state or {}).get("pending"))
+
+    def record_answer(self, state: Optional[Dict[str, Any]], answer: str) -> Tuple[Optional[Question], bool, Any]:
+        """
+        Interprets `answer` against the pending question.
+
+        Returns:
+            (question, understood, value); question is None when nothing was pending.
+        """
+        question = self.pending(state)
+        if question is None:
+            return None, False, None
+        understood, value = question.interpret(answer)
+        metrics.incr("chat_short_answers_total", understood=understood)
+        return question, understood, value
+
+    def _applies(self, question: Question, previous: Optional[Question], answers: Dict[str, Any]) -> bool:
+        if question.condition is None:
+            return True
+        kind, arg = question.condition
+        if kind == "previous_yes":
+            if previous is None:
+                return False
+            # A yes/no answer to a numeric attribute is recorded under its flag (see alerts.merge_answers)
+            attribute = previous.data_attribute
+            return answers.get(attribute, answers.get(FLAG_ATTRIBUTES.get(attribute))) is True
+        if kind == "previous_other":
+            value = answers.get(previous.data_attribute) if previous else None
+            values = value if isinstance(value, list) else [value]
+            return any(isinstance(v, str) and "other" in v for v in values)
+        if kind == "moderate_for_days":
+            rating = next((q for q in self.questions.get(question.symptom, []) if q.is_rating), None)
+            days = answers.get("days_in_a_row")
+            return (rating is not None and answers.get(rating.data_attribute) == "moderate"
+                    and isinstance(days, (int, float)) and days >= arg)
+        return False
+
+    def next_question(self, symptom_labels: List[str], state: Optional[Dict[str, Any]],
+                      answers: Optional[Dict[str, Dict[str, Any]]]) -> Tuple[Optional[Question], Dict[str, Any]]:
+        """
+        Finds the next short-phase question to ask.
+
+        Returns:
+            (question or None when the short phase is over, new question_state).
+            Skipped questions are recorded in the state so they are not reconsidered.
+        """
+        done = list((state or {}).get("done", []))
+        answers = answers or {}
+        for label in symptom_labels or []:
+            key = symptom_key(label)
+            previous = None
+            for question in self.questions.get(key, []):
+                if question.id in done:
+                    previous = question
+                    continue
+                if self._applies(question, previous, answers.get(key, {})):
+                    return question, {"pending": question.id, "done": done + [question.id]}
+                done.append(question.id)
+                previous = question
+        return None, {"pending": None, "done": done}
+
+
+def render_answers(answers: Optional[Dict[str, Dict[str, Any]]]) -> str:
+    """Compact prompt text of the answers collected so far ("" when there are none)."""
+    lines = [f"- {symptom}: " + ", ".join(f"{k}={v}" for k, v in values.items())
+             for symptom, values in (answers or {}).items() if values]
+    return "\n".join(lines)
@@ -1,36 +1,110 @@
 import os
-import json
+import re
+import hashlib
 import uuid
-from typing import Dict, Any, List, Tuple, Generator, AsyncGenerator
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple, Generator, AsyncGenerator
 from uuid import UUID
 from sqlalchemy.orm import Session
+from pydantic import ValidationError
 from datetime import datetime, time
+import time as time_module
 import pytz
 
 from .models import (
     WebSocketMessageIn, WebSocketMessageOut,
-    ConnectionEstablished, Message, ProcessResponse
+    ConnectionEstablished, Message, ProcessResponse,
+    WebSocketMessageChunk, WebSocketStreamEnd, LLMTurnResponse
 )
-from .constants import ConversationState
-from .llm.context import ContextLoader
-from .llm.gpt import GPT4oProvider
-from .llm.groq import GroqProvider
-from .llm.cerebras import CerebrasProvider
-from .llm.retrieval import retrieve_for_symptoms, cached_retrieve
+from .constants import ConversationState, SYMPTOM_OPTIONS
+from .model_routing import ModelRoutingPolicy, RouteDecision, record_route
+from .history import render_summary, encode_history
+from .connection_state import ChatConnectionState
+from .grading import grade_answers, raise_grades, render_grades
+from .mentions import MENTION_PREFETCH_ENABLED, get_mention_detector, record_mentions
+from .speculation import SPECULATION_ENABLED, selection_prefetch, speculative_followups
+from .db_executor import run_db
+from .questions import QuestionSequencer, Question, QUESTION_SEQUENCER_ENABLED, render_answers
+from .alerts import (
+    AlertRule, GLOBAL_SCOPE, evaluate_alerts, extract_text_attributes,
+    merge_answers, alert_record, escalate_alerts
+)
+from .llm.context import get_context_loader
+from .llm.base import AsyncLLMProvider, ProviderSession
+from .llm.registry import provider_registry
+from .llm.retrieval import retrieve_for_symptoms, cached_retrieve, prefetch_symptoms
+from .llm.streaming import FrameCoalescer
+from .llm.json_stream import StreamingJSONParser, CONTENT_DELTA, FIELD
+from .llm.json_repair import parse_model_json, PARSED, REPAIRED, FAILED
+from .llm.metrics import metrics
+from .llm.cache import CachedProvider, response_cache, cacheable
 from db.patient_models import Conversations as ChatModel, Messages as MessageModel
 
-LLM_PROVIDER = "gpt4o"  # Options: "gpt4o", "groq", "cerebras"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gpt4o")  # Options: "gpt4o", "groq", "cerebras"
+# Providers tried after the primary (comma-separated), e.g. "groq,cerebras"
+LLM_FALLBACK_PROVIDERS = [p.strip() for p in os.getenv("LLM_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+# Send to the next provider when the current one misses its p95 first-token deadline
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() == "true"
+
+
+def _build_response_format(mode: str) -> Optional[Dict[str, Any]]:
+    """
+    Maps LLM_RESPONSE_FORMAT to the provider request: "json_object" (JSON mode),
+    "json_schema" (structured output against LLMTurnResponse) or "off".
+    """
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "llm_turn_response", "schema": LLMTurnResponse.model_json_schema()},
+        }
+    if mode == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+LLM_RESPONSE_FORMAT = _build_response_format(os.getenv("LLM_RESPONSE_FORMAT", "json_object").lower())
+
+# Keep conversation state on the provider: "off", "responses" (OpenAI Responses API)
+# or "local" (in-process stand-in for development)
+LLM_STATEFUL_MODE = os.getenv("LLM_STATEFUL_MODE", "off").lower()
+
+
+def _prompt_sections(system_prompt: str) -> List[Tuple[str, str]]:
+    """Splits a ContextLoader prompt on its `=== name ===` headers into (hash, text) pairs."""
+    sections = [part for part in re.split(r"\n\n(?====)", system_prompt) if part.strip()]
+    return [(hashlib.sha256(part.encode("utf-8")).hexdigest()[:16], part) for part in sections]
+
+
+# Per-turn model choice (fast model for routine turns); off unless MODEL_ROUTING_ENABLED=true
+routing_policy = ModelRoutingPolicy.from_env(default_provider=LLM_PROVIDER)
+question_sequencer = QuestionSequencer()
+
+class _SpeculativeChat:
+    """Read-only view of a chat as it will be once the pending symptom selection is submitted."""
 
-def get_llm_provider():
-    """Factory function to get the configured LLM provider."""
-    if LLM_PROVIDER == "gpt4o":
-        return GPT4oProvider()
-    elif LLM_PROVIDER == "groq":
-        return GroqProvider()
-    elif LLM_PROVIDER == "cerebras":
-        return CerebrasProvider()
-    else:
-        raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
+    def __init__(self, chat: ChatModel, symptom_list: List[str]):
+        self.uuid = chat.uuid
+        self.symptom_list = symptom_list
+        self.conversation_state = ConversationState.FOLLOWUP_QUESTIONS
+        self.severity_list = chat.severity_list
+        self.triggered_alerts = chat.triggered_alerts
+        self.symptom_answers = chat.symptom_answers
+
+
+# Streamed chunks are sent with this placeholder id; the client replaces the
+# placeholder bubble with the persisted message once it arrives.
+STREAMING_MESSAGE_ID = -1
+
+def get_async_llm_provider(primary: str = LLM_PROVIDER) -> AsyncLLMProvider:
+    """
+    Returns the LLM provider from the process-wide pooled registry, routed with
+    failover (and hedging) across LLM_FALLBACK_PROVIDERS when set.
+
+    Args:
+        primary: Provider tried first; defaults to LLM_PROVIDER.
+    """
+    names = [primary] + [p for p in LLM_FALLBACK_PROVIDERS if p != primary]
+    return provider_registry.routed(names, hedge=LLM_HEDGING)
 
 
 # ===============================================================================
@@ -38,7 +112,9 @@ def get_llm_provider():
 # ===============================================================================
 
 class ConversationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Session] = None):
+        # REST routes pass their request session; the WebSocket path passes none and takes
+        # a short-lived session per DB operation (see ChatConnectionState)
         self.db = db
 
     def delete_chat(self, chat_uuid: UUID, patient_uuid: UUID):
@@ -80,8 +156,16 @@ class ConversationService:
         }
         return new_chat, initial_question
 
+    async def _connection_state(self, chat_uuid: UUID, state: Optional[ChatConnectionState]) -> Optional[ChatConnectionState]:
+        """The WebSocket connection's conversation state, or one loaded for this call only."""
+        return state if state is not None else await run_db(ChatConnectionState.load, chat_uuid)
+
     def _determine_next_state_and_response(self, chat: ChatModel, message: WebSocketMessageIn) -> Tuple[str, WebSocketMessageOut]:
-        """The main state machine for the conversation."""
+        """
+        The state machine for the deterministic opening of the conversation. Symptom
+        selection and follow-up turns are handled in process_message_stream, which
+        stages every change on `chat` for the turn's single save.
+        """
         current_state = chat.conversation_state
         next_state = current_state
         response_content = "I'm not sure how to respond to that. Can you try again?"
@@ -95,62 +179,8 @@ class ConversationService:
             next_state = ConversationState.SYMPTOM_SELECTION_SENT
             response_content = "Please select any symptoms you're experiencing today."
             response_type = "multi_select"
-            response_options = [
-                "Fever",
-                "Diarrhea",
-                "Pain",
-                "Nausea",
-                "Vomiting",
-                "Cough",
-                "Fatigue",
-                "Swelling",
-                "Numbness or Tingling",
-                "Constipation",
-                "Mouth or Throat Sores",
-                "Rash",
-                "Urinary Issues",
-                "Other",
-                "None"
-            ]
-
-        elif current_state == ConversationState.SYMPTOM_SELECTION_SENT:
-            next_state = ConversationState.FOLLOWUP_QUESTIONS
-            # Parse symptoms from multi-select response
-            symptoms = [s.strip() for s in message.content.split(',') if s.strip()]
-            # Filter out "None" if it's selected
-            symptoms = [s for s in symptoms if s.lower() != "none"]
-            
-            # Update the chat's symptom list in the database
-            if symptoms:
-                chat.symptom_list = list(set((chat.symptom_list or []) + symptoms))
-                print(f"Updated symptom list in database: {chat.symptom_list}")
-                self.db.commit()
-            
-            context = {"patient_state": {"current_symptoms": chat.symptom_list}}
-            response_content = self._query_knowledge_base_with_rag(chat, context)
-
-        elif current_state == ConversationState.FOLLOWUP_QUESTIONS:
-            chat_history = self.db.query(MessageModel).filter(MessageModel.chat_uuid == chat.uuid).order_by(MessageModel.id.desc()).limit(20).all()
-            context = {
-                "patient_state": {"current_symptoms": chat.symptom_list},
-                "latest_input": message.content,
-                "history": [Message.from_orm(m).model_dump(mode='json') for m in reversed(chat_history)]
-            }
-            
-            llm_response = self._query_knowledge_base_with_rag(chat, context)
-
-            if "DONE" in llm_response:
-                response_content = "DONE"
-            else:
-                # Check if the LLM is asking the user to add more symptoms
-                if "anything else you would like to discuss" in llm_response.lower():
-                    response_type = "button_prompt"
-                    response_options = ["Yes", "No"]
-                
-                response_content = llm_response
+            response_options = list(SYMPTOM_OPTIONS)
 
-            next_state = ConversationState.FOLLOWUP_QUESTIONS
-        
         assistant_response = WebSocketMessageOut(
             type="assistant_message",
             message_type=response_type,
@@ -159,134 +189,393 @@ class ConversationService:
         )
         return next_state, assistant_response
 
-    def _query_knowledge_base_with_rag(self, chat: ChatModel, context: Dict[str, Any]) -> str:
+    async def _query_knowledge_base_stream_with_rag(self, chat: ChatModel, context: Dict[str, Any], route: Optional[RouteDecision] = None, turn_kind: Optional[str] = None) -> AsyncGenerator[str, None]:
         """
-        Query knowledge base with complete context including base documents and RAG results.
+        Streaming version of knowledge base query with complete context.
+        Context assembly (file and RAG I/O) runs on a worker thread and the model is
+        streamed through the async provider, so the event loop is never blocked.
+        When a `route` is given, its provider is used and the turn's latency and
+        estimated cost are recorded for that route. Turns whose `turn_kind` is
+        listed in LLM_CACHE_TURNS are served through the response cache.
         """
-        print(f"KB_RAG: Querying {LLM_PROVIDER.upper()} with complete context...")
+        provider_name = route.provider if route else LLM_PROVIDER
+        started_at = time_module.perf_counter()
+        print(f"KB_RAG_STREAM: Streaming {provider_name.upper()} with complete context...")
         
         # 1. Load complete system prompt (base documents + RAG results)
-        model_inputs_path = "/app/model_inputs"
-        if not os.path.exists(model_inputs_path):
-            model_inputs_path = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs'))
-        context_loader = ContextLoader(model_inputs_path)
+        model_inputs_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs')
+        context_loader = get_context_loader(model_inputs_path)
         
         # Get patient symptoms for RAG
         patient_symptoms = context.get('patient_state', {}).get('current_symptoms', [])
         
-        # Load complete context (base documents + RAG results)
-        system_prompt = context_loader.load_context(patient_symptoms)
+        # Load complete context (base documents + RAG results); memoized per conversation and
+        # symptom set, so steady-state turns skip assembly and the worker-thread hop entirely
+        graded = context.get('graded_symptoms')
+        system_prompt = context_loader.peek_context(chat.uuid, patient_symptoms, graded) or await asyncio.to_thread(
+            context_loader.load_context_for_conversation, chat.uuid, patient_symptoms, graded
+        )
         
         print(f"Loaded complete context for symptoms: {patient_symptoms}")
 
         # 2. Construct the user prompt for the LLM
-        user_prompt_parts = [
-            "### Conversation Context ###",
-            f"Current Symptoms: {context.get('patient_state', {}).get('current_symptoms', [])}",
-            f"Chat History (most recent messages): {json.dumps(context.get('history', []), indent=2)}",
-            f"\n### User's Latest Message ###",
-            f"User: \"{context.get('latest_input', '')}\"",
-            "\n### Instructions ###",
-            "Follow the conversation workflow defined in your system instructions. Remember to respond with valid JSON only.",
-            "IMPORTANT: If you detect new symptoms in the user's message, include them in the 'new_symptoms' field of your JSON response."
-        ]
-        user_prompt = "\n".join(user_prompt_parts)
+        user_prompt = self._build_user_prompt(context, provider_name)
 
         # 3. Call the LLM provider
-        llm_provider = get_llm_provider()
-        response_generator = llm_provider.query(
+        llm_provider = get_async_llm_provider(provider_name)
+        if cacheable(provider_name, turn_kind):
+            llm_provider = CachedProvider(provider_name, llm_provider, response_cache)
+        response_stream = llm_provider.stream(
             system_prompt=system_prompt,
-            user_prompt=user_prompt
+            user_prompt=user_prompt,
+            response_format=LLM_RESPONSE_FORMAT
         )
 
-        # 4. Consume the streaming generator to get a single string response
-        full_response = "".join([chunk for chunk in response_generator])
-        
-        print(f"KB_RAG: Received response from {LLM_PROVIDER.upper()}: '{full_response[:100]}...'")
-        return full_response if full_response else "I'm not sure what to ask next. Can you tell me more?"
+        # 4. Yield chunks directly from the stream
+        first_token_s = None
+        completion_chars = 0
+        async for chunk in response_stream:
+            if first_token_s is None:
+                first_token_s = time_module.perf_counter() - started_at
+            completion_chars += len(chunk)
+            yield chunk
+
+        if route:
+            record_route(route, time_module.perf_counter() - started_at, first_token_s,
+                         len(system_prompt) + len(user_prompt), completion_chars)
+
+    @staticmethod
+    def _parse_selections(content: str) -> List[str]:
+        """Symptoms from a multi-select answer (comma separated, without "None")."""
+        selections = [s.strip() for s in (content or '').split(',') if s.strip()]
+        return [s for s in selections if s.lower() != 'none']
+
+    def _prepare_llm_turn(self, chat: ChatModel, message_type: str, latest_input: str,
+                          history_for_llm: List[Dict[str, Any]], history_summary: Optional[Dict[str, Any]],
+                          turn_kind: str) -> Tuple[Dict[str, Any], RouteDecision]:
+        """Builds the prompt context for a model turn and picks its route."""
+        grades = grade_answers(chat.symptom_answers)
+        context = {
+            "patient_state": {"current_symptoms": chat.symptom_list},
+            "latest_input": latest_input,
+            "history": history_for_llm,
+            "history_summary": render_summary(history_summary),
+            "triggered_alerts": [f"{a['id']} ({a['symptom']}, grade {a['grade']})" for a in (chat.triggered_alerts or [])],
+            "collected_answers": render_answers(chat.symptom_answers),
+            "ctcae_grades": render_grades(grades),
+            "graded_symptoms": sorted(grades),
+        }
+        route = routing_policy.decide(
+            chat.conversation_state, message_type, latest_input, history_for_llm, chat.severity_list,
+            prior_user_turns=(history_summary or {}).get("turns", 0)
+        )
+        if cacheable(route.provider, turn_kind):
+            # Row ids and timestamps differ in every chat; leave them out so the prompt can be cached
+            context["history"] = [
+                {k: v for k, v in m.items() if k not in ("id", "chat_uuid", "created_at")}
+                for m in history_for_llm
+            ]
+        return context, route
 
-    def _query_knowledge_base_stream_with_rag(self, chat: ChatModel, context: Dict[str, Any]) -> Generator[str, None, None]:
+    async def start_speculative_followup(self, chat_uuid: UUID, content: str, state: Optional[ChatConnectionState] = None):
         """
-        Streaming version of knowledge base query with complete context.
+        Called with the partial symptom selection while the patient is still choosing.
+        Once the selection has been stable for SPECULATION_DEBOUNCE_S, warms retrieval
+        and the prompt sections for the selected set and, when the first follow-up will
+        come from the model (no short-phase question applies and the stateless path is
+        in use), generates it in a background task. A newer
+        selection cancels the previous generation; `process_message_stream` uses the
+        result when the submitted selection matches.
         """
-        print(f"KB_RAG_STREAM: Streaming {LLM_PROVIDER.upper()} with complete context...")
-        
-        # 1. Load complete system prompt (base documents + RAG results)
-        model_inputs_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs')
-        context_loader = ContextLoader(model_inputs_path)
-        
-        # Get patient symptoms for RAG
-        patient_symptoms = context.get('patient_state', {}).get('current_symptoms', [])
-        
-        # Load complete context (base documents + RAG results)
-        system_prompt = context_loader.load_context(patient_symptoms)
-        
-        print(f"Loaded complete context for symptoms: {patient_symptoms}")
+        state = await self._connection_state(chat_uuid, state)
+        chat = state.chat if state else None
+        if not chat or chat.conversation_state != ConversationState.SYMPTOM_SELECTION_SENT:
+            return
+        selections = self._parse_selections(content)
+        if not selections:
+            selection_prefetch.cancel(chat_uuid)
+            speculative_followups.discard(chat_uuid)
+            return
+        symptoms = sorted(set((chat.symptom_list or []) + selections))
 
-        # 2. Construct the user prompt for the LLM
+        def warm():
+            prefetch_symptoms(selections)
+            model_inputs_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs')
+            get_context_loader(model_inputs_path).prefetch_sections(symptoms)
+        selection_prefetch.schedule(chat_uuid, warm)
+
+        if not SPECULATION_ENABLED or LLM_STATEFUL_MODE in ("responses", "local"):
+            return
+        if QUESTION_SEQUENCER_ENABLED and question_sequencer.next_question(symptoms, chat.question_state, chat.symptom_answers)[0]:
+            # The first follow-up will be a short-phase question served locally
+            speculative_followups.discard(chat_uuid, outcome="unused")
+            return
+
+        history_for_llm, history_summary = state.history()
+        # The submitted selection will be the latest message in the history
+        history_for_llm = history_for_llm + [{
+            "chat_uuid": str(chat_uuid), "sender": "user", "message_type": "multi_select_response",
+            "content": content, "structured_data": None,
+        }]
+        speculative_chat = _SpeculativeChat(chat, symptoms)
+        context, route = self._prepare_llm_turn(
+            speculative_chat, "multi_select_response", content, history_for_llm, history_summary, "first_followup"
+        )
+        speculative_followups.start(
+            chat_uuid, symptoms,
+            lambda: self._query_knowledge_base_stream_with_rag(speculative_chat, context, route, "first_followup"),
+        )
+
+    def _apply_alert_rules(self, chat: ChatModel, message: WebSocketMessageIn,
+                           answered: Optional[Tuple[str, str, Any]] = None) -> List[AlertRule]:
+        """
+        Records the answer's attributes (the answer to a locally asked short-phase
+        question, a structured `data_attribute` answer and any red flags in the text),
+        grades the symptoms against CTCAE, evaluates the compiled alert rules and
+        escalates newly triggered ones. `severity_list` is raised to the local grades
+        and alert overrides.
+
+        Args:
+            answered: (symptom, data_attribute, value) from the question sequencer.
+
+        Returns:
+            The newly triggered rules that require an emergency stop.
+        """
+        updates = []
+        if answered:
+            symptom, attribute, value = answered
+            updates.append((symptom, {attribute: value}))
+        structured = message.structured_data or {}
+        if structured.get("data_attribute"):
+            updates.append((structured.get("symptom") or GLOBAL_SCOPE,
+                            {structured["data_attribute"]: structured.get("value", message.content)}))
+        text_attributes = extract_text_attributes(message.content)
+        if text_attributes:
+            updates.append((GLOBAL_SCOPE, text_attributes))
+        if not updates:
+            return []
+
+        answers = chat.symptom_answers or {}
+        for scope, attributes in updates:
+            answers = merge_answers(answers, scope, attributes)
+        chat.symptom_answers = answers
+
+        # Grade each symptom locally from CTCAE.json; rules can read the grade as `ctcae_grade`
+        grades = grade_answers(answers)
+        severity = raise_grades(chat.severity_list, {s: g.grade for s, g in grades.items()})
+        graded_answers = {
+            scope: {**values, "ctcae_grade": grades[scope].grade} if scope in grades else values
+            for scope, values in answers.items()
+        }
+
+        already = {a.get("id") for a in (chat.triggered_alerts or [])}
+        new_rules = [r for r in evaluate_alerts(graded_answers) if r.id not in already]
+        if new_rules:
+            chat.triggered_alerts = list(chat.triggered_alerts or []) + [alert_record(r) for r in new_rules]
+            severity = raise_grades(severity, {r.symptom: r.override_to_grade for r in new_rules})
+            escalate_alerts(chat.uuid, new_rules)
+        if severity != (chat.severity_list or {}):
+            chat.severity_list = severity
+        return [r for r in new_rules if r.is_emergency]
+
+    def _local_question(self, chat: ChatModel, question: Question) -> MessageModel:
+        """The assistant's message for a short-phase question served by the sequencer (not yet saved)."""
+        print(f"[QUESTIONS] Serving {question.id} locally ({question.response_type})")
+        metrics.incr("chat_short_questions_served_total", symptom=question.symptom)
+        assistant_msg = MessageModel(
+            chat_uuid=chat.uuid,
+            sender="assistant",
+            message_type=question.response_type.replace('-', '_'),
+            content=question.content,
+            structured_data={"options": question.options} if question.options else None,
+        )
+        return assistant_msg
+
+    def _emergency_message(self, chat: ChatModel, rules: List[AlertRule]) -> MessageModel:
+        """Moves the chat to EMERGENCY and returns the (unsaved) emergency message for the triggering symptoms."""
+        symptoms = ", ".join(dict.fromkeys(r.symptom.replace("_", " ") for r in rules))
+        content = (
+            f"I see that you are reporting {symptoms}. This may be a serious symptom. "
+            "Please contact your medical team right away or call 911."
+        )
+        print(f"[ALERTS] Emergency stop for chat {chat.uuid}: {[r.id for r in rules]}")
+        chat.conversation_state = ConversationState.EMERGENCY
+        return MessageModel(chat_uuid=chat.uuid, sender="assistant", message_type="text", content=content)
+
+    def _build_user_prompt(self, context: Dict[str, Any], provider_name: str) -> str:
+        """Builds the per-turn user prompt (symptoms, summarized and recent history, latest message)."""
         user_prompt_parts = [
             "### Conversation Context ###",
             f"Current Symptoms: {context.get('patient_state', {}).get('current_symptoms', [])}",
-            f"Chat History (most recent messages): {json.dumps(context.get('history', []), indent=2)}",
+            f"Alerts already triggered and escalated to the care team: {context.get('triggered_alerts')}" if context.get('triggered_alerts') else "",
+            f"Answers already collected by the app (do not ask these again):\n{context.get('collected_answers')}" if context.get('collected_answers') else "",
+            f"CTCAE grades computed by the app (use these in severity_list):\n{context.get('ctcae_grades')}" if context.get('ctcae_grades') else "",
+            f"Earlier in this chat (summarized):\n{context.get('history_summary')}" if context.get('history_summary') else "",
+            f"Chat History (most recent messages; U = patient, A = assistant):\n{encode_history(context.get('history', []), provider_name)}",
             f"\n### User's Latest Message ###",
             f"User: \"{context.get('latest_input', '')}\"",
             "\n### Instructions ###",
             "Follow the conversation workflow defined in your system instructions. Remember to respond with valid JSON only.",
             "IMPORTANT: If you detect new symptoms in the user's message, include them in the 'new_symptoms' field of your JSON response."
         ]
-        user_prompt = "\n".join(user_prompt_parts)
-
-        # 3. Call the LLM provider
-        llm_provider = get_llm_provider()
-        response_generator = llm_provider.query(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt
-        )
-
-        # 4. Yield chunks directly from the generator
-        for chunk in response_generator:
-            yield chunk
+        return "\n".join(part for part in user_prompt_parts if part)
 
-    def _extract_json_from_response(self, text: str) -> Dict[str, Any]:
+    async def _query_knowledge_base_stateful_stream(self, chat: ChatModel, context: Dict[str, Any]) -> AsyncGenerator[str, None]:
         """
-        Extracts JSON from the LLM response, handling various formats.
+        Stateful version of the streaming query (LLM_STATEFUL_MODE). The provider keeps
+        the conversation server-side, so after the first turn only the new user input is
+        sent, plus any system-prompt sections (e.g. RAG results for a new symptom) that
+        the provider has not seen. The response id and the hashes of the sections sent
+        are stored on the chat row; an expired or unknown response id starts over.
         """
-        try:
-            # Try to find JSON in the response
-            start_idx = text.find('{')
-            end_idx = text.rfind('}')
-            
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                json_str = text[start_idx:end_idx + 1]
-                return json.loads(json_str)
+        provider = provider_registry.stateful(LLM_STATEFUL_MODE, LLM_PROVIDER)
+        provider_key = f"{LLM_STATEFUL_MODE}:{provider.model}"
+
+        model_inputs_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs')
+        context_loader = get_context_loader(model_inputs_path)
+        patient_symptoms = context.get('patient_state', {}).get('current_symptoms', [])
+        graded = context.get('graded_symptoms')
+        system_prompt = context_loader.peek_context(chat.uuid, patient_symptoms, graded) or await asyncio.to_thread(
+            context_loader.load_context_for_conversation, chat.uuid, patient_symptoms, graded
+        )
+        sections = _prompt_sections(system_prompt)
+
+        stored = chat.provider_context or {}
+        previous_id = chat.provider_response_id if stored.get("provider") == provider_key else None
+
+        def _items(continuing: bool) -> List[Dict[str, str]]:
+            known = set(stored.get("sections", [])) if continuing else set()
+            changed = [text for digest, text in sections if digest not in known]
+            items = []
+            if changed:
+                header = "" if not continuing else "Updated reference context for the current symptoms:\n\n"
+                items.append({"role": "developer", "content": header + "\n\n".join(changed)})
+            if continuing:
+                user_prompt = "\n".join(part for part in [
+                    f"Current Symptoms: {patient_symptoms}",
+                    # Short-phase questions asked by the app never went through the provider session
+                    f"Answers already collected by the app (do not ask these again):\n{context.get('collected_answers')}" if context.get('collected_answers') else "",
+                    f"CTCAE grades computed by the app (use these in severity_list):\n{context.get('ctcae_grades')}" if context.get('ctcae_grades') else "",
+                    f"User: \"{context.get('latest_input', '')}\"",
+                    "Continue the conversation workflow. Respond with valid JSON only, including 'new_symptoms' if the user mentions any.",
+                ] if part)
             else:
+                user_prompt = self._build_user_prompt(context, LLM_PROVIDER)
+            items.append({"role": "user", "content": user_prompt})
+            return items
+
+        session = ProviderSession(previous_id)
+        items = _items(continuing=previous_id is not None)
+        print(f"KB_RAG_STATEFUL: provider={provider_key} continuing={previous_id is not None} "
+              f"sent_chars={sum(len(i['content']) for i in items)} full_chars={len(system_prompt)}")
+        streamed = False
+        try:
+            async for chunk in provider.stream_turn(session, items, LLM_RESPONSE_FORMAT):
+                streamed = True
+                yield chunk
+        except Exception as e:
+            if streamed or previous_id is None:
+                raise
+            print(f"KB_RAG_STATEFUL: Could not continue {previous_id} ({e}); starting a new provider session")
+            metrics.incr("llm_stateful_restarts_total", provider=provider_key)
+            session = ProviderSession()
+            async for chunk in provider.stream_turn(session, _items(continuing=False), LLM_RESPONSE_FORMAT):
+                yield chunk
+
+        metrics.incr("llm_stateful_turns_total", provider=provider_key, continued=session.previous_response_id is not None)
+        chat.provider_response_id = session.response_id
+        chat.provider_context = {"provider": provider_key, "sections": [digest for digest, _ in sections]}
+
+    def _parse_llm_response(self, text: str, parser: StreamingJSONParser) -> Dict[str, Any]:
+        """
+        Returns the model's turn validated against LLMTurnResponse, or {} when the turn
+        cannot be used. Uses the incrementally parsed object when it completed,
+        otherwise parses (and if needed repairs) the raw text.
+
+        A "summary" or "end" turn is final, so it must be complete and valid: a locally
+        repaired one was cut off and its summary_data is partial. Such a summary fails
+        the turn; an emergency "end" is kept (its message has already been streamed to
+        the patient) without the summary_data.
+        """
+        if parser.complete:
+            llm_json, outcome = parser.result, PARSED
+            metrics.incr("llm_json_parse_total", outcome=PARSED)
+        else:
+            llm_json, outcome = parse_model_json(text)
+            if outcome == FAILED:
                 print(f"Could not find JSON in response: {text}")
-                return {}
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Response text: {text}")
+        if not llm_json:
             return {}
 
-    async def process_message_stream(self, chat_uuid: UUID, message: WebSocketMessageIn) -> AsyncGenerator[Any, None]:
+        response_type = str(llm_json.get("response_type", "")).strip().lower()
+        terminal = response_type in ("summary", "end")
+        try:
+            if terminal and outcome == REPAIRED:
+                raise ValueError("truncated reply repaired locally")
+            return LLMTurnResponse.model_validate(llm_json).model_dump(exclude_unset=True, exclude_none=True)
+        except (ValidationError, ValueError) as e:
+            metrics.incr("llm_json_schema_invalid_total", response_type=response_type or "unknown")
+            print(f"[JSON] Rejected {response_type or 'model'} turn: {e}")
+        if response_type == "end" and isinstance(llm_json.get("content"), str):
+            return {"content": llm_json["content"], "response_type": "end"}
+        return {}
+
+    async def process_message_stream(self, chat_uuid: UUID, message: WebSocketMessageIn,
+                                     state: Optional[ChatConnectionState] = None) -> AsyncGenerator[Any, None]:
         """
         Processes a message and streams the response back to the client.
+        `state` is the WebSocket connection's conversation state; without it the chat
+        and its history are loaded for this message.
         """
         print(f"🔍 Processing message for chat {chat_uuid}: {message.content}")
-        chat = self.db.query(ChatModel).filter(ChatModel.uuid == chat_uuid).first()
-        if not chat: 
+        state = await self._connection_state(chat_uuid, state)
+        if not state: 
             print(f"Chat {chat_uuid} not found")
             return
+        chat = state.chat
 
-        # 1. Save and yield the user's message
+        # 1. The user's message is written with this turn's chat changes: in one transaction
+        #    with the reply when it is answered locally, otherwise before the model call
+        #    (the model's side effects are the second transaction)
         user_msg = MessageModel(chat_uuid=chat_uuid, sender="user", message_type=message.message_type, content=message.content)
-        self.db.add(user_msg)
-        self.db.commit()
-        self.db.refresh(user_msg)
-        yield Message.from_orm(user_msg)
+        # (assistant message, frontend message type) for a turn answered without the model
+        local_reply: Optional[Tuple[MessageModel, str]] = None
+
+        # 1a. Record the answer to a short-phase question asked locally; an answer the
+        #     sequencer cannot map (e.g. free text for a select question) goes to the model
+        answered = None
+        needs_model = False
+        if chat.conversation_state == ConversationState.FOLLOWUP_QUESTIONS and QUESTION_SEQUENCER_ENABLED:
+            question, understood, value = question_sequencer.record_answer(chat.question_state, message.content)
+            if question is not None:
+                chat.question_state = {**chat.question_state, "pending": None}
+                if understood:
+                    answered = (question.symptom, question.data_attribute, value)
+                else:
+                    needs_model = True
+
+        # 1b. Evaluate the alert rules locally on this answer; red flags end the chat
+        #     as an emergency without waiting on the model
+        if chat.conversation_state == ConversationState.FOLLOWUP_QUESTIONS:
+            emergency_rules = self._apply_alert_rules(chat, message, answered)
+            if emergency_rules:
+                local_reply = (self._emergency_message(chat, emergency_rules), "text")
+
+        # 1c. Start retrieval for symptoms the patient mentions before the model confirms
+        #     them as new_symptoms, so the context for the grown symptom set is warm
+        mentioned = []
+        if (local_reply is None and MENTION_PREFETCH_ENABLED and message.message_type == 'text'
+                and chat.conversation_state == ConversationState.FOLLOWUP_QUESTIONS):
+            mentioned = get_mention_detector().new_mentions(message.content, chat.symptom_list)
+            if mentioned:
+                print(f"[MENTIONS] Prefetching context for mentioned symptoms: {mentioned}")
+                prefetch_symptoms(mentioned)
+                model_inputs_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'model_inputs')
+                get_context_loader(model_inputs_path).prefetch_sections((chat.symptom_list or []) + mentioned)
 
         # 2. If we are in an early deterministic state, use the state machine
         # Only CHEMO_CHECK_SENT is deterministic. SYMPTOM_SELECTION_SENT should fall through to LLM after updating symptoms.
-        if chat.conversation_state in [
+        if local_reply is None and chat.conversation_state in [
             ConversationState.CHEMO_CHECK_SENT,
         ]:
             try:
@@ -301,11 +590,9 @@ class ConversationService:
                     content="I understand. Would you like to discuss any other health-related concerns?",
                     options=["Yes", "No"],
                 )
-            # Persist next state
             chat.conversation_state = next_state
-            self.db.commit()
 
-            # Normalize and save assistant message
+            # Normalize the assistant message type for storage; the frontend type is kept for the reply
             db_message_type = assistant_response.message_type.replace('-', '_')
             assistant_msg = MessageModel(
                 chat_uuid=chat_uuid,
@@ -314,53 +601,103 @@ class ConversationService:
                 content=assistant_response.content,
                 structured_data={"options": assistant_response.options} if getattr(assistant_response, 'options', None) else None,
             )
-            self.db.add(assistant_msg)
-            self.db.commit()
-            self.db.refresh(assistant_msg)
-
-            # Yield with frontend message type preserved
-            frontend_message = Message.from_orm(assistant_msg)
-            frontend_message.message_type = assistant_response.message_type
-            yield frontend_message
-            return
+            local_reply = (assistant_msg, assistant_response.message_type)
 
         # 2b. If we are expecting symptom selection, update the symptom list and advance state, then continue to LLM
-        if chat.conversation_state == ConversationState.SYMPTOM_SELECTION_SENT and message.message_type == 'multi_select_response':
-            # Parse selections (comma separated string)
-            selections = [s.strip() for s in (message.content or '').split(',') if s.strip()]
-            selections = [s for s in selections if s.lower() != 'none']
+        turn_kind = "followup"
+        if (local_reply is None and chat.conversation_state == ConversationState.SYMPTOM_SELECTION_SENT
+                and message.message_type == 'multi_select_response'):
+            turn_kind = "first_followup"
+            selections = self._parse_selections(message.content)
             if selections:
-                chat.symptom_list = list(set((chat.symptom_list or []) + selections))
+                # Sorted so identical selections produce identical prompts (see llm/cache.py)
+                chat.symptom_list = sorted(set((chat.symptom_list or []) + selections))
                 print(f"[SYMPTOMS] Updated symptom_list after multi-select: {chat.symptom_list}")
             # Advance state to follow-up
             chat.conversation_state = ConversationState.FOLLOWUP_QUESTIONS
-            self.db.commit()
 
-        # 3. Get the full conversation history to send to the LLM
-        chat_history = self.db.query(MessageModel).filter(MessageModel.chat_uuid == chat.uuid).order_by(MessageModel.id.asc()).all()
-        history_for_llm = [Message.from_orm(m).model_dump(mode='json') for m in chat_history]
+        # 2c. Serve the next short-phase question from questions.json without the model;
+        #     long-phase branching, free-text interpretation and the summary use the LLM
+        if (local_reply is None and QUESTION_SEQUENCER_ENABLED and not needs_model
+                and chat.conversation_state == ConversationState.FOLLOWUP_QUESTIONS
+                and message.message_type != 'feeling_response'):
+            question, chat.question_state = question_sequencer.next_question(
+                chat.symptom_list, chat.question_state, chat.symptom_answers
+            )
+            if question is not None:
+                if turn_kind == "first_followup":
+                    speculative_followups.discard(chat_uuid, outcome="unused")
+                local_reply = (self._local_question(chat, question), question.response_type)
+
+        if local_reply is not None:
+            # Save both messages and the chat changes in one transaction, then yield them
+            assistant_msg, frontend_type = local_reply
+            await run_db(state.save, user_msg, assistant_msg)
+            yield Message.from_orm(user_msg)
+            frontend_message = Message.from_orm(assistant_msg)
+            frontend_message.message_type = frontend_type
+            yield frontend_message
+            return
+
+        # 3. Save and yield the user's message; the recent conversation history comes from
+        #    the connection state (older turns are folded into a running summary)
+        await run_db(state.save, user_msg)
+        chat = state.chat
+        yield Message.from_orm(user_msg)
+        history_for_llm, history_summary = state.history()
         # Debug: print history size and preview last few messages
         try:
-            print(f"[HISTORY] messages_in_history={len(history_for_llm)}")
+            print(f"[HISTORY] messages_in_history={len(history_for_llm)} summarized_turns={(history_summary or {}).get('turns', 0)}")
         except Exception:
             pass
 
-        context = {
-            "patient_state": {"current_symptoms": chat.symptom_list},
-            "latest_input": message.content,
-            "history": history_for_llm
-        }
-
+        context, route = self._prepare_llm_turn(
+            chat, message.message_type, message.content, history_for_llm, history_summary, turn_kind
+        )
         print(f"📝 Context prepared: patient_state={context.get('patient_state')} history_len={len(history_for_llm)}")
 
-        # 4. Stream the LLM response and build the full JSON string
+        # A first follow-up generated while the patient was still choosing symptoms is
+        # used when the submitted selection matches
+        speculative = speculative_followups.take(chat_uuid, chat.symptom_list) if turn_kind == "first_followup" else None
+
+        # 4. Stream the LLM response: forward the `content` field to the client as it
+        #    arrives (coalesced into ~30 ms frames) and parse the rest of the JSON incrementally
         try:
             print("🤖 Starting LLM processing...")
-            llm_response_generator = self._query_knowledge_base_stream_with_rag(chat, context)
+            if speculative is not None:
+                llm_response_generator = speculative.stream()
+            elif LLM_STATEFUL_MODE in ("responses", "local"):
+                llm_response_generator = self._query_knowledge_base_stateful_stream(chat, context)
+            else:
+                llm_response_generator = self._query_knowledge_base_stream_with_rag(chat, context, route, turn_kind)
             full_response_text = ""
-            for chunk_content in llm_response_generator:
+            parser = StreamingJSONParser()
+            # Summary turns carry the sentinel content "DONE", which is never shown to the patient
+            coalescer = FrameCoalescer(hold_prefixes=["DONE"])
+            streamed_any = False
+            async for chunk_content in llm_response_generator:
                 full_response_text += chunk_content
-                print(f"📦 LLM chunk: {chunk_content}")
+                content_delta = ""
+                for event, value in parser.feed(chunk_content):
+                    if event == CONTENT_DELTA:
+                        content_delta += value
+                    elif event == FIELD:
+                        field_name, field_value = value
+                        print(f"🧩 LLM field complete: {field_name}")
+                        if field_name == "new_symptoms" and field_value:
+                            # Start retrieval for new symptoms before the model finishes summary_data
+                            prefetch_symptoms(field_value)
+                frame = coalescer.push(content_delta)
+                if frame:
+                    streamed_any = True
+                    yield WebSocketMessageChunk(message_id=STREAMING_MESSAGE_ID, content=frame)
+
+            frame = coalescer.flush()
+            if frame:
+                streamed_any = True
+                yield WebSocketMessageChunk(message_id=STREAMING_MESSAGE_ID, content=frame)
+            if streamed_any:
+                yield WebSocketStreamEnd(message_id=STREAMING_MESSAGE_ID)
 
             print(f"📄 Full LLM response: {full_response_text}")
         except Exception as e:
@@ -376,8 +713,8 @@ class ConversationService:
             )
             return
             
-        # 5. Parse the complete JSON response
-        llm_json = self._extract_json_from_response(full_response_text)
+        # 5. Use the incrementally parsed object; fall back to parsing/repairing the raw text
+        llm_json = self._parse_llm_response(full_response_text, parser)
 
         if not llm_json:
             print(f"ERROR: Could not parse JSON from LLM response: {full_response_text}")
@@ -398,25 +735,25 @@ class ConversationService:
         options = llm_json.get("options")
         new_symptoms_from_model = llm_json.get("new_symptoms", [])
 
+        if mentioned:
+            record_mentions(mentioned, new_symptoms_from_model)
+
         # Check for new symptoms returned by the model and update the symptom list
         if new_symptoms_from_model:
             # Add new symptoms to the chat's symptom list
             chat.symptom_list = list(set((chat.symptom_list or []) + new_symptoms_from_model))
-            self.db.commit()
             print(f"New symptoms detected by model: {new_symptoms_from_model}. Updated symptom list: {chat.symptom_list}")
 
         # If the user is responding with their feeling, save it to the chat
         if message.message_type == 'feeling_response':
             chat.overall_feeling = message.content
-            self.db.commit()
 
         # Normalize message type for database storage (convert hyphenated to underscore)
         db_message_type = response_type.replace('-', '_')
         if response_type.lower() in ["summary", "end"]:
             db_message_type = 'text'
 
-        # 7. Save and yield the assistant's message
-        # If this is the summary, format the content for the user
+        # 7. If this is the summary, format the content for the user
         if response_type == "summary":
             summary_data = llm_json.get("summary_data", {})
             bulleted_summary = summary_data.get("bulleted_summary", "No summary available.")
@@ -444,29 +781,13 @@ class ConversationService:
             
             content = f"<b>Thank you for completing this chat!</b><br><br>Here is your conversation summary:<br><br>{bullet_text}"
 
-        assistant_msg = MessageModel(
-            chat_uuid=chat_uuid,
-            sender="assistant",
-            message_type=db_message_type,
-            content=content,
-            structured_data={"options": options} if options else None
-        )
-        self.db.add(assistant_msg)
-        self.db.commit()
-        self.db.refresh(assistant_msg)
-        
-        # Create the frontend message with the original response type
-        frontend_message = Message.from_orm(assistant_msg)
-        frontend_message.message_type = response_type if response_type != 'summary' else 'text'
-        
-        yield frontend_message
-
         # 8. If the conversation is done, update the chat with the summary and mark as completed
         if response_type in ["summary", "end"]:
             summary_data = llm_json.get("summary_data", {})
             
             chat.symptom_list = summary_data.get("symptom_list", chat.symptom_list)
-            chat.severity_list = summary_data.get("severity_list", chat.severity_list)
+            # Local CTCAE grades and alert overrides are a floor under the model's grades
+            chat.severity_list = raise_grades(summary_data.get("severity_list") or {}, chat.severity_list or {})
             chat.longer_summary = summary_data.get("longer_summary", chat.longer_summary)
             chat.medication_list = summary_data.get("medication_list", chat.medication_list)
             chat.bulleted_summary = summary_data.get("bulleted_summary", chat.bulleted_summary)
@@ -477,7 +798,22 @@ class ConversationService:
             elif response_type == "end":
                 chat.conversation_state = ConversationState.EMERGENCY
 
-            self.db.commit()
+        # The assistant's message and every chat update from this turn (new symptoms,
+        # feeling, summary, provider state) are written in one transaction
+        assistant_msg = MessageModel(
+            chat_uuid=chat_uuid,
+            sender="assistant",
+            message_type=db_message_type,
+            content=content,
+            structured_data={"options": options} if options else None
+        )
+        await run_db(state.save, assistant_msg)
+        
+        # Create the frontend message with the original response type
+        frontend_message = Message.from_orm(assistant_msg)
+        frontend_message.message_type = response_type if response_type != 'summary' else 'text'
+        
+        yield frontend_message
 
     def get_connection_ack(self, chat_uuid: UUID) -> ConnectionEstablished:
         """Returns a connection acknowledgment message."""
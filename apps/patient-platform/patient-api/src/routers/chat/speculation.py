@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from .llm.context import symptom_set_hash
+from .llm.metrics import metrics
+
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "true").lower() == "true"
+# Wait this long after the latest selection update before generating, so a patient
+# still ticking boxes does not start (and cancel) a model call per click
+SPECULATION_DEBOUNCE_S = float(os.getenv("SPECULATION_DEBOUNCE_S", "0.4"))
+# Speculative replies not claimed within this time are discarded
+SPECULATION_TTL_S = float(os.getenv("SPECULATION_TTL_S", "120"))
+
+
+class SpeculativeReply:
+    """
+    A model reply generated in a background task. Chunks are buffered as they arrive,
+    so the turn that claims the reply can stream it whether it has finished or not.
+    """
+
+    def __init__(self, symptoms: List[str]):
+        self.key = symptom_set_hash(symptoms)
+        self.symptoms = symptoms
+        self.created_at = time.monotonic()
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    async def run(self, source: AsyncGenerator[str, None], delay: float = 0.0):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._changed.set()
+        except asyncio.CancelledError:
+            await source.aclose()
+            raise
+        except Exception as e:
+            print(f"[SPECULATION] Speculative generation failed: {e}")
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+
+    @property
+    def failed(self) -> bool:
+        return self.done and self.error is not None
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def stream(self) -> AsyncGenerator[str, None]:
+        """Yields the buffered chunks, then the rest as they are generated."""
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+            self._changed.clear()
+            if sent == len(self.chunks) and not self.done:
+                await self._changed.wait()
+
+
+class SpeculationStore:
+    """
+    At most one speculative first follow-up per chat, keyed by the selected symptom
+    set. Starting one for a different set cancels the previous one; the submitted
+    selection claims it only if the set matches.
+    """
+
+    def __init__(self, ttl: float = SPECULATION_TTL_S):
+        self.ttl = ttl
+        self._replies: Dict[Any, SpeculativeReply] = {}
+
+    def start(self, chat_uuid: Any, symptoms: List[str], source_factory, delay: float = SPECULATION_DEBOUNCE_S) -> bool:
+        """
+        Starts generating for `symptoms` unless the same set is already in flight.
+        `source_factory()` returns the async generator of reply chunks.
+
+        Returns:
+            True if a new generation was started.
+        """
+        key = symptom_set_hash(symptoms)
+        current = self._replies.get(chat_uuid)
+        if current and current.key == key and not current.failed and not self._expired(current):
+            return False
+        self.discard(chat_uuid, outcome="superseded")
+        reply = SpeculativeReply(symptoms)
+        reply.task = asyncio.create_task(reply.run(source_factory(), delay))
+        self._replies[chat_uuid] = reply
+        metrics.incr("chat_speculation_total", outcome="started")
+        print(f"[SPECULATION] Started first follow-up for chat {chat_uuid} symptoms={symptoms}")
+        return True
+
+    def take(self, chat_uuid: Any, symptoms: List[str]) -> Optional[SpeculativeReply]:
+        """Claims the speculative reply for `symptoms`, or None (and cancels any other)."""
+        reply = self._replies.pop(chat_uuid, None)
+        if reply is None:
+            return None
+        if reply.key != symptom_set_hash(symptoms) or reply.failed or self._expired(reply):
+            reply.cancel()
+            metrics.incr("chat_speculation_total", outcome="miss")
+            return None
+        metrics.incr("chat_speculation_total", outcome="hit" if reply.done else "hit_in_flight")
+        print(f"[SPECULATION] Using speculative first follow-up for chat {chat_uuid} (done={reply.done})")
+        return reply
+
+    def discard(self, chat_uuid: Any, outcome: str = "cancelled"):
+        reply = self._replies.pop(chat_uuid, None)
+        if reply is not None:
+            reply.cancel()
+            metrics.incr("chat_speculation_total", outcome=outcome)
+
+    def _expired(self, reply: SpeculativeReply) -> bool:
+        return time.monotonic() - reply.created_at > self.ttl
+
+
+class SelectionPrefetcher:
+    """
+    Warms retrieval and the prompt sections for a chat's latest symptom selection
+    once it has been stable for `delay`, like the speculative generation, so a patient
+    still ticking boxes does not start retrieval for every intermediate set.
+    """
+
+    def __init__(self, delay: float = SPECULATION_DEBOUNCE_S):
+        self.delay = delay
+        self._pending: Dict[Any, asyncio.Task] = {}
+
+    def schedule(self, chat_uuid: Any, warm: Callable[[], None]):
+        """Runs `warm()` after the delay unless a newer selection for the chat replaces it first."""
+        self.cancel(chat_uuid)
+        self._pending[chat_uuid] = asyncio.create_task(self._run(chat_uuid, warm))
+
+    def cancel(self, chat_uuid: Any):
+        task = self._pending.pop(chat_uuid, None)
+        if task is not None and not task.done():
+            task.cancel()
+            metrics.incr("chat_selection_prefetch_total", outcome="superseded")
+
+    async def _run(self, chat_uuid: Any, warm: Callable[[], None]):
+        try:
+            await asyncio.sleep(self.delay)
+            warm()
+            metrics.incr("chat_selection_prefetch_total", outcome="started")
+        except Exception as e:
+            print(f"[SPECULATION] Selection prefetch failed: {e}")
+        finally:
+            if self._pending.get(chat_uuid) is asyncio.current_task():
+                del self._pending[chat_uuid]
+
+
+speculative_followups = SpeculationStore()
+selection_prefetch = SelectionPrefetcher()
@@ -0,0 +1,54 @@
+import pytest
+
+from routers.chat.alerts import (
+    AlertRuleError, GLOBAL_SCOPE, check_rule_sources, evaluate_alerts,
+    get_alert_rules, merge_answers, parse_alert_rules
+)
+from routers.chat.questions import question_catalog
+
+
+def _ids(answers):
+    return {rule.id for rule in evaluate_alerts(answers)}
+
+
+def test_rules_only_read_attributes_the_questions_record():
+    # Raises on any rule variable or option literal that nothing produces
+    check_rule_sources(get_alert_rules(), question_catalog())
+
+
+def test_check_rejects_an_attribute_no_question_records():
+    rules = parse_alert_rules('id: ALERT_X\nsymptom: vomiting\nwhen: vomiting_rating == "severe"\noverride_to_grade: 3\n')
+    with pytest.raises(AlertRuleError, match="vomiting_rating"):
+        check_rule_sources(rules, question_catalog())
+
+
+def test_check_rejects_a_literal_that_is_not_an_option():
+    rules = parse_alert_rules('id: ALERT_X\nsymptom: diarrhea\nwhen: stool_contains == "mucus"\noverride_to_grade: 3\n')
+    with pytest.raises(AlertRuleError, match="mucus"):
+        check_rule_sources(rules, question_catalog())
+
+
+@pytest.mark.parametrize("symptom, attributes, rule_id", [
+    ("vomiting", {"vomit_rating": "severe"}, "ALERT_VOMITING_SEVERE"),
+    ("vomiting", {"vomit_count_24h": 6.0}, "ALERT_VOMITING_EPISODES"),
+    ("diarrhea", {"diarrhea_rating": "moderate", "days_in_a_row": 3.0}, "ALERT_DIARRHEA_MOD3"),
+    ("diarrhea", {"stool_contains": ["contains_mucus"]}, "ALERT_DIARRHEA_BLOOD"),
+    ("fatigue", {"fatigue_rating": "severe"}, "ALERT_FATIGUE_SEVERE"),
+    ("mouth_sores", {"mouth_sores_rating": "severe"}, "ALERT_MOUTH_PAIN"),
+    ("constipation", {"days_since_bowel": 3.0}, "ALERT_CONSTIPATION_NONE"),
+    ("urinary_problems", {"urine_output_pct": True}, "ALERT_URINARY_OUTPUT_CHANGE"),
+    ("pain", {"pain_severity": "severe", "pain_interferes_with_adl": True}, "ALERT_PAIN_ADL"),
+    ("eye_complaints", {"eye_symptoms": ["double_vision"]}, "ALERT_EYE_SEVERE"),
+])
+def test_question_attributes_trigger_their_rules(symptom, attributes, rule_id):
+    assert rule_id in _ids({symptom: attributes})
+
+
+def test_shared_red_flags_reach_rules_of_other_symptoms():
+    answers = merge_answers({}, "fever", {"trouble_breathing": True})
+    assert answers[GLOBAL_SCOPE] == {"trouble_breathing": True}
+    assert "ALERT_TROUBLE_BREATHING" in _ids(answers)
+
+
+def test_unanswered_attributes_trigger_nothing():
+    assert _ids({"vomiting": {"vomit_rating": "mild"}}) == set()
@@ -0,0 +1,43 @@
+import asyncio
+
+from routers.chat.llm.cache import CachedProvider, ResponseCache, cacheable
+
+
+class _Provider:
+    model = "llama"
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def stream(self, system_prompt, user_prompt, response_format=None):
+        self.calls += 1
+        yield self.reply
+
+
+def _reply(provider):
+    async def run():
+        return "".join([chunk async for chunk in provider.stream("system", "user")])
+    return asyncio.run(run())
+
+
+def test_default_provider_is_not_cached():
+    assert cacheable("groq", "first_followup")
+    assert not cacheable("gpt4o", "first_followup")
+    assert not cacheable("groq", None)
+
+
+def test_complete_replies_are_stored_and_served():
+    inner = _Provider('{"content": "Hi"}')
+    provider = CachedProvider("groq", inner, ResponseCache())
+    assert _reply(provider) == _reply(provider) == '{"content": "Hi"}'
+    assert inner.calls == 1
+
+
+def test_truncated_replies_are_not_stored():
+    inner = _Provider('{"content": "H')
+    provider = CachedProvider("groq", inner, ResponseCache())
+    _reply(provider)
+    _reply(provider)
+    assert inner.calls == 2
+
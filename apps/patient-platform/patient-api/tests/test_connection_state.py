@@ -0,0 +1,129 @@
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.exc import StaleDataError
+
+from routers.chat import connection_state
+from routers.chat.connection_state import ChatConnectionState
+from routers.chat.llm.metrics import metrics
+from db.patient_models import Conversations as ChatModel, Messages as MessageModel
+
+CHAT_UUID = uuid.uuid4()
+
+
+def _chat(**values):
+    """A chat as loaded from the database: detached, with no pending changes."""
+    chat = ChatModel(uuid=CHAT_UUID, patient_uuid=uuid.uuid4(), conversation_state="followup_questions",
+                     updated_at=datetime(2026, 1, 1, tzinfo=timezone.utc), history_summary=None, **values)
+    make_transient_to_detached(chat)
+    return chat
+
+
+class _Query:
+    def __init__(self, result):
+        self.result = result
+
+    def __getattr__(self, name):
+        # populate_existing / filter / order_by
+        return lambda *args, **kwargs: self
+
+    def first(self):
+        return self.result
+
+    def all(self):
+        return []
+
+
+class _Session:
+    """
+    Stands in for a chat-pool session. The first `conflicts` commits fail as if
+    another writer had bumped the chat's version; `remote` is the row a re-read returns.
+    """
+
+    def __init__(self, remote, conflicts=1):
+        self.remote = remote
+        self.conflicts = conflicts
+        self.commits = []
+        self.rollbacks = 0
+        self._added = []
+
+    def add(self, obj):
+        self._added.append(obj)
+
+    def add_all(self, rows):
+        self._added.extend(rows)
+
+    def query(self, model):
+        return _Query(self.remote if model is ChatModel else None)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self._added = []
+
+    def commit(self):
+        if self.conflicts:
+            self.conflicts -= 1
+            raise StaleDataError("UPDATE statement on table 'conversations' expected to update 1 row(s); 0 were matched.")
+        for i, obj in enumerate(self._added):
+            if isinstance(obj, MessageModel):
+                # Id and timestamp as INSERT ... RETURNING fills them
+                obj.id, obj.created_at = i + 1, datetime.now(timezone.utc)
+        self.commits.append(list(self._added))
+        self._added = []
+
+
+@pytest.fixture
+def session(monkeypatch):
+    holder = {}
+
+    @contextmanager
+    def chat_session():
+        yield holder["session"]
+
+    monkeypatch.setattr(connection_state, "chat_session", chat_session)
+    return holder
+
+
+def _message(content):
+    return MessageModel(chat_uuid=CHAT_UUID, sender="user", message_type="text", content=content)
+
+
+def test_save_resyncs_and_reapplies_the_turns_changes_on_a_version_conflict(session):
+    state = ChatConnectionState(_chat())
+    state.chat.symptom_answers = {"nausea": {"nausea_rating": "mild"}}
+    # Another writer set the feeling in the meantime
+    remote = _chat(overall_feeling="good")
+    session["session"] = _Session(remote, conflicts=1)
+    conflicts_before = metrics.snapshot()["counters"].get("chat_state_conflicts_total", 0)
+
+    state.save(_message("mild"))
+
+    db = session["session"]
+    assert db.rollbacks == 1 and len(db.commits) == 1
+    assert state.chat is remote
+    assert state.chat.symptom_answers == {"nausea": {"nausea_rating": "mild"}}
+    assert state.chat.overall_feeling == "good"
+    assert [m.content for m in state.messages] == ["mild"]
+    assert metrics.snapshot()["counters"]["chat_state_conflicts_total"] == conflicts_before + 1
+
+
+def test_save_without_a_conflict_commits_once(session):
+    state = ChatConnectionState(_chat())
+    state.chat.conversation_state = "completed"
+    session["session"] = _Session(remote=None, conflicts=0)
+
+    state.save(_message("done"))
+
+    assert len(session["session"].commits) == 1
+    assert state.chat.conversation_state == "completed"
+    assert [m.content for m in state.messages] == ["done"]
+
+
+def test_save_reports_a_chat_deleted_by_another_writer(session):
+    state = ChatConnectionState(_chat())
+    session["session"] = _Session(remote=None, conflicts=1)
+    with pytest.raises(ValueError):
+        state.save(_message("hello"))
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from routers.chat.llm.context import ContextLoader, _omitted_tables
+
+
+def test_all_ctcae_tables_are_kept_by_default(monkeypatch):
+    monkeypatch.delenv("CTCAE_PROMPT_TABLES", raising=False)
+    assert _omitted_tables(["Nausea", "Cough"], ["nausea"]) == []
+
+
+def test_ungraded_mode_omits_only_symptoms_graded_this_turn(monkeypatch):
+    monkeypatch.setenv("CTCAE_PROMPT_TABLES", "ungraded")
+    # Cough has a CTCAE term but no local grade yet, so its table stays
+    assert _omitted_tables(["Nausea", "Cough", "Mouth Sores"], ["nausea"]) == ["Nausea"]
+    assert _omitted_tables(["Nausea", "Cough"], []) == []
+
+
+def test_prompt_is_rebuilt_when_the_omitted_tables_change(monkeypatch):
+    monkeypatch.setenv("CTCAE_PROMPT_TABLES", "ungraded")
+    digest = ContextLoader._prompt_digest
+    assert digest(["Nausea"], []) != digest(["Nausea"], ["nausea"])
+    assert digest(["Nausea"], ["fever"]) == digest(["Nausea"], [])
+
+
+def _loader(tmp_path):
+    (tmp_path / "oncolifebot_instructions.txt").write_text("Bot instructions")
+    return ContextLoader(str(tmp_path))
+
+
+def test_failed_retrieval_is_not_memoized(monkeypatch, tmp_path):
+    from routers.chat.llm import retrieval
+
+    calls = []
+
+    def failing(symptoms, **kwargs):
+        calls.append(symptoms)
+        raise ConnectionError("pinecone unavailable")
+
+    monkeypatch.setattr(retrieval, "cached_retrieve", failing)
+    loader = _loader(tmp_path)
+    assert loader._rag_section(["Nausea"]) == ("", False)
+    assert loader._rag_section(["Nausea"]) == ("", False)
+    assert len(calls) == 2
+
+    # Once retrieval recovers, the section is built and memoized
+    monkeypatch.setattr(retrieval, "cached_retrieve",
+                        lambda symptoms, **kwargs: {"ctcae": [{"text": "Nausea grade 1"}], "questions": []})
+    section, complete = loader._rag_section(["Nausea"])
+    assert complete and "Nausea grade 1" in section
+    monkeypatch.setattr(retrieval, "cached_retrieve", failing)
+    assert loader._rag_section(["Nausea"]) == (section, True)
+
+
+def test_prompt_built_on_a_failed_retrieval_is_rebuilt_next_turn(monkeypatch, tmp_path):
+    from routers.chat.llm import retrieval
+
+    monkeypatch.setenv("BASE_DOCS_MODE", "retrieval")
+    monkeypatch.setattr(retrieval, "cached_retrieve_base_documents",
+                        lambda symptoms, **kwargs: [{"source": "ukons", "text": "Call 999"}])
+    monkeypatch.setattr(retrieval, "cached_retrieve", lambda symptoms, **kwargs: (_ for _ in ()).throw(TimeoutError()))
+    loader = _loader(tmp_path)
+    assert "RAG Results" not in loader.load_context_for_conversation("chat-1", ["Nausea"])
+    assert loader.peek_context("chat-1", ["Nausea"]) is None
+
+    monkeypatch.setattr(retrieval, "cached_retrieve",
+                        lambda symptoms, **kwargs: {"ctcae": [], "questions": [{"text": "How many times?"}]})
+    prompt = loader.load_context_for_conversation("chat-1", ["Nausea"])
+    assert "How many times?" in prompt and "Call 999" in prompt
+    assert loader.peek_context("chat-1", ["Nausea"]) == prompt
+
+
+def test_memoized_sections_expire(monkeypatch):
+    from routers.chat.llm import context
+
+    now = [1000.0]
+    monkeypatch.setattr(context, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    lru = context._LRU(4, ttl=60)
+    lru.put("k", "v")
+    now[0] += 59
+    assert lru.get("k") == "v"
+    now[0] += 1
+    assert lru.get("k") is None
@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from routers.chat.constants import ConversationState
+from routers.chat.models import WebSocketMessageIn
+from routers.chat.services import ConversationService
+
+
+def _message(content, message_type="button_response"):
+    return WebSocketMessageIn(type="user_message", message_type=message_type, content=content)
+
+
+def test_state_machine_runs_without_a_request_session():
+    # The WebSocket path builds the service without a session
+    chat = SimpleNamespace(conversation_state=ConversationState.CHEMO_CHECK_SENT)
+    next_state, reply = ConversationService()._determine_next_state_and_response(chat, _message("Yes"))
+    assert next_state == ConversationState.SYMPTOM_SELECTION_SENT
+    assert reply.message_type == "multi_select" and reply.options
+
+
+@pytest.mark.parametrize("state", [ConversationState.SYMPTOM_SELECTION_SENT, ConversationState.FOLLOWUP_QUESTIONS])
+def test_later_states_are_not_handled_by_the_state_machine(state):
+    chat = SimpleNamespace(conversation_state=state, symptom_list=[])
+    next_state, _ = ConversationService()._determine_next_state_and_response(chat, _message("Nausea", "multi_select_response"))
+    assert next_state == state
+    assert chat.symptom_list == []
+
+
+def test_selection_prefetch_waits_for_the_selection_to_settle(monkeypatch):
+    from routers.chat import services
+    from routers.chat.speculation import SelectionPrefetcher
+
+    warmed = []
+    monkeypatch.setattr(services, "SPECULATION_ENABLED", False)
+    monkeypatch.setattr(services, "selection_prefetch", SelectionPrefetcher(delay=0.05))
+    monkeypatch.setattr(services, "prefetch_symptoms", lambda symptoms: warmed.append(("retrieval", symptoms)))
+    monkeypatch.setattr(services, "get_context_loader", lambda path: SimpleNamespace(
+        prefetch_sections=lambda symptoms: warmed.append(("sections", symptoms))))
+    state = SimpleNamespace(chat=SimpleNamespace(conversation_state=ConversationState.SYMPTOM_SELECTION_SENT, symptom_list=[]))
+
+    async def clicks():
+        service = ConversationService()
+        for selection in ("Nausea", "Nausea, Fatigue", "Nausea, Fatigue, Cough"):
+            await service.start_speculative_followup("chat-1", selection, state)
+            await asyncio.sleep(0.01)
+        assert warmed == []
+        await asyncio.sleep(0.1)
+
+    asyncio.run(clicks())
+    assert warmed == [("retrieval", ["Nausea", "Fatigue", "Cough"]), ("sections", ["Cough", "Fatigue", "Nausea"])]
@@ -0,0 +1,155 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from routers.chat.llm import failover
+from routers.chat.llm.failover import CircuitBreaker, HedgedProvider, breaker_for
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    # Only the breakers' clock; the event loop keeps the real one
+    monkeypatch.setattr(failover, "time", SimpleNamespace(monotonic=clock.monotonic, perf_counter=time.perf_counter))
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(failover, "_breakers", {})
+    monkeypatch.setattr(failover, "HEDGE_DEFAULT_DELAY_S", 0.05)
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("p", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available() and not breaker.allow()
+
+
+def test_breaker_lets_one_trial_through_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.now += 30
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.available() and not breaker.allow()
+
+
+def test_half_open_trial_outcome_closes_or_reopens(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_released_trial_can_be_taken_again(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.now += 30
+    breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN and breaker.allow()
+
+
+class _Provider:
+    def __init__(self, chunks, delay=0.0, error=None):
+        self.chunks, self.delay, self.error = chunks, delay, error
+        self.calls = 0
+
+    async def stream(self, system_prompt, user_prompt, response_format=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _collect(provider, limit=None):
+    async def run():
+        chunks = []
+        agen = provider.stream("system", "user")
+        async for chunk in agen:
+            chunks.append(chunk)
+            if limit and len(chunks) >= limit:
+                break
+        await agen.aclose()
+        return chunks
+    return asyncio.run(run())
+
+
+def test_only_started_providers_take_their_half_open_trial(clock):
+    for name in ("a", "b"):
+        breaker = breaker_for(name)
+        _open(breaker)
+    clock.now += failover.BREAKER_RESET_S
+    a, b = _Provider(["ok"]), _Provider(["unused"])
+    assert _collect(HedgedProvider([("a", a), ("b", b)], hedge=False)) == ["ok"]
+    assert b.calls == 0
+    assert breaker_for("a").state == CircuitBreaker.CLOSED
+    # b's trial was not used up by the call that never started it
+    assert breaker_for("b").allow()
+
+
+def test_failover_records_the_failure_and_the_success():
+    a, b = _Provider([], error=RuntimeError("down")), _Provider(["from b"])
+    assert _collect(HedgedProvider([("a", a), ("b", b)], hedge=False)) == ["from b"]
+    assert breaker_for("a").failures == 1
+    assert breaker_for("b").failures == 0
+
+
+def test_empty_response_fails_over():
+    a, b = _Provider([]), _Provider(["from b"])
+    assert _collect(HedgedProvider([("a", a), ("b", b)], hedge=False)) == ["from b"]
+    assert breaker_for("a").failures == 1
+
+
+def test_empty_response_from_every_provider_raises():
+    with pytest.raises(RuntimeError, match="empty response"):
+        _collect(HedgedProvider([("a", _Provider([]))], hedge=False))
+    assert breaker_for("a").failures == 1
+
+
+def test_cancelled_hedge_loser_is_not_a_failure(clock):
+    _open(breaker_for("slow"))
+    clock.now += failover.BREAKER_RESET_S
+    slow, fast = _Provider(["slow"], delay=1.0), _Provider(["fast"])
+    assert _collect(HedgedProvider([("slow", slow), ("fast", fast)], hedge=True)) == ["fast"]
+    slow_breaker = breaker_for("slow")
+    assert slow_breaker.state == CircuitBreaker.HALF_OPEN and slow_breaker.failures == failover.BREAKER_FAILURE_THRESHOLD
+    # The loser's trial is free for the next call
+    assert slow_breaker.allow()
+
+
+def test_consumer_closing_mid_stream_records_the_outcome(clock):
+    _open(breaker_for("a"))
+    clock.now += failover.BREAKER_RESET_S
+    a = _Provider(["one", "two", "three"])
+    assert _collect(HedgedProvider([("a", a)], hedge=False), limit=1) == ["one"]
+    assert breaker_for("a").state == CircuitBreaker.CLOSED
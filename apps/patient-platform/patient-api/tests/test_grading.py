@@ -0,0 +1,23 @@
+from routers.chat.grading import grade_answers, grade_symptom
+
+
+def test_numeric_answer_is_graded_from_the_ctcae_ranges():
+    graded = grade_symptom("diarrhea", {"loose_stools_per_day": 5})
+    assert (graded.term, graded.grade, graded.basis) == ("Diarrhea", 2, ["loose_stools_per_day=5"])
+
+
+def test_weight_loss_is_reported_with_the_weight_loss_term():
+    graded = grade_symptom("no_appetite", {"weight_loss_pct": 12})
+    assert graded.term == "Weight loss"
+    assert graded.grade == 2
+    assert graded.definition.startswith("10 - <20% from baseline")
+    assert graded.basis == ["weight_loss_pct=12"]
+
+
+def test_the_symptoms_own_term_is_kept_when_it_reaches_the_same_grade():
+    graded = grade_symptom("no_appetite", {"weight_loss_pct": 12, "oral_intake_pct": 50})
+    assert (graded.term, graded.grade, graded.basis) == ("Anorexia", 2, ["oral_intake_pct=50"])
+
+
+def test_symptoms_without_gradable_answers_are_not_graded():
+    assert grade_answers({"cough": {"cough_prevents_adl": True}, "_": {"temp_f": 99.0}}) == {}
@@ -0,0 +1,60 @@
+import importlib.util
+import json
+import math
+import os
+
+import pytest
+
+API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    """A fresh copy of scripts/ingest_pinecone.py, run from the patient-api directory."""
+    spec = importlib.util.spec_from_file_location("ingest_pinecone", os.path.join(API_ROOT, "scripts", "ingest_pinecone.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.chdir(API_ROOT)
+    for key in ("OPENAI_API_KEY", "PINECONE_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    return module
+
+
+def test_dry_run_over_model_inputs(ingest):
+    ingest.main(["--dry-run", "--batch-size", "40"])
+    stats = ingest.stats
+
+    with open("model_inputs/CTCAE.json") as f:
+        ctcae = json.load(f)
+    with open("model_inputs/questions.json") as f:
+        questions = json.load(f)
+    expected_ctcae = sum(1 for symptoms in ctcae.values() for grades in symptoms.values() for d in grades.values() if d)
+    assert stats.chunks["ctcae"] == expected_ctcae
+    assert stats.chunks["question"] == len(questions)
+    assert set(stats.chunks) == {"ctcae", "question", "alert", "written_doc", "ukons"}
+
+    for doc_type, chunks in stats.chunks.items():
+        assert chunks > 0
+        assert stats.tokens[doc_type] >= chunks
+        sizes = stats.batch_sizes[doc_type]
+        assert sum(sizes) == chunks
+        assert len(sizes) == math.ceil(chunks / 40) and max(sizes) <= 40
+        for stage in (f"embed:{doc_type}", f"upsert:{doc_type}"):
+            assert stats.stages[stage]["calls"] == len(sizes)
+            assert stats.stages[stage]["items"] == chunks
+            assert len(stats.stages[stage]["latencies"]) == len(sizes)
+    assert stats.stages["chunk:ctcae"]["items"] == expected_ctcae
+    assert stats.stages["total"]["calls"] == 1
+
+    # Chunks with identical ids overwrite each other, as they would in Pinecone
+    assert 0 < ingest.index.count() <= sum(stats.chunks.values())
+    assert ingest.client is None
+
+
+def test_dry_run_index_answers_filtered_queries(ingest):
+    ingest.main(["--dry-run", "--only", "questions"])
+    query = ingest.embedder(["nausea vomiting"])[0]
+    result = ingest.index.query(vector=query, top_k=3, filter={"symptoms": {"$in": ["nausea"]}})
+    assert result.matches
+    assert all("nausea" in m.metadata["symptoms"] for m in result.matches)
+    assert len(query) == ingest.EMBED_DIM
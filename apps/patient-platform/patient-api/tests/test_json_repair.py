@@ -0,0 +1,29 @@
+import pytest
+
+from routers.chat.llm.json_repair import FAILED, PARSED, REPAIRED, parse_model_json, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"content": "Hi", "options": []}\n```', {"content": "Hi", "options": []}),
+    ('Here is the reply: {"content": "Hi"} Let me know.', {"content": "Hi"}),
+    ('{"content": "Hi", "options": ["Yes", "No",],}', {"content": "Hi", "options": ["Yes", "No"]}),
+    ('{"content": "How are you', {"content": "How are you"}),
+    ('{"content": "Hi", "options": ["Yes", "N', {"content": "Hi", "options": ["Yes", "N"]}),
+    ('{"content": "Hi", "response_type":', {"content": "Hi"}),
+    ('{"content": "Hi", "respon', {"content": "Hi"}),
+    ('{"content": "a \\"quoted\\" word', {"content": 'a "quoted" word'}),
+])
+def test_repair_json(text, expected):
+    assert repair_json(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "no object here", '["a", "list"]'])
+def test_repair_json_gives_up(text):
+    assert repair_json(text) is None
+
+
+def test_parse_model_json_outcomes():
+    assert parse_model_json('```json\n{"content": "Hi"}\n```') == ({"content": "Hi"}, PARSED)
+    assert parse_model_json('{"content": "Hi",}') == ({"content": "Hi"}, REPAIRED)
+    assert parse_model_json('{"content": "Hi') == ({"content": "Hi"}, REPAIRED)
+    assert parse_model_json("Sorry, I can't help with that.") == ({}, FAILED)
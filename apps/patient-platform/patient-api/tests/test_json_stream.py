@@ -0,0 +1,68 @@
+from routers.chat.llm.json_stream import COMPLETE, CONTENT_DELTA, FIELD, StreamingJSONParser
+
+
+def _stream(chunks):
+    """Feeds the chunks; returns (the streamed content deltas joined, the parser)."""
+    parser = StreamingJSONParser()
+    deltas = []
+    for chunk in chunks:
+        deltas.extend(value for kind, value in parser.feed(chunk) if kind == CONTENT_DELTA)
+    return "".join(deltas), parser
+
+
+def test_surrogate_pair_split_across_chunks_streams_one_character():
+    content, parser = _stream(['{"content": "hi \\ud83d', '\\ude00 there"}'])
+    assert content == "hi \U0001F600 there"
+    content.encode("utf-8")
+    assert parser.result["content"] == "hi \U0001F600 there"
+
+
+def test_surrogate_pair_split_inside_each_escape():
+    content, _ = _stream(['{"content": "a\\ud8', '3d\\u', 'de0', '0b"}'])
+    assert content == "a\U0001F600b"
+
+
+def test_lone_surrogate_is_replaced():
+    content, _ = _stream(['{"content": "x\\ud83d y \\ude00"}'])
+    assert content == "x\ufffd y \ufffd"
+    content.encode("utf-8")
+
+
+def test_bmp_escape_and_plain_escapes():
+    content, _ = _stream(['{"content": "caf\\u00e9 \\"ok\\"\\n"}'])
+    assert content == 'café "ok"\n'
+
+
+def _events(chunks):
+    parser = StreamingJSONParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events, parser
+
+
+def test_fields_are_emitted_as_each_top_level_value_completes():
+    reply = ('```json\n{"content": "How severe is it?", "response_type": "single-select", '
+             '"options": ["Mild", "Severe"], "summary_data": {"grade": 2, "note": "a } in a string"}}\n```')
+    events, parser = _events([reply[i:i + 7] for i in range(0, len(reply), 7)])
+
+    fields = [value for kind, value in events if kind == FIELD]
+    assert [name for name, _ in fields] == ["content", "response_type", "options", "summary_data"]
+    assert dict(fields)["options"] == ["Mild", "Severe"]
+    assert dict(fields)["summary_data"] == {"grade": 2, "note": "a } in a string"}
+    assert events[-1] == (COMPLETE, parser.result)
+    assert parser.complete
+
+
+def test_content_streams_before_the_field_completes():
+    parser = StreamingJSONParser()
+    assert parser.feed('Sure! {"content": "Hel') == [(CONTENT_DELTA, "Hel")]
+    assert parser.feed('lo') == [(CONTENT_DELTA, "lo")]
+    assert parser.feed('", "response_type"') == [(FIELD, ("content", "Hello"))]
+    assert not parser.complete
+
+
+def test_primitives_and_text_after_the_object():
+    events, parser = _events(['{"done": true, "count": 3, "note": null}', ' trailing text {"x": 1}'])
+    assert parser.result == {"done": True, "count": 3, "note": None}
+    assert [kind for kind, _ in events].count(COMPLETE) == 1
@@ -0,0 +1,54 @@
+import json
+
+from routers.chat.llm.json_stream import StreamingJSONParser
+from routers.chat.services import ConversationService
+
+SUMMARY = {
+    "content": "DONE",
+    "response_type": "summary",
+    "summary_data": {
+        "symptom_list": ["Nausea"],
+        "severity_list": {"Nausea": "mild"},
+        "longer_summary": "Mild nausea for two days.",
+        "bulleted_summary": "You reported mild nausea.",
+        "medication_list": [],
+    },
+}
+
+
+def _parse(text, streamed=True):
+    parser = StreamingJSONParser()
+    if streamed:
+        parser.feed(text)
+    return ConversationService()._parse_llm_response(text, parser)
+
+
+def test_complete_summary_is_accepted():
+    assert _parse(json.dumps(SUMMARY))["summary_data"]["longer_summary"] == "Mild nausea for two days."
+
+
+def test_truncated_summary_fails_the_turn():
+    text = json.dumps(SUMMARY)
+    truncated = text[:text.index('"bulleted_summary"') + 30]
+    assert _parse(truncated) == {}
+
+
+def test_summary_without_required_fields_fails_the_turn():
+    turn = {**SUMMARY, "summary_data": {"symptom_list": ["Nausea"]}}
+    assert _parse(json.dumps(turn)) == {}
+
+
+def test_truncated_emergency_end_keeps_the_turn_without_summary_data():
+    text = json.dumps({**SUMMARY, "content": "Please call 911.", "response_type": "end"})
+    truncated = text[:text.index('"longer_summary"') + 25]
+    assert _parse(truncated) == {"content": "Please call 911.", "response_type": "end"}
+
+
+def test_truncated_conversational_turn_is_repaired():
+    assert _parse('{"content": "How many days has it been?", "response_type": "text"', streamed=False) == {
+        "content": "How many days has it been?", "response_type": "text"
+    }
+
+
+def test_turn_that_does_not_match_the_schema_is_rejected():
+    assert _parse(json.dumps({"content": "Pick one", "response_type": "single-select", "options": "Yes, No"})) == {}
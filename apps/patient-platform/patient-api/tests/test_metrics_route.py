@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from routers.auth.dependencies import TokenData, get_current_user
+
+
+def test_llm_metrics_require_authentication():
+    client = TestClient(app)
+    assert client.get("/metrics/llm").status_code == 401
+
+
+def test_llm_metrics_for_an_authenticated_user():
+    app.dependency_overrides[get_current_user] = lambda: TokenData(sub="user-1")
+    try:
+        response = TestClient(app).get("/metrics/llm")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from routers.chat.llm.cerebras import AsyncCerebrasProvider
+from routers.chat.llm.groq import AsyncGroqProvider
+
+
+class _Completions:
+    """Records the request and streams one chunk back, like the SDKs' chat.completions."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, **request):
+        self.requests.append(request)
+
+        async def chunks():
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content='{"content": "Hi"}'))])
+        return chunks()
+
+
+@pytest.mark.parametrize("provider_class, key", [(AsyncCerebrasProvider, "CEREBRAS_API_KEY"),
+                                                 (AsyncGroqProvider, "GROQ_API_KEY")])
+def test_system_prompt_is_sent(monkeypatch, provider_class, key):
+    monkeypatch.setenv(key, "test-key")
+    provider = provider_class()
+    completions = _Completions()
+    provider.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    async def run():
+        return "".join([c async for c in provider.stream("Instructions and CTCAE context", "Patient: I feel sick",
+                                                         {"type": "json_object"})])
+
+    assert asyncio.run(run()) == '{"content": "Hi"}'
+    request = completions.requests[0]
+    assert request["messages"] == [{"role": "system", "content": "Instructions and CTCAE context"},
+                                   {"role": "user", "content": "Patient: I feel sick"}]
+    assert request["response_format"] == {"type": "json_object"}
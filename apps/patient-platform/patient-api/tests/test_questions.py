@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import pytest
+
+from routers.chat.alerts import GLOBAL_SCOPE, evaluate_alerts, merge_answers
+from routers.chat.questions import QuestionSequencer
+from routers.chat.services import ConversationService
+
+
+def _answer(question_id, text):
+    """Answers a pending short-phase question as process_message_stream does."""
+    sequencer = QuestionSequencer()
+    question, understood, value = sequencer.record_answer({"pending": question_id}, text)
+    assert understood
+    return question.symptom, question.data_attribute, value
+
+
+def _chat(symptom_answers=None):
+    return SimpleNamespace(uuid="chat-1", symptom_answers=symptom_answers or {},
+                           severity_list={}, triggered_alerts=[])
+
+
+@pytest.mark.parametrize("question_id", ["pain_short_fever", "mouth_short_fever"])
+def test_yes_to_a_fever_question_triggers_the_fever_alert(question_id):
+    chat = _chat()
+    answered = _answer(question_id, "Yes")
+    ConversationService()._apply_alert_rules(chat, SimpleNamespace(content="Yes", structured_data=None), answered)
+
+    # Recorded as a flag, not as a temperature of True
+    assert chat.symptom_answers[GLOBAL_SCOPE] == {"fever_reported": True}
+    assert "temp_f" not in chat.symptom_answers[answered[0]]
+    triggered = {a["id"] for a in chat.triggered_alerts}
+    assert "ALERT_FEVER" in triggered
+    if answered[0] == "pain":
+        assert "ALERT_PAIN_FEVER" in triggered
+
+
+def test_no_to_a_fever_question_triggers_nothing():
+    chat = _chat()
+    answered = _answer("pain_short_fever", "No")
+    ConversationService()._apply_alert_rules(chat, SimpleNamespace(content="No", structured_data=None), answered)
+    assert chat.triggered_alerts == []
+
+
+def test_a_measured_temperature_is_still_recorded_as_temp_f():
+    chat = _chat()
+    answered = _answer("fever_short_temp", "It was 101.3")
+    ConversationService()._apply_alert_rules(chat, SimpleNamespace(content="It was 101.3", structured_data=None), answered)
+    assert chat.symptom_answers["fever"]["temp_f"] == 101.3
+    assert {a["id"] for a in chat.triggered_alerts} == {"ALERT_FEVER"}
+
+
+def test_yes_to_the_weight_loss_question_triggers_the_weight_loss_alert():
+    symptom, attribute, value = _answer("appetite_short_weight_loss", "Yes")
+    answers = merge_answers({}, symptom, {attribute: value})
+    assert answers["no_appetite"] == {"weight_loss_reported": True}
+    assert "ALERT_WEIGHT_LOSS" in {rule.id for rule in evaluate_alerts(answers)}
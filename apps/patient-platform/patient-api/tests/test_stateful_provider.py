@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from routers.chat.llm import gateway
+from routers.chat.llm.base import ProviderSession
+from routers.chat.llm.gateway import GatewayStatefulProvider
+from routers.chat.llm.registry import ProviderRegistry
+from routers.chat.llm.responses import LocalStatefulProvider
+
+
+class _Echo:
+    """A stateless provider that records each call and replies in two chunks."""
+    model = "echo"
+
+    def __init__(self):
+        self.calls = []
+
+    async def stream(self, system_prompt, user_prompt, response_format=None):
+        self.calls.append((system_prompt, user_prompt))
+        yield '{"content": '
+        yield f'"reply {len(self.calls)}"}}'
+
+
+def _turn(provider, session, items):
+    async def run():
+        return "".join([chunk async for chunk in provider.stream_turn(session, items)])
+    return asyncio.run(run())
+
+
+def test_continuation_replays_the_stored_conversation():
+    inner = _Echo()
+    provider = LocalStatefulProvider(inner)
+
+    first = ProviderSession()
+    reply = _turn(provider, first, [{"role": "developer", "content": "You are a triage nurse."},
+                                    {"role": "user", "content": "I feel sick"}])
+    assert reply == '{"content": "reply 1"}'
+    assert first.response_id.startswith("local_")
+
+    second = ProviderSession(first.response_id)
+    _turn(provider, second, [{"role": "user", "content": "Since yesterday"}])
+    system_prompt, user_prompt = inner.calls[-1]
+    assert system_prompt == "You are a triage nurse."
+    assert user_prompt == ('[user]\nI feel sick\n\n[assistant]\n{"content": "reply 1"}\n\n'
+                           '[user]\nSince yesterday')
+    assert second.response_id not in (None, first.response_id)
+
+
+def test_unknown_previous_response_id_raises():
+    provider = LocalStatefulProvider(_Echo())
+    with pytest.raises(KeyError):
+        _turn(provider, ProviderSession("resp_missing"), [{"role": "user", "content": "hi"}])
+
+
+def test_oldest_conversations_are_evicted():
+    provider = LocalStatefulProvider(_Echo(), max_sessions=1)
+    first = ProviderSession()
+    _turn(provider, first, [{"role": "user", "content": "one"}])
+    _turn(provider, ProviderSession(), [{"role": "user", "content": "two"}])
+    with pytest.raises(KeyError):
+        _turn(provider, ProviderSession(first.response_id), [{"role": "user", "content": "three"}])
+
+
+class _FlakyStateful:
+    """Fails the first call with a 503 before any token, then streams."""
+    model = "gpt-4o"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def stream_turn(self, session, input_items, response_format=None):
+        self.calls += 1
+        if self.calls == 1:
+            error = RuntimeError("service unavailable")
+            error.status_code = 503
+            raise error
+        session.response_id = "resp_2"
+        yield "ok"
+
+
+def test_responses_mode_goes_through_the_gateway(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(gateway, "RETRY_BASE_S", 0.0)
+    registry = ProviderRegistry()
+    provider = registry.stateful("responses")
+    assert isinstance(provider, GatewayStatefulProvider)
+    # One limit for gpt4o and the Responses API: they share the OpenAI request budget
+    assert provider.limiter is registry.get("gpt4o").limiter
+
+    provider.inner = _FlakyStateful()
+    session = ProviderSession("resp_1")
+    assert _turn(provider, session, [{"role": "user", "content": "hi"}]) == "ok"
+    assert provider.inner.calls == 2
+    assert session.response_id == "resp_2"
+    assert provider.limiter.in_use == 0
+    asyncio.run(registry.aclose())
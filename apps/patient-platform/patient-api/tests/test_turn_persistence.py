@@ -0,0 +1,146 @@
+import asyncio
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import functions
+
+from db.patient_models import Conversations as ChatModel, Messages as MessageModel
+from routers.chat import db_executor
+from routers.chat.connection_state import ChatConnectionState
+from routers.chat.constants import ConversationState
+from routers.chat.models import Message, WebSocketMessageIn
+from routers.chat.services import ConversationService
+
+
+# SQLite stand-ins for the Postgres-only pieces of the schema. now() keeps microseconds
+# in the format SQLAlchemy binds datetimes in, so the updated_at version check matches.
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(functions.now, "sqlite")
+def _now_with_microseconds(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+class _Counter:
+    def __init__(self, engine):
+        self.statements = []
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._execute)
+        event.listen(engine, "commit", self._commit)
+
+    def _execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(" ".join(statement.split()))
+
+    def _commit(self, conn):
+        self.commits += 1
+
+    def reset(self):
+        self.statements, self.commits = [], 0
+
+    def kinds(self):
+        """Each round trip as "UPDATE conversations" / "INSERT messages" / "SELECT"."""
+        kinds = []
+        for statement in self.statements:
+            verb = statement.split()[0]
+            table = {"UPDATE": 1, "INSERT": 2}.get(verb)
+            kinds.append(f"{verb} {statement.split()[table]}" if table else verb)
+        return kinds
+
+
+@pytest.fixture
+def database(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    ChatModel.__table__.create(engine)
+    MessageModel.__table__.create(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    @contextmanager
+    def chat_db_session():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(db_executor, "chat_db_session", chat_db_session)
+    yield factory, _Counter(engine)
+    db_executor.shutdown_db_executor()
+    engine.dispose()
+
+
+def _open_chat(factory, **values):
+    with factory() as db:
+        chat = ChatModel(patient_uuid=uuid.uuid4(), symptom_list=[], question_state={}, **values)
+        db.add(chat)
+        db.commit()
+        return ChatConnectionState.load(chat.uuid)
+
+
+def _process(state, message):
+    async def run():
+        service = ConversationService()
+        return [out async for out in service.process_message_stream(state.chat_uuid, message, state)]
+    return asyncio.run(run())
+
+
+def _persisted(items):
+    return [m for m in items if isinstance(m, Message) and m.id != -1]
+
+
+def _assert_returned_from_insert(messages, factory):
+    with factory() as db:
+        rows = {r.id: r for r in db.query(MessageModel).all()}
+    for message in messages:
+        assert message.id in rows and isinstance(message.created_at, datetime)
+        assert rows[message.id].content == message.content
+
+
+def test_locally_answered_turn_is_one_transaction(database):
+    factory, counter = database
+    state = _open_chat(factory, conversation_state=ConversationState.CHEMO_CHECK_SENT)
+    counter.reset()
+
+    items = _process(state, WebSocketMessageIn(type="user_message", message_type="button_response", content="Yes"))
+
+    assert counter.commits == 1
+    # The chat UPDATE and both message INSERTs; no refresh SELECTs
+    assert counter.kinds() == ["UPDATE conversations", "INSERT messages", "INSERT messages"]
+    assert all(s.endswith("RETURNING id, created_at") for s in counter.statements[1:])
+    user, assistant = _persisted(items)
+    assert (user.sender, assistant.sender) == ("user", "assistant")
+    _assert_returned_from_insert([user, assistant], factory)
+    with factory() as db:
+        assert db.get(ChatModel, state.chat_uuid).conversation_state == ConversationState.SYMPTOM_SELECTION_SENT
+
+
+def test_model_turn_is_two_transactions(database, monkeypatch):
+    factory, counter = database
+    state = _open_chat(factory, conversation_state=ConversationState.FOLLOWUP_QUESTIONS)
+    counter.reset()
+
+    async def model_reply(self, chat, context, route=None, turn_kind=None):
+        # Both transactions are around the model call, never during it
+        assert counter.commits == 1
+        yield '{"content": "Anything else today?", "response_type": "text", "new_symptoms": ["Fatigue"]}'
+
+    monkeypatch.setattr(ConversationService, "_query_knowledge_base_stream_with_rag", model_reply)
+    items = _process(state, WebSocketMessageIn(type="user_message", message_type="text", content="I am tired"))
+
+    assert counter.commits == 2
+    assert counter.kinds() == ["UPDATE conversations", "INSERT messages"] * 2
+    user, assistant = _persisted(items)
+    assert assistant.content == "Anything else today?"
+    _assert_returned_from_insert([user, assistant], factory)
+    with factory() as db:
+        assert db.get(ChatModel, state.chat_uuid).symptom_list == ["Fatigue"]
+